@@ -1,8 +1,32 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, AsyncIterator
+
+
+class ProviderOverloadedError(RuntimeError):
+    """Raised when a provider's bounded queue is full; surfaced to clients as 503."""
 
 
 class AIClient(ABC):
     @abstractmethod
     async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
         raise NotImplementedError
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Yield the reply as text chunks.
+
+        Providers without native streaming yield the full reply as a single chunk.
+        """
+        result = await self.chat(messages, max_tokens, temperature)
+        yield result["reply"]
+
+    async def probe(self) -> None:
+        """Cheap health check used to recover an open circuit breaker; raises when unhealthy."""
+        await self.chat([{"role": "user", "content": "ping"}], 1, 0.0)
+
+    async def warmup(self) -> None:
+        """Prepare the client before the first request (load models, open connections)."""
+        return None
+
+    async def aclose(self) -> None:
+        """Release resources held by the client on shutdown."""
+        return None
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from ..metrics import metrics
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Gathers concurrent requests for up to ``max_wait_ms`` (or ``max_batch`` items)
+    and runs them together.
+
+    When ``supports_batch()`` is true the batch goes to ``run_batch`` as one
+    generation; otherwise every item is started at once through ``run_one``
+    (pipelined) so the backend can overlap them.
+
+    Cancellation reaches the backend: a caller that goes away before the
+    flush is dropped from the batch, a pipelined item's task is cancelled
+    with its caller, and a fused batch is cancelled once all of its callers
+    are gone.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_one: Callable[[T], Awaitable[R]],
+        run_batch: Callable[[list[T]], Awaitable[list[R]]] | None = None,
+        supports_batch: Callable[[], bool] = lambda: False,
+        max_batch: int = 8,
+        max_wait_ms: float = 5.0,
+    ):
+        self.run_one = run_one
+        self.run_batch = run_batch
+        self.supports_batch = supports_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[T, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._batch_size = metrics.histogram(f"{name}.batch_size", BATCH_SIZE_BUCKETS)
+        self._queue_wait = metrics.histogram(f"{name}.batch_queue_wait_seconds")
+        self._batched = metrics.counter(f"{name}.batches_fused")
+        self._pipelined = metrics.counter(f"{name}.batches_pipelined")
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [entry for entry in self._pending if not entry[1].done()]
+        self._pending = []
+        if not batch:
+            return
+        now = time.perf_counter()
+        self._batch_size.observe(len(batch))
+        for _, _, enqueued in batch:
+            self._queue_wait.observe(now - enqueued)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future, float]]) -> None:
+        items = [item for item, _, _ in batch]
+        futures = [fut for _, fut, _ in batch]
+        if self.run_batch is not None and len(batch) > 1 and self.supports_batch():
+            self._batched.inc()
+            task = asyncio.ensure_future(self.run_batch(items))
+            remaining = [len(futures)]
+
+            def on_caller_done(fut: asyncio.Future) -> None:
+                if fut.cancelled():
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        task.cancel()
+
+            for fut in futures:
+                fut.add_done_callback(on_caller_done)
+            try:
+                results: list[Any] = await task
+            except asyncio.CancelledError:
+                if task.cancelled() and all(fut.cancelled() for fut in futures):
+                    return  # every caller went away
+                raise
+            except Exception as e:  # noqa: BLE001
+                results = [e] * len(items)
+            else:
+                if len(results) != len(items):
+                    error = RuntimeError(f"run_batch returned {len(results)} results for {len(items)} items")
+                    results = [error] * len(items)
+        else:
+            self._pipelined.inc()
+            tasks = [asyncio.ensure_future(self.run_one(item)) for item in items]
+            for fut, task in zip(futures, tasks):
+                fut.add_done_callback(lambda f, t=task: t.cancel() if f.cancelled() else None)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        for fut, result in zip(futures, results):
+            if fut.done():
+                continue  # the caller went away
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Callable
+
+from .base import AIClient
+from ..metrics import metrics
+
+
+def request_key(provider: str, model: str, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> str:
+    """Stable digest of a provider request; whitespace differences in content are ignored."""
+    normalized = [[m.get("role", ""), " ".join((m.get("content") or "").split())] for m in messages]
+    blob = json.dumps(
+        [provider, model, normalized, max_tokens, round(temperature, 4)],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU of provider results with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._hits = metrics.counter("response_cache.hits")
+        self._misses = metrics.counter("response_cache.misses")
+        self._evictions = metrics.counter("response_cache.evictions")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self._misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self._hits.inc()
+        return copy.deepcopy(entry[1])
+
+    def set(self, key: str, result: dict[str, Any]) -> None:
+        self._entries[key] = (self.clock() + self.ttl, copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions.inc()
+
+
+class CachedAIClient(AIClient):
+    """Serve repeated low-temperature requests from a ``ResponseCache``.
+
+    Requests at or above ``max_temperature`` always reach the provider. Replies
+    produced by a fallback provider are not cached, so an outage does not pin
+    degraded answers. ``usage["X-Cache"]`` reports HIT, MISS or BYPASS.
+    """
+
+    def __init__(self, inner: AIClient, cache: ResponseCache, provider: str, model: str, max_temperature: float):
+        self.inner = inner
+        self.cache = cache
+        self.provider = provider
+        self.model = model
+        self.max_temperature = max_temperature
+
+    def _key(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> str | None:
+        if temperature >= self.max_temperature:
+            return None
+        return request_key(self.provider, self.model, messages, max_tokens, temperature)
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        key = self._key(messages, max_tokens, temperature)
+        if key is None:
+            result = await self.inner.chat(messages, max_tokens, temperature)
+            result.setdefault("usage", {})["X-Cache"] = "BYPASS"
+            return result
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached.setdefault("usage", {})["X-Cache"] = "HIT"
+            return cached
+        result = await self.inner.chat(messages, max_tokens, temperature)
+        usage = result.setdefault("usage", {})
+        if len(usage.get("provider_chain", ())) <= 1:
+            self.cache.set(key, result)
+        # An inner layer (e.g. the similarity cache) may already have marked the reply.
+        usage.setdefault("X-Cache", "MISS")
+        return result
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        # Streams are answered from the cache when possible but never populate it:
+        # a streamed reply has no provider usage to store alongside it.
+        key = self._key(messages, max_tokens, temperature)
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            yield cached["reply"]
+            return
+        async for chunk in self.inner.stream(messages, max_tokens, temperature):
+            yield chunk
+
+    async def warmup(self) -> None:
+        await self.inner.warmup()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
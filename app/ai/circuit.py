@@ -0,0 +1,165 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from .base import ProviderOverloadedError
+from ..config import Settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ProviderOverloadedError):
+    """Raised when a provider is skipped because its breaker is open and nothing can take over."""
+
+
+class CircuitBreaker:
+    """Per-provider breaker over a rolling window of call outcomes.
+
+    The breaker opens when, over the last ``window_seconds``, at least
+    ``min_calls`` calls were made and the share of failed or slow calls
+    (slower than ``slow_call_seconds``) reaches ``error_rate``. While open the
+    provider is skipped. After ``open_seconds`` one trial call is let through
+    (half-open); in parallel a background probe checks the provider, and
+    either success closes the breaker again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        open_seconds: float = 15.0,
+        probe: Callable[[], Awaitable[Any]] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.probe = probe
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._outcomes: deque[tuple[float, bool, float]] = deque()
+        self._trial_in_flight = False
+        self._probe_task: asyncio.Task | None = None
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        now = self.clock()
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = False
+            if ok:
+                self._close()
+            else:
+                self._trip(now)
+            return
+        if self.state == OPEN:
+            return  # a call started before the breaker opened
+        self._outcomes.append((now, ok and latency < self.slow_call_seconds, latency))
+        self._prune(now)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate() >= self.error_rate:
+            self._trip(now)
+
+    def release(self) -> None:
+        """Forget a trial call that was cancelled before it produced an outcome."""
+        self._trial_in_flight = False
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, good, _ in self._outcomes if not good) / len(self._outcomes)
+
+    def _trip(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        logging.warning("Circuit breaker for %s opened", self.name)
+        self._start_probe()
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._trial_in_flight = False
+        self._outcomes.clear()
+        logging.info("Circuit breaker for %s closed", self.name)
+
+    def _start_probe(self) -> None:
+        if self.probe is None or (self._probe_task is not None and not self._probe_task.done()):
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+        except RuntimeError:
+            pass  # no running loop; recovery happens through half-open trial calls
+
+    async def _probe_loop(self) -> None:
+        delay = self.open_seconds
+        while self.state != CLOSED:
+            await asyncio.sleep(delay)
+            if self.state == CLOSED:
+                return
+            try:
+                await asyncio.wait_for(self.probe(), timeout=max(self.slow_call_seconds, 1.0))
+            except Exception:  # noqa: BLE001
+                delay = min(delay * 2, 300.0)
+                continue
+            self._close()
+
+    def snapshot(self) -> dict[str, Any]:
+        self._prune(self.clock())
+        latencies = [latency for _, _, latency in self._outcomes]
+        return {
+            "state": self.state,
+            "calls": len(self._outcomes),
+            "errorRate": round(self.failure_rate(), 3),
+            "avgLatency": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "trips": self.trips,
+        }
+
+
+class BreakerBoard:
+    """Named breakers shared by every chain, so state survives chain rebuilds."""
+
+    def __init__(self) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str, settings: Settings, probe: Callable[[], Awaitable[Any]] | None = None) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(name)
+        breaker.window_seconds = settings.breaker_window_seconds
+        breaker.min_calls = settings.breaker_min_calls
+        breaker.error_rate = settings.breaker_error_rate
+        breaker.slow_call_seconds = settings.breaker_slow_call_seconds
+        breaker.open_seconds = settings.breaker_open_seconds
+        breaker.probe = probe or breaker.probe
+        return breaker
+
+    def snapshot(self) -> dict[str, Any]:
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+
+breakers = BreakerBoard()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import asyncio
+import copy
+from typing import Any, AsyncIterator
+
+from .base import AIClient
+from .cache import request_key
+from ..metrics import metrics
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class CoalescingAIClient(AIClient):
+    """Single-flight wrapper: concurrent identical requests share one provider call.
+
+    The first caller for a request key starts the call; later callers with the
+    same key await the same task. Every caller gets its own copy of the result,
+    and a provider error is raised to all of them. A caller that is cancelled
+    only stops waiting; the shared call is cancelled once nobody is waiting.
+    """
+
+    def __init__(self, inner: AIClient, provider: str, model: str):
+        self.inner = inner
+        self.provider = provider
+        self.model = model
+        self._in_flight: dict[str, _Flight] = {}
+        self.calls = 0
+        self.saved = 0
+        self._calls = metrics.counter("coalesce.calls")
+        self._saved = metrics.counter("coalesce.saved")
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        key = request_key(self.provider, self.model, messages, max_tokens, temperature)
+        self.calls += 1
+        self._calls.inc()
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self.inner.chat(messages, max_tokens, temperature)))
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._land(key, flight))
+        else:
+            self.saved += 1
+            self._saved.inc()
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        return copy.deepcopy(result)
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # mark as retrieved; waiters re-raise it themselves
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        async for chunk in self.inner.stream(messages, max_tokens, temperature):
+            yield chunk
+
+    async def warmup(self) -> None:
+        await self.inner.warmup()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -1,25 +1,99 @@
-from typing import Any
+import time
+from typing import Any, AsyncIterator
 from .base import AIClient
+from .circuit import CircuitBreaker, CircuitOpenError
+
+
+def _label(client: AIClient) -> str:
+    if isinstance(client, FallbackAIClient):
+        return _label(client.primary)
+    return type(client).__name__
+
+
+def _extend_chain(chain: list[str], client: AIClient, result: dict[str, Any]) -> None:
+    # A nested fallback reports its own chain; splice it in instead of its class name.
+    inner = result.get("usage", {}).get("provider_chain") if isinstance(client, FallbackAIClient) else None
+    chain.extend(inner or [type(client).__name__])
 
 
 class FallbackAIClient(AIClient):
-    """Try primary model; on failure, try fallback (if provided)."""
+    """Try primary model; on failure, try fallback (if provided).
+
+    With a ``breaker`` the primary is skipped outright while its circuit is
+    open, so an outage costs nothing instead of a full timeout per request.
+    Skipped providers appear in ``usage.provider_chain`` as ``Name:open``.
+    """
 
-    def __init__(self, primary: AIClient, fallback: AIClient | None = None):
+    def __init__(self, primary: AIClient, fallback: AIClient | None = None, breaker: CircuitBreaker | None = None):
         self.primary = primary
         self.fallback = fallback
+        self.breaker = breaker
 
     async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
         chain: list[str] = []
-        try:
-            chain.append(type(self.primary).__name__)
-            result = await self.primary.chat(messages, max_tokens, temperature)
-            result.setdefault("usage", {})["provider_chain"] = chain
-            return result
-        except Exception:
+        if self.breaker is None or self.breaker.allow():
+            started = time.perf_counter()
+            try:
+                result = await self.primary.chat(messages, max_tokens, temperature)
+            except Exception:
+                self._record(False, started)
+                chain.append(_label(self.primary))
+                if not self.fallback:
+                    raise
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            else:
+                self._record(True, started)
+                _extend_chain(chain, self.primary, result)
+                result.setdefault("usage", {})["provider_chain"] = chain
+                return result
+        else:
+            chain.append(f"{_label(self.primary)}:{self.breaker.state}")
             if not self.fallback:
+                raise CircuitOpenError(f"{_label(self.primary)} circuit is {self.breaker.state}")
+        result = await self.fallback.chat(messages, max_tokens, temperature)
+        _extend_chain(chain, self.fallback, result)
+        result.setdefault("usage", {})["provider_chain"] = chain
+        return result
+
+    def _record(self, ok: bool, started: float) -> None:
+        if self.breaker is not None:
+            self.breaker.record(ok, time.perf_counter() - started)
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        # Fall back only if the primary fails before producing any output;
+        # a failure mid-stream cannot be hidden from the caller.
+        if self.breaker is None or self.breaker.allow():
+            started = time.perf_counter()
+            produced = False
+            try:
+                async for chunk in self.primary.stream(messages, max_tokens, temperature):
+                    produced = True
+                    yield chunk
+            except Exception:
+                self._record(False, started)
+                if produced or not self.fallback:
+                    raise
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
                 raise
-            chain.append(type(self.fallback).__name__)
-            result = await self.fallback.chat(messages, max_tokens, temperature)
-            result.setdefault("usage", {})["provider_chain"] = chain
-            return result
+            else:
+                self._record(True, started)
+                return
+        elif not self.fallback:
+            raise CircuitOpenError(f"{_label(self.primary)} circuit is {self.breaker.state}")
+        async for chunk in self.fallback.stream(messages, max_tokens, temperature):
+            yield chunk
+
+    async def warmup(self) -> None:
+        await self.primary.warmup()
+        if self.fallback:
+            await self.fallback.warmup()
+
+    async def aclose(self) -> None:
+        await self.primary.aclose()
+        if self.fallback:
+            await self.fallback.aclose()
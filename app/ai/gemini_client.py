@@ -1,54 +1,89 @@
-from typing import Any
+from typing import Any, AsyncIterator
+import json
 import os
-import httpx
 from .base import AIClient
+from .tokenizer import get_tokenizer
+from .transport import HTTPTransport, get_http_transport
 from ..config import Settings
 
 
 class GeminiClient(AIClient):
     """Minimal Google Gemini (Generative Language) client using REST API.
     Expects GEMINI_API_KEY env or settings.gemini_api_key.
-    Only sends the last N messages as context (simple memory window).
     """
 
-    def __init__(self, settings: Settings, window: int = 12):
+    def __init__(self, settings: Settings, transport: HTTPTransport | None = None):
         self.api_key = settings.gemini_api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not configured")
         self.model = settings.gemini_model
-        self.window = window
         # Endpoint format (public REST): https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent
         self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        self.stream_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:streamGenerateContent"
+        self.model_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}"
+        self.transport = transport or get_http_transport(settings)
 
-    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
-        # Gemini expects "contents" with role + parts. We'll take last window items.
-        trimmed = messages[-self.window :]
+    def _payload(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        # Gemini expects "contents" with role + parts; system prompts go in "systemInstruction".
         contents = []
-        for m in trimmed:
-            role = "user" if m.get("role") == "user" else "model"
-            contents.append({"role": role, "parts": [{"text": m.get("content", "")}]})
-
-        payload = {
+        system = []
+        for m in messages:
+            role = m.get("role")
+            if role == "system":
+                system.append({"text": m.get("content", "")})
+                continue
+            contents.append({"role": "user" if role == "user" else "model", "parts": [{"text": m.get("content", "")}]})
+        payload: dict[str, Any] = {
             "contents": contents,
             "generationConfig": {
                 "temperature": temperature,
                 "maxOutputTokens": max_tokens,
             },
         }
+        if system:
+            payload["systemInstruction"] = {"parts": system}
+        return payload
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        payload = self._payload(messages, max_tokens, temperature)
         params = {"key": self.api_key}
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(self.base_url, params=params, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await self.transport.post(self.base_url, params=params, json=payload)
+        resp.raise_for_status()
+        data = resp.json()
         try:
             reply = data["candidates"][0]["content"]["parts"][0]["text"].strip()
         except Exception:
             raise ValueError(f"Unexpected Gemini response: {data}")
 
-        # Token accounting is approximate here since API returns metadata optionally.
-        usage = {
-            "promptTokens": sum(len(m.get("content", "").split()) for m in trimmed),
-            "completionTokens": len(reply.split()),
-        }
-        usage["totalTokens"] = usage["promptTokens"] + usage["completionTokens"]
+        meta = data.get("usageMetadata") or {}
+        if "promptTokenCount" in meta:
+            prompt_tokens = meta["promptTokenCount"]
+            completion_tokens = meta.get("candidatesTokenCount", 0)
+            usage = {
+                "promptTokens": prompt_tokens,
+                "completionTokens": completion_tokens,
+                "totalTokens": meta.get("totalTokenCount", prompt_tokens + completion_tokens),
+            }
+        else:
+            usage = get_tokenizer().usage(messages, reply)  # metadata is optional in the API
         return {"reply": reply, "usage": usage}
+
+    async def probe(self) -> None:
+        resp = await self.transport.get(self.model_url, params={"key": self.api_key})
+        resp.raise_for_status()
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        payload = self._payload(messages, max_tokens, temperature)
+        params = {"key": self.api_key, "alt": "sse"}
+        async with self.transport.stream("POST", self.stream_url, params=params, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:])
+                try:
+                    text = data["candidates"][0]["content"]["parts"][0]["text"]
+                except (KeyError, IndexError):
+                    continue
+                if text:
+                    yield text
@@ -1,5 +1,10 @@
-from typing import Any
+from functools import partial
+import os
+from typing import Any, AsyncIterator
 from .base import AIClient
+from .tokenizer import get_tokenizer
+from .batching import MicroBatcher
+from .gpt4all_pool import GPT4AllReplicaPool, load_gpt4all_model, replica_layout
 from ..config import Settings
 
 try:
@@ -9,23 +14,61 @@ except Exception:
 
 
 class GPT4AllClient(AIClient):
+    """Local model client. Generation runs in worker processes (see ``GPT4AllReplicaPool``)
+    so a long completion never blocks the event loop."""
+
     def __init__(self, settings: Settings):
         if GPT4All is None:
             raise RuntimeError("gpt4all package not installed. Install to use local model.")
         self.model_path = settings.gpt4all_model_path
-        self._model = GPT4All(model_name=self.model_path)
+        # Replicas load the model lazily in worker processes, so check the file here:
+        # a client that can never start must fail construction and stay out of fallback chains.
+        if not os.path.isfile(self.model_path):
+            raise RuntimeError(f"GPT4All model file not found: {self.model_path}")
+        replicas, threads = replica_layout(settings.gpt4all_replicas)
+        self._pool = GPT4AllReplicaPool(
+            partial(load_gpt4all_model, self.model_path, threads),
+            replicas=replicas,
+            queue_limit=settings.gpt4all_queue_limit,
+        )
+        # Concurrent chat() calls are gathered into micro-batches in front of the pool and
+        # dispatched together (pipelined); the bindings have no fused multi-prompt generate.
+        self._batcher: MicroBatcher[tuple[str, int, float], str] = MicroBatcher(
+            "gpt4all",
+            run_one=lambda item: self._pool.generate(*item),
+            max_batch=settings.gpt4all_batch_max_size,
+            max_wait_ms=settings.gpt4all_batch_wait_ms,
+        )
 
-    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+    @staticmethod
+    def _prompt(messages: list[dict[str, str]]) -> tuple[str, list[str]]:
         user_texts = [m["content"] for m in messages if m["role"] == "user"]
-        prompt = user_texts[-1] if user_texts else "Hello"
-        reply = self._model.generate(prompt, max_tokens=max_tokens, temp=temperature)
-        prompt_tokens = sum(len(t.split()) for t in user_texts)
-        completion_tokens = len(reply.split())
-        return {
-            "reply": reply,
-            "usage": {
-                "promptTokens": prompt_tokens,
-                "completionTokens": completion_tokens,
-                "totalTokens": prompt_tokens + completion_tokens,
-            },
-        }
+        return (user_texts[-1] if user_texts else "Hello"), user_texts
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        prompt, _ = self._prompt(messages)
+        if self._batcher.max_batch > 1:
+            reply = await self._batcher.submit((prompt, max_tokens, temperature))
+        else:
+            reply = await self._pool.generate(prompt, max_tokens, temperature)
+        # Only the last user message is sent as the prompt.
+        return {"reply": reply, "usage": get_tokenizer().usage([{"content": prompt}], reply)}
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        prompt, _ = self._prompt(messages)
+        async for chunk in self._pool.stream(prompt, max_tokens, temperature):
+            yield chunk
+
+    async def probe(self) -> None:
+        if not any(r["alive"] for r in self._pool.stats()["replicas"]):
+            raise RuntimeError("No GPT4All replica is running")
+
+    def stats(self) -> dict[str, Any]:
+        return self._pool.stats()
+
+    async def warmup(self) -> None:
+        # Spawn the replicas and wait until every model is loaded.
+        await self._pool.wait_ready()
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
@@ -0,0 +1,282 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Any, AsyncIterator, Callable
+
+from .base import ProviderOverloadedError
+
+ModelFactory = Callable[[], Any]
+
+
+def load_gpt4all_model(model_path: str, n_threads: int | None = None) -> Any:
+    from gpt4all import GPT4All
+    return GPT4All(model_name=model_path, n_threads=n_threads)
+
+
+def replica_layout(replicas: int) -> tuple[int, int]:
+    """Return ``(replicas, threads_per_replica)``; ``replicas <= 0`` sizes the pool to the cores."""
+    cores = os.cpu_count() or 1
+    if replicas <= 0:
+        replicas = max(1, cores // 4)
+    return replicas, max(1, cores // replicas)
+
+
+def _replica_main(factory: ModelFactory, conn, cancel) -> None:
+    """Worker process loop: load one model replica, then serve requests one at a time.
+
+    Requests are ``(req_id, op, args)`` with op ``generate`` or ``stream``.
+    There is no fused batch op: the gpt4all bindings generate one prompt per
+    call, so concurrent requests are spread across replicas instead.
+    """
+    try:
+        model = factory()
+    except Exception as e:  # noqa: BLE001
+        conn.send(("failed", 0, repr(e)))
+        return
+    conn.send(("ready", 0, None))
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        req_id, op, args = request
+
+        def on_token(token_id: int, text: str) -> bool:
+            if op == "stream":
+                conn.send(("chunk", req_id, text))
+            # Returning False asks the backend to stop generating.
+            return cancel.value != req_id
+
+        try:
+            prompt, max_tokens, temperature = args
+            reply = model.generate(prompt, max_tokens=max_tokens, temp=temperature, callback=on_token)
+            conn.send(("done", req_id, reply))
+        except Exception as e:  # noqa: BLE001
+            conn.send(("error", req_id, repr(e)))
+
+
+class _Request:
+    __slots__ = ("id", "message", "loop", "queue")
+
+    def __init__(self, req_id: int, message: tuple, loop: asyncio.AbstractEventLoop):
+        self.id = req_id
+        self.message = message
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, kind: str, payload: Any) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (kind, payload))
+        except RuntimeError:
+            pass  # the requesting loop is gone
+
+
+class _Replica:
+    """Parent-side handle of one worker process.
+
+    A request is only written to the pipe once the worker is idle, so the
+    event loop never blocks on a full pipe; the rest wait in ``backlog``.
+    """
+
+    def __init__(self, index: int, ctx, factory: ModelFactory):
+        self.index = index
+        self.conn, self._child_conn = ctx.Pipe()
+        self.cancel = ctx.Value("q", 0, lock=False)
+        self.process = ctx.Process(
+            target=_replica_main,
+            args=(factory, self._child_conn, self.cancel),
+            name=f"gpt4all-replica-{index}",
+            daemon=True,
+        )
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.alive = False
+        self.error: str | None = None
+        self.running: _Request | None = None
+        self.backlog: deque[_Request] = deque()
+        self.served = 0
+
+    @property
+    def load(self) -> int:
+        return len(self.backlog) + (1 if self.running is not None else 0)
+
+    @property
+    def usable(self) -> bool:
+        return self.alive or not self.ready.is_set()
+
+    def start(self) -> None:
+        self.process.start()
+        self._child_conn.close()
+        threading.Thread(target=self._read_loop, name=f"{self.process.name}-reader", daemon=True).start()
+
+    def submit(self, req: _Request) -> None:
+        with self.lock:
+            if self.running is None:
+                self.running = req
+                self.conn.send(req.message)
+            else:
+                self.backlog.append(req)
+
+    def abandon(self, req: _Request) -> None:
+        with self.lock:
+            if self.running is req:
+                self.cancel.value = req.id
+            else:
+                try:
+                    self.backlog.remove(req)
+                except ValueError:
+                    pass
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                kind, req_id, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "ready":
+                self.alive = True
+                self.ready.set()
+                continue
+            if kind == "failed":
+                self.error = payload
+                logging.error("GPT4All replica %d failed to load: %s", self.index, payload)
+                break
+            with self.lock:
+                req = self.running
+                if req is None or req.id != req_id:
+                    continue
+                if kind != "chunk":
+                    self.served += 1
+                    self.running = self.backlog.popleft() if self.backlog else None
+                    if self.running is not None:
+                        self.conn.send(self.running.message)
+            req.deliver(kind, payload)
+        with self.lock:
+            self.alive = False
+            orphans = ([self.running] if self.running is not None else []) + list(self.backlog)
+            self.running = None
+            self.backlog.clear()
+        self.ready.set()
+        for req in orphans:
+            req.deliver("error", self.error or "GPT4All replica exited")
+
+    def stop(self, timeout: float) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class GPT4AllReplicaPool:
+    """Runs local generation in worker processes, each holding its own model replica.
+
+    Requests go to the least-loaded replica. Once every replica is busy and
+    ``queue_limit`` further requests are waiting, new requests are rejected
+    with ``ProviderOverloadedError`` instead of queueing without bound.
+    """
+
+    def __init__(self, factory: ModelFactory, replicas: int, queue_limit: int, start_timeout: float = 300.0):
+        self.factory = factory
+        self.size = max(1, replicas)
+        self.queue_limit = max(0, queue_limit)
+        self.start_timeout = start_timeout
+        self.rejected = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._replicas: list[_Replica] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._replicas:
+                return
+            self._replicas = [_Replica(i, self._ctx, self.factory) for i in range(self.size)]
+            for replica in self._replicas:
+                replica.start()
+
+    async def wait_ready(self) -> None:
+        self.start()
+
+        def wait() -> None:
+            for replica in self._replicas:
+                replica.ready.wait(self.start_timeout)
+
+        await asyncio.to_thread(wait)
+        if not any(r.alive for r in self._replicas):
+            errors = [r.error for r in self._replicas if r.error]
+            raise RuntimeError(f"No GPT4All replica could be started: {errors[0] if errors else 'timeout'}")
+
+    def _submit(self, op: str, args: Any) -> tuple[_Replica, _Request]:
+        self.start()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            candidates = [r for r in self._replicas if r.usable]
+            if not candidates:
+                raise RuntimeError("No GPT4All replicas available")
+            if sum(r.load for r in candidates) >= len(candidates) + self.queue_limit:
+                self.rejected += 1
+                raise ProviderOverloadedError("GPT4All queue is full")
+            replica = min(candidates, key=lambda r: r.load)
+            req_id = next(self._ids)
+            req = _Request(req_id, (req_id, op, args), loop)
+            replica.submit(req)
+        return replica, req
+
+    async def generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        return await self._call("generate", (prompt, max_tokens, temperature))
+
+    async def _call(self, op: str, args: Any) -> Any:
+        replica, req = self._submit(op, args)
+        try:
+            kind, payload = await req.queue.get()
+        except asyncio.CancelledError:
+            replica.abandon(req)
+            raise
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    async def stream(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        replica, req = self._submit("stream", (prompt, max_tokens, temperature))
+        finished = False
+        try:
+            while True:
+                kind, payload = await req.queue.get()
+                if kind == "chunk":
+                    yield payload
+                    continue
+                finished = True
+                if kind == "error":
+                    raise RuntimeError(payload)
+                return
+        finally:
+            if not finished:
+                replica.abandon(req)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "replicas": [
+                {"index": r.index, "alive": r.alive, "load": r.load, "served": r.served}
+                for r in self._replicas
+            ],
+            "queueLimit": self.queue_limit,
+            "rejected": self.rejected,
+        }
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            replicas, self._replicas = self._replicas, []
+        for replica in replicas:
+            await asyncio.to_thread(replica.stop, timeout)
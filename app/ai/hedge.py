@@ -0,0 +1,165 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+import math
+import time
+from typing import Any, AsyncIterator
+
+from .base import AIClient
+from .fallback_client import FallbackAIClient, _extend_chain, _label
+from ..metrics import metrics
+
+
+class RecentLatency:
+    """Latency quantiles over the last ``size`` samples, so the estimate follows drift.
+
+    The sorted view is rebuilt at most once per new sample, on the next query.
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] | None = None
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self._sorted = None
+
+    def quantile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        return self._sorted[min(len(self._sorted) - 1, max(0, math.ceil(q * len(self._sorted)) - 1))]
+
+
+class HedgedAIClient(AIClient):
+    """Race a slow primary against a second provider.
+
+    The primary gets ``delay()`` seconds to answer; after that the same request
+    is also sent to ``hedge`` and whichever succeeds first wins, the other call
+    is cancelled. The delay tracks the ``percentile`` of the primary's observed
+    latency over the last ``window`` calls, clamped to ``[min_delay, max_delay]``;
+    until ``min_samples`` calls have completed ``max_delay`` is used. The
+    cumulative ``latency`` histogram is kept for metrics only: it never
+    forgets, so after a slow spell it would hold the delay too high. If both fail, ``fallback`` answers.
+
+    ``hedge`` may be the primary itself (a duplicate request to the same
+    provider). ``usage["hedge"]`` reports whether the hedge was sent, why
+    (``delay`` or ``primary_failed``) and which provider won. Streams are not hedged: they try primary, then ``fallback``.
+    """
+
+    def __init__(
+        self,
+        primary: AIClient,
+        hedge: AIClient,
+        fallback: AIClient | None = None,
+        percentile: float = 0.95,
+        min_delay: float = 0.2,
+        max_delay: float = 4.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.primary = primary
+        self.hedge = hedge
+        self.fallback = fallback
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        name = _label(primary)
+        self.latency = metrics.histogram(f"hedge.{name}.latency_seconds")
+        self.recent = RecentLatency(window)
+        self._fired = metrics.counter(f"hedge.{name}.fired")
+        self._won = metrics.counter(f"hedge.{name}.won")
+        self._sequential = FallbackAIClient(primary, fallback)
+
+    def delay(self) -> float:
+        if self.recent.count < self.min_samples:
+            return self.max_delay
+        return min(max(self.recent.quantile(self.percentile), self.min_delay), self.max_delay)
+
+    def _observe(self, seconds: float) -> None:
+        self.latency.observe(seconds)
+        self.recent.observe(seconds)
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        delay = self.delay()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self.primary.chat(messages, max_tokens, temperature))
+        hedge: asyncio.Future | None = None
+        reason: str | None = None
+        pending = {primary}
+        failed: list[asyncio.Future] = []
+        winner: asyncio.Future | None = None
+        try:
+            while pending and winner is None:
+                timeout = delay - (time.perf_counter() - started) if hedge is None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    failed.append(task)
+                if winner is None and hedge is None and (not done or self.hedge is not self.primary):
+                    # Either the delay elapsed, or the primary failed early and a
+                    # different provider can still answer.
+                    reason = "primary_failed" if done else "delay"
+                    self._fired.inc()
+                    hedge = asyncio.ensure_future(self.hedge.chat(messages, max_tokens, temperature))
+                    pending.add(hedge)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        chain: list[str] = []
+        if winner is None:
+            if self.fallback is None:
+                raise failed[-1].exception()
+            chain.extend(_label(self.primary if task is primary else self.hedge) for task in failed)
+            result = await self.fallback.chat(messages, max_tokens, temperature)
+            _extend_chain(chain, self.fallback, result)
+            winner_label = _label(self.fallback)
+        else:
+            result = winner.result()
+            if winner is primary:
+                self._observe(time.perf_counter() - started)
+                winner_label = _label(self.primary)
+            else:
+                self._won.inc()
+                winner_label = _label(self.hedge)
+                if primary not in failed:
+                    # The primary was still running: its latency is at least this long.
+                    # Dropping the sample would bias the percentile low and hedge ever more often.
+                    self._observe(time.perf_counter() - started)
+                if self.hedge is not self.primary:
+                    # Keep a cross-provider answer out of the caches, like a fallback reply.
+                    chain.append(_label(self.primary) + ("" if primary in failed else ":hedged"))
+            _extend_chain(chain, self.primary if winner is primary else self.hedge, result)
+        usage = result.setdefault("usage", {})
+        usage["provider_chain"] = chain
+        usage["hedge"] = {"fired": hedge is not None, "reason": reason, "winner": winner_label, "delayMs": round(delay * 1000)}
+        return result
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        async for chunk in self._sequential.stream(messages, max_tokens, temperature):
+            yield chunk
+
+    async def warmup(self) -> None:
+        await self.primary.warmup()
+        if self.hedge is not self.primary:
+            await self.hedge.warmup()
+        if self.fallback:
+            await self.fallback.warmup()
+
+    async def aclose(self) -> None:
+        await self.primary.aclose()
+        if self.hedge is not self.primary:
+            await self.hedge.aclose()
+        if self.fallback:
+            await self.fallback.aclose()
@@ -1,5 +1,7 @@
-from typing import Any
+from typing import Any, AsyncIterator
 from .base import AIClient
+from .tokenizer import get_tokenizer
+import asyncio
 import re
 import random
 import math
@@ -123,15 +125,14 @@ class MockAIClient(AIClient):
         if len(reply) > max_tokens:
             reply = reply[: max_tokens - 3] + "..."
 
-        # Approximate 'tokens' (very rough heuristic) by splitting on whitespace
-        total_prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
-        completion_tokens = len(reply.split())
-        usage = {
-            "promptTokens": total_prompt_tokens,
-            "completionTokens": completion_tokens,
-            "totalTokens": total_prompt_tokens + completion_tokens,
-    }
-        return {"reply": reply, "usage": usage}
+        return {"reply": reply, "usage": get_tokenizer().usage(messages, reply)}
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        result = await self.chat(messages, max_tokens, temperature)
+        # Emit word-sized chunks (keeping whitespace) to mimic a token stream.
+        for chunk in re.findall(r"\S+\s*|\s+", result["reply"]):
+            yield chunk
+            await asyncio.sleep(0)
 
     # --- helper methods ---
     def _maybe_do_math(self, text: str) -> str | None:
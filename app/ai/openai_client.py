@@ -1,33 +1,40 @@
+import json
 import os
-import httpx
-from typing import Any
+from typing import Any, AsyncIterator
 from ..config import Settings
 from .base import AIClient
+from .transport import HTTPTransport, get_http_transport
 
 
 class OpenAIClient(AIClient):
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, transport: HTTPTransport | None = None):
         self.api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
         self.model = settings.openai_model
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not configured")
         self.base_url = "https://api.openai.com/v1/chat/completions"
+        self.models_url = f"https://api.openai.com/v1/models/{self.model}"
+        self.transport = transport or get_http_transport(settings)
 
-    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
-        headers = {
+    def _headers(self) -> dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
-        payload = {
+
+    def _payload(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        return {
             "model": self.model,
             "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature,
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(self.base_url, json=payload, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        payload = self._payload(messages, max_tokens, temperature)
+        resp = await self.transport.post(self.base_url, json=payload, headers=self._headers())
+        resp.raise_for_status()
+        data = resp.json()
         try:
             choice = data["choices"][0]["message"]["content"]
         except Exception:
@@ -41,3 +48,25 @@ class OpenAIClient(AIClient):
                 "totalTokens": usage.get("total_tokens", 0),
             },
         }
+
+    async def probe(self) -> None:
+        # Model metadata lookup: authenticated round-trip without spending tokens.
+        resp = await self.transport.get(self.models_url, headers=self._headers())
+        resp.raise_for_status()
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        payload = {**self._payload(messages, max_tokens, temperature), "stream": True}
+        async with self.transport.stream("POST", self.base_url, json=payload, headers=self._headers()) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                # Server-Sent Events: "data: {...}" lines, terminated by "data: [DONE]".
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                choices = event.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
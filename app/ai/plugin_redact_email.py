@@ -5,13 +5,11 @@ EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 
 
 def redact_before(messages, ctx):
-    redacted = []
+    """Replace email addresses in message contents; only messages that contain one are touched."""
     for m in messages:
         content = m.get("content")
-        if content:
-            content = EMAIL_RE.sub("[redacted-email]", content)
-        redacted.append({**m, "content": content})
-    return redacted
+        if content and "@" in content:
+            m["content"] = EMAIL_RE.sub("[redacted-email]", content)
 
 
-plugins.register_before(redact_before)
+plugins.register_before(redact_before, inplace=True)
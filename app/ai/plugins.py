@@ -1,30 +1,156 @@
-from typing import Callable, List, Dict, Any
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+import inspect
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Union
 
-BeforeHook = Callable[[list[dict], Dict[str, Any]], list[dict]]
-AfterHook = Callable[[str, Dict[str, Any]], str]
+from ..metrics import Counter, Histogram, metrics
+
+# Before/after hooks may be plain functions or coroutine functions.
+BeforeHook = Callable[[list[dict], Dict[str, Any]], Union[list[dict], None, Awaitable[Union[list[dict], None]]]]
+AfterHook = Callable[[str, Dict[str, Any]], Union[str, None, Awaitable[Union[str, None]]]]
+# Stream hooks wrap the chunk iterator so they can rewrite, buffer or drop chunks incrementally.
+StreamHook = Callable[[AsyncIterator[str], Dict[str, Any]], AsyncIterator[str]]
+
+
+@dataclass(slots=True)
+class _Hook:
+    fn: Callable[..., Any]
+    name: str
+    is_async: bool
+    pure: bool
+    inplace: bool
+    timeout: float | None
+    latency: Histogram
+    timeouts: Counter
+
+
+_SKIPPED = object()
 
 
 class PluginManager:
-    def __init__(self) -> None:
-        self._before: List[BeforeHook] = []
-        self._after: List[AfterHook] = []
-        return None
-
-    def register_before(self, fn: BeforeHook) -> None:
-        self._before.append(fn)
-
-    def register_after(self, fn: AfterHook) -> None:
-        self._after.append(fn)
-
-    def run_before(self, messages: list[dict], ctx: Dict[str, Any]) -> list[dict]:
-        for fn in self._before:
-            messages = fn(messages, ctx)
-        return messages
-
-    def run_after(self, reply: str, ctx: Dict[str, Any]) -> str:
-        for fn in self._after:
-            reply = fn(reply, ctx)
-        return reply
+    """Ordered before/after/stream hooks, compiled into a list of stages on registration.
+
+    A hook is one of three kinds:
+
+    * a transform (the default) returns the new value, which the next hook sees;
+    * ``inplace=True`` (before hooks only) edits the message list and its
+      dicts directly and returns nothing. ``run_before`` callers hand over a
+      list they own, so no hook needs to copy messages;
+    * ``pure=True`` only reads its input (auditing, moderation checks) and
+      its return value is ignored. Neighbouring pure hooks form one stage
+      and run concurrently.
+
+    Each hook's run time goes to ``plugin.<stage>.<name>.latency_seconds``.
+    A hook that exceeds its ``timeout`` (seconds) is skipped for that
+    request: the value passes through unchanged and
+    ``plugin.<stage>.<name>.timeouts`` is incremented. Sync hooks with a
+    timeout run on a worker thread so they can be abandoned, and in-place
+    hooks with a timeout edit a copy of the messages that is applied only
+    if they finish, so a cancelled hook never leaves them half-edited.
+    Whether a hook is async is decided from what it returns, so plain
+    functions returning a coroutine work too. Exceptions raised by hooks
+    still propagate to the caller.
+    """
+
+    def __init__(self, default_timeout: float | None = None) -> None:
+        self.default_timeout = default_timeout
+        self._before: List[_Hook] = []
+        self._after: List[_Hook] = []
+        self._stream: List[StreamHook] = []
+        self._before_stages: List[_Hook | tuple[_Hook, ...]] = []
+        self._after_stages: List[_Hook | tuple[_Hook, ...]] = []
+
+    def _hook(self, stage: str, fn: Callable[..., Any], name: str | None, pure: bool, inplace: bool, timeout: float | None) -> _Hook:
+        if pure and inplace:
+            raise ValueError("a hook cannot be both pure and in-place")
+        name = name or getattr(fn, "__name__", type(fn).__name__)
+        is_async = inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, "__call__", None))
+        timeout = self.default_timeout if timeout is None else timeout
+        prefix = f"plugin.{stage}.{name}"
+        return _Hook(
+            fn, name, is_async, pure, inplace, timeout or None,
+            metrics.histogram(f"{prefix}.latency_seconds"), metrics.counter(f"{prefix}.timeouts"),
+        )
+
+    @staticmethod
+    def _compile(hooks: List[_Hook]) -> List[_Hook | tuple[_Hook, ...]]:
+        stages: List[_Hook | tuple[_Hook, ...]] = []
+        for hook in hooks:
+            if hook.pure and stages and isinstance(stages[-1], tuple):
+                stages[-1] = stages[-1] + (hook,)
+            else:
+                stages.append((hook,) if hook.pure else hook)
+        return stages
+
+    def register_before(
+        self, fn: BeforeHook, *, pure: bool = False, inplace: bool = False, timeout: float | None = None, name: str | None = None
+    ) -> None:
+        self._before.append(self._hook("before", fn, name, pure, inplace, timeout))
+        self._before_stages = self._compile(self._before)
+
+    def register_after(self, fn: AfterHook, *, pure: bool = False, timeout: float | None = None, name: str | None = None) -> None:
+        self._after.append(self._hook("after", fn, name, pure, False, timeout))
+        self._after_stages = self._compile(self._after)
+
+    def register_stream(self, fn: StreamHook) -> None:
+        self._stream.append(fn)
+
+    async def _call(self, hook: _Hook, value: Any, ctx: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            if hook.timeout is None:
+                result = hook.fn(value, ctx)
+                return await result if inspect.isawaitable(result) else result
+            target = [dict(m) for m in value] if hook.inplace else value
+            result = await asyncio.wait_for(self._invoke(hook, target, ctx), hook.timeout)
+            if hook.inplace:
+                value[:] = target
+            return result
+        except asyncio.TimeoutError:
+            hook.timeouts.inc()
+            logging.warning("Plugin hook %s timed out after %.3fs; skipped", hook.name, hook.timeout)
+            return _SKIPPED
+        finally:
+            hook.latency.observe(time.perf_counter() - started)
+
+    @staticmethod
+    async def _invoke(hook: _Hook, value: Any, ctx: Dict[str, Any]) -> Any:
+        # ``is_async`` only picks where to call the hook; the result decides whether to await.
+        result = hook.fn(value, ctx) if hook.is_async else await asyncio.to_thread(hook.fn, value, ctx)
+        return await result if inspect.isawaitable(result) else result
+
+    async def _run(self, stages: List[_Hook | tuple[_Hook, ...]], value: Any, ctx: Dict[str, Any]) -> Any:
+        for stage in stages:
+            if isinstance(stage, tuple):
+                if len(stage) == 1:
+                    await self._call(stage[0], value, ctx)
+                else:
+                    await asyncio.gather(*(self._call(hook, value, ctx) for hook in stage))
+                continue
+            result = await self._call(stage, value, ctx)
+            if not stage.inplace and result is not _SKIPPED:
+                value = result
+        return value
+
+    async def run_before(self, messages: list[dict], ctx: Dict[str, Any]) -> list[dict]:
+        """Pass ``messages`` through the before hooks; in-place hooks edit the list given here."""
+        if not self._before_stages:
+            return messages
+        return await self._run(self._before_stages, messages, ctx)
+
+    async def run_after(self, reply: str, ctx: Dict[str, Any]) -> str:
+        if not self._after_stages:
+            return reply
+        return await self._run(self._after_stages, reply, ctx)
+
+    def run_stream(self, chunks: AsyncIterator[str], ctx: Dict[str, Any]) -> AsyncIterator[str]:
+        """Pipe a streamed reply through the stream hooks (after hooks see only full replies)."""
+        for fn in self._stream:
+            chunks = fn(chunks, ctx)
+        return chunks
 
 
 plugins = PluginManager()
@@ -0,0 +1,213 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+from typing import Any
+
+from ..config import Settings
+from .base import AIClient
+from .openai_client import OpenAIClient
+from .gpt4all_client import GPT4AllClient
+from .fallback_client import FallbackAIClient
+from .circuit import CircuitBreaker, breakers
+from .hedge import HedgedAIClient
+from .mock_client import MockAIClient
+from .gemini_client import GeminiClient
+from .cache import CachedAIClient, ResponseCache
+from .coalesce import CoalescingAIClient
+from .similarity_cache import SimilarityCachedAIClient, SimilarityIndex
+
+# Settings fields a chain depends on; a change to any of them triggers a rebuild.
+CHAIN_FIELDS = (
+    "ai_provider",
+    "openai_api_key",
+    "openai_model",
+    "gemini_api_key",
+    "gemini_model",
+    "gpt4all_model_path",
+    "gpt4all_replicas",
+    "gpt4all_queue_limit",
+    "gpt4all_batch_max_size",
+    "gpt4all_batch_wait_ms",
+    "response_cache_size",
+    "response_cache_ttl",
+    "response_cache_max_temperature",
+    "similarity_cache_size",
+    "similarity_cache_ttl",
+    "similarity_cache_threshold",
+    "coalesce_requests",
+    "breaker_window_seconds",
+    "breaker_min_calls",
+    "breaker_error_rate",
+    "breaker_slow_call_seconds",
+    "breaker_open_seconds",
+    "hedge_requests",
+    "hedge_percentile",
+    "hedge_min_delay_ms",
+    "hedge_max_delay_ms",
+)
+
+
+def _fingerprint(settings: Settings) -> tuple[Any, ...]:
+    return tuple(getattr(settings, name) for name in CHAIN_FIELDS)
+
+
+def _breaker(client: AIClient, settings: Settings) -> CircuitBreaker:
+    return breakers.get(type(client).__name__, settings, probe=client.probe)
+
+
+def _hedged(primary: AIClient, secondary: AIClient, settings: Settings) -> AIClient:
+    """Hedge ``primary`` with ``secondary`` (possibly the same provider); Mock answers if both fail."""
+    guarded = FallbackAIClient(primary, breaker=_breaker(primary, settings))
+    hedge = guarded if secondary is primary else FallbackAIClient(secondary, breaker=_breaker(secondary, settings))
+    return HedgedAIClient(
+        guarded,
+        hedge,
+        MockAIClient(),
+        percentile=settings.hedge_percentile,
+        min_delay=settings.hedge_min_delay_ms / 1000,
+        max_delay=settings.hedge_max_delay_ms / 1000,
+    )
+
+
+def build_chain(settings: Settings) -> AIClient:
+    """Construct the provider chain for ``settings.ai_provider``.
+
+    Raises ValueError for an unknown provider.
+    """
+    provider = settings.ai_provider.lower()
+    if provider == "mock":
+        return MockAIClient()
+    if provider == "openai":
+        # If no API key or a placeholder key (contains '...'), use mock directly.
+        key = settings.openai_api_key or os.getenv("OPENAI_API_KEY") or ""
+        if (not key) or ("..." in key):
+            return MockAIClient()
+        primary = OpenAIClient(settings)
+        # Build a fallback chain: OpenAI -> (optional GPT4All) -> Mock
+        # Always end with Mock as final safety net so chatting works offline / on API errors
+        tail: AIClient = MockAIClient()
+        # Try GPT4All
+        gpt4all_client: AIClient | None = None
+        try:
+            gpt4all_client = GPT4AllClient(settings)
+        except Exception:
+            pass
+        if settings.hedge_requests:
+            return _hedged(primary, gpt4all_client or primary, settings)
+        if gpt4all_client is not None:
+            tail = FallbackAIClient(gpt4all_client, tail, breaker=_breaker(gpt4all_client, settings))
+        return FallbackAIClient(primary, tail, breaker=_breaker(primary, settings))
+    if provider == "gpt4all":
+        return GPT4AllClient(settings)
+    if provider == "gemini":
+        key = settings.gemini_api_key or os.getenv("GEMINI_API_KEY") or ""
+        if (not key) or ("..." in key):
+            return MockAIClient()
+        try:
+            primary: AIClient = GeminiClient(settings)
+        except Exception:
+            return MockAIClient()
+        if settings.hedge_requests:
+            return _hedged(primary, primary, settings)
+        # Add Mock fallback always for resilience
+        return FallbackAIClient(primary, MockAIClient(), breaker=_breaker(primary, settings))
+    raise ValueError(f"Unknown AI_PROVIDER: {settings.ai_provider}")
+
+
+def provider_model(settings: Settings) -> str:
+    provider = settings.ai_provider.lower()
+    if provider == "openai":
+        return settings.openai_model
+    if provider == "gemini":
+        return settings.gemini_model
+    if provider == "gpt4all":
+        return settings.gpt4all_model_path
+    return provider
+
+
+def wrap_chain(client: AIClient, settings: Settings) -> AIClient:
+    """Add the request-level layers around a provider chain, innermost first:
+    single-flight coalescing, similarity cache, response cache."""
+    if settings.coalesce_requests:
+        client = CoalescingAIClient(client, provider=settings.ai_provider.lower(), model=provider_model(settings))
+    if settings.similarity_cache_size > 0:
+        index = SimilarityIndex(
+            settings.similarity_cache_size,
+            settings.similarity_cache_ttl,
+            threshold=settings.similarity_cache_threshold,
+        )
+        client = SimilarityCachedAIClient(
+            client,
+            index,
+            provider=settings.ai_provider.lower(),
+            model=provider_model(settings),
+            max_temperature=settings.response_cache_max_temperature,
+        )
+    if settings.response_cache_size > 0:
+        cache = ResponseCache(settings.response_cache_size, settings.response_cache_ttl)
+        client = CachedAIClient(
+            client,
+            cache,
+            provider=settings.ai_provider.lower(),
+            model=provider_model(settings),
+            max_temperature=settings.response_cache_max_temperature,
+        )
+    return client
+
+
+class ProviderRegistry:
+    """Keeps one long-lived provider chain per configured provider.
+
+    Chains are built on first use (normally during application startup) and
+    reused for every request. A chain is rebuilt only when one of the
+    ``CHAIN_FIELDS`` settings it was built from changes; the replaced chain is
+    closed on shutdown so in-flight requests can still finish with it.
+    """
+
+    def __init__(self) -> None:
+        self._chains: dict[str, tuple[tuple[Any, ...], AIClient, AIClient]] = {}
+        self._retired: list[AIClient] = []
+        self._lock = threading.Lock()
+
+    def _entry(self, settings: Settings) -> tuple[tuple[Any, ...], AIClient, AIClient]:
+        provider = settings.ai_provider.lower()
+        fingerprint = _fingerprint(settings)
+        entry = self._chains.get(provider)
+        if entry is not None and entry[0] == fingerprint:
+            return entry
+        with self._lock:
+            entry = self._chains.get(provider)
+            if entry is not None and entry[0] == fingerprint:
+                return entry
+            bare = build_chain(settings)
+            if entry is not None:
+                self._retired.append(entry[1])
+            entry = self._chains[provider] = (fingerprint, wrap_chain(bare, settings), bare)
+            return entry
+
+    def get(self, settings: Settings) -> AIClient:
+        return self._entry(settings)[1]
+
+    def get_bare(self, settings: Settings) -> AIClient:
+        """The same chain without the request-level layers, for prompts that must not be cached or shared."""
+        return self._entry(settings)[2]
+
+    async def warmup(self, settings: Settings) -> AIClient:
+        client = self.get(settings)
+        await client.warmup()
+        return client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            clients = [client for _, client, _ in self._chains.values()] + self._retired
+            self._chains.clear()
+            self._retired = []
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception:  # noqa: BLE001
+                logging.exception("Error closing AI client %s", type(client).__name__)
+
+
+provider_registry = ProviderRegistry()
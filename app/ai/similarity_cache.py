@@ -0,0 +1,249 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+import copy
+from operator import eq
+import re
+import time
+from typing import Any, AsyncIterator, Callable
+
+from .base import AIClient
+from ..metrics import metrics
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_M64 = (1 << 64) - 1
+_EMPTY = _M64
+_OFFSET = 0x9E3779B97F4A7C15
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class MinHasher:
+    """One-permutation MinHash signatures over character shingles.
+
+    Each shingle is hashed once and kept only if it is the minimum of its bin
+    (``hash % num_perm``); empty bins are filled from the next non-empty bin
+    (rotation densification). Cost is linear in the text length rather than
+    ``num_perm`` times it. Signatures are only comparable within one process
+    because ``hash`` of ``str`` is salted per interpreter.
+    """
+
+    def __init__(self, num_perm: int = 60, shingle_size: int = 4):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def shingles(self, text: str) -> set[str]:
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i : i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text: str) -> array:
+        k = self.num_perm
+        if np is not None:
+            values = np.fromiter((hash(s) & _M64 for s in self.shingles(text)), dtype=np.uint64)
+            sig_np = np.full(k, _EMPTY, dtype=np.uint64)
+            np.minimum.at(sig_np, (values % np.uint64(k)).astype(np.intp), values)
+            sig = sig_np.tolist()
+        else:
+            sig = [_EMPTY] * k
+            for s in self.shingles(text):
+                h = hash(s) & _M64
+                b = h % k
+                if h < sig[b]:
+                    sig[b] = h
+        if _EMPTY in sig:
+            # Fill each empty bin from the next non-empty bin (circularly); the
+            # distance-dependent offset keeps borrowed values distinct.
+            original = sig[:]
+            nearest = -1
+            for i in range(2 * k - 1, -1, -1):
+                b = i % k
+                if original[b] != _EMPTY:
+                    nearest = b
+                elif i < k and nearest >= 0:
+                    sig[b] = (original[nearest] + (nearest - b) % k * _OFFSET) & _M64
+        return array("Q", sig)
+
+
+def estimate_jaccard(a: array, b: array) -> float:
+    return sum(map(eq, a, b)) / len(a)
+
+
+class _Entry:
+    __slots__ = ("scope", "signature", "result", "expires_at", "band_keys")
+
+    def __init__(self, scope: Any, signature: array, result: dict[str, Any], expires_at: float, band_keys: list[int]):
+        self.scope = scope
+        self.signature = signature
+        self.result = result
+        self.expires_at = expires_at
+        self.band_keys = band_keys
+
+
+class SimilarityIndex:
+    """LSH table of MinHash signatures with LRU + TTL eviction.
+
+    Signatures are split into ``bands`` of ``num_perm // bands`` rows; two
+    prompts become candidates when any band matches, and a candidate is
+    accepted if its estimated Jaccard similarity reaches ``threshold``.
+    Each bucket keeps only its ``max_bucket`` most recent entries, which bounds
+    lookup work for prompts made mostly of very common phrases.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        threshold: float = 0.8,
+        num_perm: int = 60,
+        bands: int = 10,
+        max_bucket: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_bucket = max_bucket
+        self.clock = clock
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        # band key -> entry id, or a list of ids once a bucket holds several.
+        self._buckets: dict[int, int | list[int]] = {}
+        self._next_id = 0
+        self._hits = metrics.counter("similarity_cache.hits")
+        self._misses = metrics.counter("similarity_cache.misses")
+        self._evictions = metrics.counter("similarity_cache.evictions")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, scope: Any, signature: array) -> list[int]:
+        r = self.rows
+        return [hash((scope, i, tuple(signature[i * r : (i + 1) * r]))) for i in range(self.bands)]
+
+    def lookup(self, scope: Any, text: str) -> tuple[dict[str, Any], float] | None:
+        signature = self.hasher.signature(normalize(text))
+        now = self.clock()
+        best: tuple[int, float] | None = None
+        seen: set[int] = set()
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for entry_id in (bucket if isinstance(bucket, list) else (bucket,)):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                entry = self._entries[entry_id]
+                if entry.scope != scope or entry.expires_at <= now:
+                    continue
+                similarity = estimate_jaccard(signature, entry.signature)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity)
+        if best is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        self._entries.move_to_end(best[0])
+        return copy.deepcopy(self._entries[best[0]].result), best[1]
+
+    def add(self, scope: Any, text: str, result: dict[str, Any]) -> None:
+        signature = self.hasher.signature(normalize(text))
+        band_keys = self._band_keys(scope, signature)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(scope, signature, copy.deepcopy(result), self.clock() + self.ttl, band_keys)
+        for key in band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = entry_id
+            elif isinstance(bucket, list):
+                bucket.append(entry_id)
+                if len(bucket) > self.max_bucket:
+                    del bucket[0]
+            else:
+                self._buckets[key] = [bucket, entry_id]
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._evictions.inc()
+        for key in entry.band_keys:
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, list):
+                if entry_id in bucket:
+                    bucket.remove(entry_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket[0]
+            elif bucket == entry_id:
+                del self._buckets[key]
+
+
+class SimilarityCachedAIClient(AIClient):
+    """Answer single-turn prompts that nearly match a recent one from a ``SimilarityIndex``.
+
+    Only requests with exactly one user message (optionally preceded by system
+    messages) below ``max_temperature`` are eligible. Hits are marked with
+    ``usage["X-Cache"] = "SIMILAR"`` and the estimated ``cacheSimilarity``.
+    """
+
+    def __init__(self, inner: AIClient, index: SimilarityIndex, provider: str, model: str, max_temperature: float):
+        self.inner = inner
+        self.index = index
+        self.provider = provider
+        self.model = model
+        self.max_temperature = max_temperature
+
+    def _lookup_key(self, messages: list[dict[str, str]], max_tokens: int, temperature: float):
+        if temperature >= self.max_temperature or not messages or messages[-1].get("role") != "user":
+            return None
+        if any(m.get("role") != "system" for m in messages[:-1]):
+            return None
+        system = tuple(m.get("content") or "" for m in messages[:-1])
+        return (self.provider, self.model, system, max_tokens), messages[-1].get("content") or ""
+
+    async def chat(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> dict[str, Any]:
+        key = self._lookup_key(messages, max_tokens, temperature)
+        if key is None:
+            return await self.inner.chat(messages, max_tokens, temperature)
+        scope, text = key
+        found = self.index.lookup(scope, text)
+        if found is not None:
+            result, similarity = found
+            usage = result.setdefault("usage", {})
+            usage["X-Cache"] = "SIMILAR"
+            usage["cacheSimilarity"] = round(similarity, 3)
+            return result
+        result = await self.inner.chat(messages, max_tokens, temperature)
+        if len(result.get("usage", {}).get("provider_chain", ())) <= 1:
+            self.index.add(scope, text, result)
+        return result
+
+    async def stream(self, messages: list[dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        key = self._lookup_key(messages, max_tokens, temperature)
+        found = self.index.lookup(*key) if key is not None else None
+        if found is not None:
+            yield found[0]["reply"]
+            return
+        async for chunk in self.inner.stream(messages, max_tokens, temperature):
+            yield chunk
+
+    async def warmup(self) -> None:
+        await self.inner.warmup()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import asyncio
+from functools import lru_cache
+import logging
+import re
+from typing import Iterable
+
+from ..config import Settings, get_settings
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+# Role markers and separators a chat template adds around every message.
+MESSAGE_OVERHEAD = 4
+
+# Approximates BPE splits of English text: letters in runs of up to 6, digits
+# in runs of up to 3 (as cl100k/o200k do), and each punctuation mark alone.
+_PIECE = re.compile(r"\d{1,3}|[^\W\d]{1,6}|[^\w\s]")
+
+
+class Tokenizer(ABC):
+    name: str
+
+    @abstractmethod
+    def _count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def __init__(self, cache_size: int = 8192):
+        # Clients count the same history strings turn after turn; the cache
+        # turns a repeat into a hash lookup (str hashes are cached on the object).
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def count_messages(self, messages: Iterable[dict[str, str]]) -> int:
+        count = self.count
+        return sum(count(m.get("content") or "") + MESSAGE_OVERHEAD for m in messages)
+
+    def usage(self, messages: Iterable[dict[str, str]], reply: str) -> dict[str, int]:
+        prompt_tokens = self.count_messages(messages)
+        completion_tokens = self.count(reply)
+        return {
+            "promptTokens": prompt_tokens,
+            "completionTokens": completion_tokens,
+            "totalTokens": prompt_tokens + completion_tokens,
+        }
+
+
+class HeuristicTokenizer(Tokenizer):
+    """Regex approximation of a BPE vocabulary; usually within 15% of tiktoken on English prose."""
+
+    name = "heuristic"
+
+    def _count(self, text: str) -> int:
+        return len(_PIECE.findall(text))
+
+
+class TiktokenTokenizer(Tokenizer):
+    """Exact counts for OpenAI encodings; needs ``tiktoken`` and its encoding file (cached offline after first load)."""
+
+    def __init__(self, encoding: str = "o200k_base", cache_size: int = 8192):
+        if tiktoken is None:
+            raise RuntimeError("tiktoken package not installed")
+        super().__init__(cache_size)
+        self._encoding = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def _count(self, text: str) -> int:
+        return len(self._encoding.encode_ordinary(text))
+
+
+def make_tokenizer(settings: Settings) -> Tokenizer:
+    """``TOKENIZER=auto`` uses tiktoken when it loads and the heuristic otherwise."""
+    kind = settings.tokenizer.lower()
+    if kind == "heuristic":
+        return HeuristicTokenizer()
+    if kind not in ("auto", "tiktoken"):
+        raise ValueError(f"Unknown TOKENIZER: {settings.tokenizer}")
+    try:
+        return TiktokenTokenizer(settings.tokenizer_encoding)
+    except Exception as e:  # noqa: BLE001
+        if kind == "tiktoken":
+            raise
+        if tiktoken is not None:
+            logging.warning("tiktoken encoding %s unavailable (%s); using heuristic token counts", settings.tokenizer_encoding, e)
+        return HeuristicTokenizer()
+
+
+_tokenizer: Tokenizer | None = None
+
+
+async def load_tokenizer(settings: Settings) -> Tokenizer:
+    """Build the shared tokenizer off the event loop; called from the app lifespan.
+
+    The first ``tiktoken.get_encoding`` may download its BPE file, which must
+    not stall requests. ``get_tokenizer`` builds inline only when nothing has
+    loaded it (tests and scripts without a lifespan).
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = await asyncio.to_thread(make_tokenizer, settings)
+    return _tokenizer
+
+
+def get_tokenizer(settings: Settings | None = None) -> Tokenizer:
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = make_tokenizer(settings or get_settings())
+    return _tokenizer
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from contextlib import asynccontextmanager
+import logging
+from typing import Any, AsyncIterator
+import httpx
+from ..config import Settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPTransport:
+    """App-lifetime pooled HTTP client shared by the remote AI providers.
+
+    Keeps TCP/TLS connections alive between requests so provider latency is
+    not dominated by connection setup. The underlying ``httpx.AsyncClient`` is
+    created on first use and closed by ``aclose`` on shutdown.
+    """
+
+    def __init__(self, settings: Settings):
+        self.limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=settings.http_connect_timeout,
+            read=settings.http_read_timeout,
+            write=settings.http_write_timeout,
+            pool=settings.http_pool_timeout,
+        )
+        self.http2 = settings.http2 and HTTP2_AVAILABLE
+        if settings.http2 and not HTTP2_AVAILABLE:
+            logging.warning("HTTP2=true but the 'h2' package is not installed; using HTTP/1.1")
+        self._client: httpx.AsyncClient | None = None
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._client
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        self._enter()
+        try:
+            return await self.client.request(method, url, **kwargs)
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._exit()
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        self._enter()
+        try:
+            async with self.client.stream(method, url, **kwargs) as resp:
+                yield resp
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._exit()
+
+    def _enter(self) -> None:
+        self._requests += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _exit(self) -> None:
+        self._in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        connections = idle = 0
+        # httpx does not expose pool state publicly; read it defensively from httpcore.
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        for conn in getattr(pool, "connections", []) or []:
+            connections += 1
+            try:
+                idle += 1 if conn.is_idle() else 0
+            except Exception:  # noqa: BLE001
+                pass
+        return {
+            "http2": self.http2,
+            "requests": self._requests,
+            "errors": self._errors,
+            "inFlight": self._in_flight,
+            "peakInFlight": self._peak_in_flight,
+            "connections": connections,
+            "idleConnections": idle,
+            "maxConnections": self.limits.max_connections,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_transport: HTTPTransport | None = None
+
+
+def get_http_transport(settings: Settings) -> HTTPTransport:
+    global _transport
+    if _transport is None:
+        _transport = HTTPTransport(settings)
+    return _transport
+
+
+async def close_http_transport() -> None:
+    global _transport
+    if _transport is not None:
+        await _transport.aclose()
+        _transport = None
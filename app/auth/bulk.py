@@ -0,0 +1,152 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import io
+from functools import lru_cache
+import json
+import multiprocessing
+import os
+from typing import Any, AsyncIterator, Deque, Iterable, Iterator, List
+import uuid
+
+from pydantic import ValidationError
+
+from ..metrics import metrics
+from .hashing import password_context
+from .schemas import UserImportRow
+from .service import User, UserService
+
+
+@lru_cache(maxsize=4)
+def _context(rounds: int):
+    return password_context(rounds)
+
+
+def hash_passwords(rounds: int, passwords: List[str]) -> List[str]:
+    """Runs in a worker process; top level so it pickles by reference."""
+    context = _context(rounds)
+    return [context.hash(p) for p in passwords]
+
+
+def parse_rows(text: str, fmt: str) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    """``(row number, fields)`` for each record, or ``(row number, error)`` when it cannot be read.
+
+    ``csv`` needs a header row naming at least ``email`` and ``password``;
+    empty or missing trailing values count as absent. ``ndjson`` is one JSON object per line. Blank lines are skipped.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        fieldnames = [h.strip().lower() for h in reader.fieldnames or []]
+        reader.fieldnames = fieldnames
+        for row, record in enumerate(reader, 1):
+            if None in record:
+                yield row, f"more than {len(fieldnames)} columns"
+                continue
+            yield row, {k: v.strip() for k, v in record.items() if v and v.strip()}
+        return
+    row = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield row, f"invalid JSON: {e}"
+            continue
+        yield row, fields if isinstance(fields, dict) else "expected a JSON object"
+
+
+class UserImporter:
+    """Creates users from parsed rows, hashing passwords across a process pool.
+
+    Rows are validated and deduplicated (against the email index and
+    earlier rows of the same import) as they are read; invalid and duplicate
+    rows are reported at once. Valid rows are grouped into chunks of
+    ``batch_size``, and each chunk is hashed in a worker process. Up to
+    ``2 * workers`` chunks are in flight while parsing continues. Finished
+    chunks are inserted with one ``UserService.add_users`` call each.
+    Results are yielded per row, so they are not always in input order,
+    followed by a final totals object.
+    """
+
+    def __init__(self, users: UserService, rounds: int, workers: int = 0, batch_size: int = 32):
+        self.users = users
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._created = metrics.counter("auth.import.created")
+
+    async def run(self, rows: Iterable[tuple[int, dict[str, Any] | str]]) -> AsyncIterator[dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        totals = {"created": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+        seen: set[str] = set()
+        chunk: List[tuple[int, UserImportRow]] = []
+        in_flight: Deque[tuple[List[tuple[int, UserImportRow]], asyncio.Future]] = deque()
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        def submit() -> None:
+            passwords = [r.password for _, r in chunk]
+            in_flight.append((list(chunk), loop.run_in_executor(pool, hash_passwords, self.rounds, passwords)))
+            chunk.clear()
+
+        async def finish_oldest() -> List[dict[str, Any]]:
+            done, future = in_flight.popleft()
+            hashes = await future
+            new_users = [
+                User(id=str(uuid.uuid4()), email=r.email, password_hash=h, role=r.role) for (_, r), h in zip(done, hashes)
+            ]
+            results = []
+            for (row, r), user, created in zip(done, new_users, self.users.add_users(new_users)):
+                if created:
+                    self._created.inc()
+                    totals["created"] += 1
+                    results.append({"row": row, "email": r.email, "status": "created", "id": user.id})
+                else:  # taken by a concurrent import or signup since the row was checked
+                    totals["exists"] += 1
+                    results.append({"row": row, "email": r.email, "status": "exists"})
+            return results
+
+        try:
+            for row, fields in rows:
+                if isinstance(fields, str):
+                    totals["invalid"] += 1
+                    yield {"row": row, "status": "invalid", "error": fields}
+                    continue
+                try:
+                    parsed = UserImportRow.model_validate(fields)
+                except ValidationError as e:
+                    totals["invalid"] += 1
+                    yield {"row": row, "email": fields.get("email"), "status": "invalid", "error": _first_error(e)}
+                    continue
+                if parsed.email in seen:
+                    totals["duplicate"] += 1
+                    yield {"row": row, "email": parsed.email, "status": "duplicate"}
+                    continue
+                seen.add(parsed.email)
+                if self.users.get_user_by_email(parsed.email) is not None:
+                    totals["exists"] += 1
+                    yield {"row": row, "email": parsed.email, "status": "exists"}
+                    continue
+                chunk.append((row, parsed))
+                if len(chunk) >= self.batch_size:
+                    submit()
+                    while len(in_flight) > 2 * self.workers or (in_flight and in_flight[0][1].done()):
+                        for result in await finish_oldest():
+                            yield result
+            if chunk:
+                submit()
+            while in_flight:
+                for result in await finish_oldest():
+                    yield result
+            yield {"done": True, **totals}
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _first_error(e: ValidationError) -> str:
+    err = e.errors()[0]
+    field = ".".join(str(p) for p in err["loc"])
+    return f"{field}: {err['msg']}" if field else err["msg"]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+from typing import Callable, TypeVar
+
+from passlib.context import CryptContext
+
+from ..config import Settings
+from ..metrics import metrics
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing worker is busy and the wait queue is full."""
+
+
+def password_context(rounds: int) -> CryptContext:
+    """bcrypt at ``rounds``; hashes made at any other cost report ``needs_update``."""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def make_password_context(settings: Settings) -> CryptContext:
+    return password_context(settings.bcrypt_rounds)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so it never blocks the event loop.
+
+    The bcrypt backend releases the GIL while hashing, so ``workers`` threads
+    use that many cores. At most ``workers + queue_limit`` operations are
+    admitted at once; beyond that ``PasswordHasherBusy`` is raised straight
+    away so the caller can answer 503 instead of piling up logins.
+    """
+
+    def __init__(self, context: CryptContext, workers: int = 0, queue_limit: int = 64):
+        self.context = context
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._rejected = metrics.counter("auth.hash_rejected")
+        self._rehashed = metrics.counter("auth.rehashed")
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self._pending >= self.workers + self.queue_limit:
+            self._rejected.inc()
+            raise PasswordHasherBusy()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """``(valid, new_hash)``; ``new_hash`` is set when the stored hash used another cost."""
+        ok, new_hash = await self._run(self.context.verify_and_update, password, password_hash)
+        if new_hash is not None:
+            self._rehashed.inc()
+        return ok, new_hash
+
+    def snapshot(self) -> dict[str, int]:
+        return {"workers": self.workers, "pending": self._pending, "queueLimit": self.queue_limit}
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from .schemas import LoginRequest, TokenResponse
-from ..deps import get_settings, get_user_service, create_access_token
+from ..deps import get_settings, get_user_service, create_access_token, require_role
 from ..config import Settings
-from ..auth.service import UserService
+from ..auth.bulk import UserImporter, parse_rows
+from ..auth.hashing import PasswordHasherBusy
+from ..auth.service import User, UserService
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -14,8 +19,44 @@ async def login(
     user_service: UserService = Depends(get_user_service),
 ) -> TokenResponse:
     """Authenticate a user and return a JWT access token."""
-    user = user_service.get_user_by_email(payload.email)
-    if not user or not user_service.verify_password(payload.password, user.password_hash):
+    try:
+        user = await user_service.authenticate(payload.email, payload.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress", headers={"Retry-After": "1"})
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token(user.id, user.role, settings)
     return TokenResponse(access_token=token, role=user.role)
+
+
+admin_router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@admin_router.post("/users/import")
+async def import_users(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$"),
+    settings: Settings = Depends(get_settings),
+    user_service: UserService = Depends(get_user_service),
+    user: User = Depends(require_role("admin")),
+):
+    """Create users from a CSV (header ``email,password[,role]``) or NDJSON body.
+
+    The format comes from ``format`` or else the ``Content-Type``. The
+    response streams one JSON object per row (``created`` with ``id``,
+    ``exists``, ``duplicate`` or ``invalid`` with ``error``) as the batches
+    finish, then a final object with the totals.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        text = (await request.body()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+    importer = UserImporter(user_service, settings.bcrypt_rounds, settings.user_import_workers, settings.user_import_batch)
+
+    async def lines():
+        async for result in importer.run(parse_rows(text, format)):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from typing import Literal
+
+from pydantic import BaseModel, EmailStr, Field
 
 
 class LoginRequest(BaseModel):
@@ -11,3 +13,10 @@ class TokenResponse(BaseModel):
     access_token: str
     role: str
     token_type: str = "bearer"
+
+
+class UserImportRow(BaseModel):
+    """One row of a bulk user import."""
+    email: EmailStr
+    password: str = Field(min_length=1)
+    role: Literal["student", "admin"] = "student"
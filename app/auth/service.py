@@ -1,9 +1,11 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import uuid
 from passlib.context import CryptContext
 
+from .hashing import PasswordHasher
+
 
 @dataclass
 class User:
@@ -14,25 +16,59 @@ class User:
 
 
 class UserService:
-    def __init__(self, pwd_context: CryptContext):
-        self._pwd = pwd_context
+    """In-memory users with hash indexes by id and by email; ``create_user`` keeps both in step."""
+
+    def __init__(self, pwd_context: CryptContext, hasher: PasswordHasher | None = None):
+        self.hasher = hasher or PasswordHasher(pwd_context)
         self._users: Dict[str, User] = {}
-        self.create_user("student@example.com", "password", role="student")
-        self.create_user("admin@example.com", "password", role="admin")
+        self._by_email: Dict[str, User] = {}
+        # Demo accounts; built with the service at import time, before any event loop runs.
+        for email, role in (("student@example.com", "student"), ("admin@example.com", "admin")):
+            self.add_users([User(id=str(uuid.uuid4()), email=email, password_hash=pwd_context.hash("password"), role=role)])
+
+    async def create_user(self, email: str, password: str, role: str = "student") -> User:
+        """The new user, with the password hashed on the hasher's pool, or the existing one for ``email``.
 
-    def create_user(self, email: str, password: str, role: str = "student") -> User:
+        Raises ``PasswordHasherBusy`` when the pool is saturated.
+        """
         existing = self.get_user_by_email(email)
         if existing:
             return existing
-        user = User(id=str(uuid.uuid4()), email=email, password_hash=self._pwd.hash(password), role=role)
-        self._users[user.id] = user
+        user = User(id=str(uuid.uuid4()), email=email, password_hash=await self.hasher.hash(password), role=role)
+        if not self.add_users([user])[0]:
+            return self._by_email[email]  # created by a concurrent call while hashing
         return user
 
+    def add_users(self, users: List[User]) -> List[bool]:
+        """Insert already-hashed users in one step; False where the email is taken."""
+        added = []
+        for user in users:
+            ok = user.email not in self._by_email
+            if ok:
+                self._users[user.id] = user
+                self._by_email[user.email] = user
+            added.append(ok)
+        return added
+
     def get_user_by_email(self, email: str) -> Optional[User]:
-        return next((u for u in self._users.values() if u.email == email), None)
+        return self._by_email.get(email)
 
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         return self._users.get(user_id)
 
-    def verify_password(self, plain: str, password_hash: str) -> bool:
-        return self._pwd.verify(plain, password_hash)
+    async def authenticate(self, email: str, password: str) -> Optional[User]:
+        """The user if the password matches, checked on the hasher's pool.
+
+        A hash made at an outdated bcrypt cost is replaced with one at the
+        current cost while the plain password is at hand.
+        Raises ``PasswordHasherBusy`` when the pool is saturated.
+        """
+        user = self.get_user_by_email(email)
+        if not user:
+            return None
+        ok, new_hash = await self.hasher.verify_and_update(password, user.password_hash)
+        if not ok:
+            return None
+        if new_hash is not None:
+            user.password_hash = new_hash
+        return user
@@ -0,0 +1,74 @@
+from __future__ import annotations
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Any, Callable
+
+import jwt
+
+from ..config import Settings
+from ..metrics import metrics
+
+
+class TokenClaimsCache:
+    """Size-bounded LRU of verified JWT claims, each entry valid until the token's ``exp``.
+
+    Keys are a keyed BLAKE2b digest of the token (keyed by the signing
+    secret), so the raw bearer token is never held, and a token verified
+    under one secret is not accepted under another. Only successful
+    verifications are cached; tokens without ``exp`` always go through the
+    full HMAC check.
+
+    ``get_current_user`` runs on threadpool threads while the rate limiter
+    uses the cache on the event loop, so entry updates are done under a lock.
+    The HMAC check on a miss runs outside it.
+    """
+
+    def __init__(self, secret: str, max_entries: int = 10000, clock: Callable[[], float] = time.time):
+        self.secret = secret
+        self.max_entries = max_entries
+        self.clock = clock
+        self._key = hashlib.blake2b(secret.encode(), digest_size=32).digest()
+        self._entries: OrderedDict[bytes, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = metrics.counter("auth.token_cache.hits")
+        self._misses = metrics.counter("auth.token_cache.misses")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        """Verified claims of ``token``; raises ``jwt`` errors exactly like ``jwt.decode``."""
+        digest = hashlib.blake2b(token.encode(), key=self._key, digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            fresh = entry is not None and entry[0] > self.clock()
+            if fresh:
+                self._entries.move_to_end(digest)
+            elif entry is not None:
+                del self._entries[digest]
+        if fresh:
+            self._hits.inc()
+            return entry[1]
+        if entry is not None:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        self._misses.inc()
+        claims = jwt.decode(token, self.secret, algorithms=["HS256"])
+        exp = claims.get("exp")
+        if self.max_entries > 0 and isinstance(exp, (int, float)):
+            with self._lock:
+                self._entries[digest] = (float(exp), claims)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return claims
+
+
+_cache: TokenClaimsCache | None = None
+
+
+def get_token_cache(settings: Settings) -> TokenClaimsCache:
+    global _cache
+    if _cache is None or _cache.secret != settings.jwt_secret:
+        _cache = TokenClaimsCache(settings.jwt_secret, settings.auth_token_cache_size)
+    return _cache
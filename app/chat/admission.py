@@ -0,0 +1,180 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+import math
+import time
+from typing import Any, Callable
+
+from fastapi import Depends, HTTPException
+
+from ..config import Settings, get_settings
+from ..metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("admission queue full or deadline passed")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for provider-bound requests that follows observed latency.
+
+    Gradient style: the limit is scaled by ``long_rtt / short_rtt`` (clamped to
+    ``[0.5, 1]`` after a ``tolerance`` allowance), plus ``sqrt(limit)`` of
+    headroom so it can grow while latency is flat. Growth is skipped while
+    less than half the limit is in use. Failed requests shrink the limit
+    multiplicatively (``backoff``). Requests over the limit wait in a FIFO
+    queue of ``queue_size`` for at most ``queue_timeout`` seconds; anything
+    beyond that is rejected so the caller can shed it.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        queue_size: int = 50,
+        queue_timeout: float = 5.0,
+        smoothing: float = 0.2,
+        tolerance: float = 1.5,
+        backoff: float = 0.9,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.clock = clock
+        self.in_flight = 0
+        self.long_rtt = 0.0
+        self.last_rtt = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._queue_wait = metrics.histogram("admission.queue_wait_seconds")
+        self._shed = metrics.counter("admission.shed")
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the start time to pass to ``release``."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return self.clock()
+        if len(self._waiters) >= self.queue_size:
+            self._shed.inc()
+            raise AdmissionRejected(self.retry_after())
+        queued = self.clock()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()  # the slot was handed over just before the deadline or cancellation
+            if isinstance(exc, asyncio.TimeoutError):
+                self._shed.inc()
+                raise AdmissionRejected(self.retry_after()) from None
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        now = self.clock()
+        self._queue_wait.observe(now - queued)
+        return now
+
+    def release(self, started: float, ok: bool | None = True) -> None:
+        """``ok=None`` frees the slot without a sample (e.g. a request rejected before any provider work)."""
+        if ok:
+            self._on_sample(self.clock() - started)
+        elif ok is not None:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._release_slot()
+
+    def _on_sample(self, rtt: float) -> None:
+        self.last_rtt = rtt
+        if self.long_rtt == 0.0:
+            self.long_rtt = rtt
+            return
+        # The long-term average moves slowly so sustained slowdowns register as a gradient.
+        self.long_rtt += (rtt - self.long_rtt) * 0.05
+        if self.in_flight < self.limit / 2:
+            return  # app-limited: latency says nothing about capacity
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / max(rtt, 1e-6)))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit, self.limit * (1 - self.smoothing) + target * self.smoothing))
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def retry_after(self) -> float:
+        return max(1.0, self.long_rtt)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inFlight": self.in_flight,
+            "queued": len(self._waiters),
+            "rtt": round(self.last_rtt, 4),
+            "longRtt": round(self.long_rtt, 4),
+        }
+
+
+_limiter: AdaptiveLimiter | None = None
+
+
+def get_admission_limiter(settings: Settings) -> AdaptiveLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveLimiter(
+            initial_limit=settings.chat_concurrency_initial,
+            min_limit=settings.chat_concurrency_min,
+            max_limit=settings.chat_concurrency_max,
+            queue_size=settings.chat_queue_size,
+            queue_timeout=settings.chat_queue_timeout,
+        )
+    return _limiter
+
+
+class AdmissionSlot:
+    """Yielded by ``admit_chat``. A streaming route calls ``fail()`` when the
+    provider errors after the response has started, since that error becomes
+    an SSE frame rather than an exception the dependency can see."""
+
+    __slots__ = ("ok",)
+
+    def __init__(self) -> None:
+        self.ok: bool | None = True
+
+    def fail(self) -> None:
+        self.ok = False
+
+
+async def admit_chat(settings: Settings = Depends(get_settings)):
+    """Route dependency holding an admission slot for the whole request, streamed body included."""
+    limiter = get_admission_limiter(settings)
+    try:
+        started = await limiter.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503, detail="Server busy", headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    slot = AdmissionSlot()
+    try:
+        yield slot
+    except HTTPException as e:
+        slot.ok = None if e.status_code < 500 else False
+        raise
+    except Exception:
+        slot.ok = False
+        raise
+    finally:
+        limiter.release(started, slot.ok)
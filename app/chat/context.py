@@ -0,0 +1,135 @@
+from __future__ import annotations
+from collections import OrderedDict, deque
+from typing import Deque, List
+
+from ..ai.tokenizer import MESSAGE_OVERHEAD, Tokenizer, get_tokenizer
+from ..config import Settings
+from ..models.conversation import Conversation
+
+
+class ContextWindow:
+    """The most recent turns of one conversation with a running token total.
+
+    ``count`` is how many of the conversation's messages have been seen
+    (including ones without stored content), so the owner can tell which
+    messages are new. Appending is O(1) amortized: the oldest turns are
+    dropped once the rest still cover ``capacity`` tokens. Turns are
+    ``(message index, role, content, tokens)``.
+    """
+
+    __slots__ = ("capacity", "count", "tokens", "_turns")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = 0
+        self.tokens = 0
+        self._turns: Deque[tuple[int, str, str, int]] = deque()
+
+    def append(self, role: str, content: str | None, tokens: int) -> None:
+        index = self.count
+        self.count += 1
+        if not content:
+            return
+        self._turns.append((index, role, content, tokens))
+        self.tokens += tokens
+        while len(self._turns) > 1 and self.tokens - self._turns[0][3] >= self.capacity:
+            self.tokens -= self._turns.popleft()[3]
+
+    def prepend(self, index: int, role: str, content: str, tokens: int) -> bool:
+        """Add an older turn while rebuilding; False once the window is full."""
+        if self.tokens >= self.capacity:
+            return False
+        self._turns.appendleft((index, role, content, tokens))
+        self.tokens += tokens
+        return True
+
+    def select(self, budget: int, start: int = 0) -> List[dict[str, str]]:
+        """Newest turns from message ``start`` on whose total fits ``budget``, oldest first.
+
+        The newest turn is always included.
+        """
+        picked: List[tuple[int, str, str, int]] = []
+        used = 0
+        for turn in reversed(self._turns):
+            if turn[0] < start or (picked and used + turn[3] > budget):
+                break
+            picked.append(turn)
+            used += turn[3]
+        return [{"role": role, "content": content} for _, role, content, _ in reversed(picked)]
+
+
+class ContextBuilder:
+    """Provider context for stored conversations, one policy for every ``AIClient``.
+
+    History is chosen by token budget: ``context_tokens`` (the model's
+    context size) minus the reply's ``max_tokens``, newest messages first.
+    Each conversation keeps a ``ContextWindow`` that is brought up to date
+    with only the messages appended since the last turn; windows are kept
+    for the ``max_windows`` most recently used conversations and rebuilt
+    from the newest messages backwards after eviction or a restart. Once
+    ``chat.summary`` has folded older turns into ``Conversation.summary``,
+    the summary goes first and only later messages follow. Token
+    counts come from ``tokenizer`` and are cached on the messages, so a
+    rebuild does not count them again.
+    """
+
+    def __init__(
+        self,
+        context_tokens: int = 4096,
+        max_windows: int = 10000,
+        tokenizer: Tokenizer | None = None,
+    ):
+        self.context_tokens = context_tokens
+        self.max_windows = max_windows
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._windows: OrderedDict[str, ContextWindow] = OrderedDict()
+
+    def window(self, conv: Conversation) -> ContextWindow:
+        messages = conv.messages
+        window = self._windows.get(conv.id)
+        if window is None or window.count > len(messages):
+            window = self._rebuild(conv)
+        else:
+            self._windows.move_to_end(conv.id)
+            count = self.tokenizer.count
+            for i in range(window.count, len(messages)):
+                role, content = messages.turn(i)
+                window.append(role, content, messages.tokens(i, count) + MESSAGE_OVERHEAD)
+        return window
+
+    def _rebuild(self, conv: Conversation) -> ContextWindow:
+        messages = conv.messages
+        window = ContextWindow(self.context_tokens)
+        count = self.tokenizer.count
+        for i in range(len(messages) - 1, -1, -1):
+            role, content = messages.turn(i)
+            if content and not window.prepend(i, role, content, messages.tokens(i, count) + MESSAGE_OVERHEAD):
+                break
+        window.count = len(messages)
+        self._windows[conv.id] = window
+        if len(self._windows) > self.max_windows:
+            self._windows.popitem(last=False)
+        return window
+
+    def build(self, conv: Conversation, max_tokens: int) -> List[dict[str, str]]:
+        """History for the next reply; a conversation summary replaces the messages it covers."""
+        budget = max(self.context_tokens - max_tokens, 0)
+        window = self.window(conv)
+        if not conv.summary:
+            return window.select(budget)
+        summary = {"role": "system", "content": f"Summary of the earlier conversation: {conv.summary}"}
+        budget -= self.tokenizer.count(summary["content"]) + MESSAGE_OVERHEAD
+        return [summary] + window.select(budget, conv.summary_upto)
+
+    def discard(self, conversation_id: str) -> None:
+        self._windows.pop(conversation_id, None)
+
+
+_builder: ContextBuilder | None = None
+
+
+def get_context_builder(settings: Settings) -> ContextBuilder:
+    global _builder
+    if _builder is None:
+        _builder = ContextBuilder(settings.context_tokens, settings.context_cache_size, get_tokenizer(settings))
+    return _builder
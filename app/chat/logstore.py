@@ -0,0 +1,726 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, TypeVar
+
+from ..models.conversation import Conversation, Message, MessageColumns, from_epoch_us, to_epoch_us
+from .store import InMemoryConversationStore
+
+# Record: payload length, crc32 of (type + payload), type; then the payload.
+_HEADER = struct.Struct("<IIB")
+_CONV, _MSG, _RENAME, _DELETE, _SUMMARY = 1, 2, 3, 4, 5
+_CONV_FIXED = struct.Struct("<qq")  # created_us, updated_us; then id, user_id, title
+_MSG_FIXED = struct.Struct("<IQIqB")  # prev segment, prev offset, seq, timestamp_us, flags
+_HAS_USER, _HAS_CONTENT = 1, 2
+_SUMMARY_FIXED = struct.Struct("<I")  # messages covered; then conversation id, summary
+_STR16 = struct.Struct("<H")
+_STR32 = struct.Struct("<I")
+
+_SNAPSHOT_MAGIC = b"GCLS0002"
+_SNAP_HEADER = struct.Struct("<8sIIQII")  # magic, next segment, position segment, position offset, #segments, #conversations
+# created_us, updated_us, count, head segment, head offset, live bytes, summary segment, summary offset, summary bytes
+_SNAP_CONV = struct.Struct("<qqIIQQIQI")
+_SNAP_CONV_V1 = struct.Struct("<qqIIQQ")  # GCLS0001: no summaries
+
+T = TypeVar("T")
+
+
+def _pack_str(s: str, prefix: struct.Struct = _STR16) -> bytes:
+    data = s.encode()
+    return prefix.pack(len(data)) + data
+
+
+def _read_str(buf, pos: int, prefix: struct.Struct = _STR16) -> tuple[str, int]:
+    (n,) = prefix.unpack_from(buf, pos)
+    pos += prefix.size
+    return str(buf[pos : pos + n], "utf-8"), pos + n
+
+
+class _Segment:
+    __slots__ = ("id", "path", "fd", "size", "map")
+
+    def __init__(self, seg_id: int, path: str):
+        self.id = seg_id
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self.size = os.fstat(self.fd).st_size
+        self.map: mmap.mmap | None = None
+
+    def view(self, end: int) -> memoryview:
+        """Read-only view of the file covering at least ``end`` bytes."""
+        if self.map is None or len(self.map) < end:
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.fd, self.size, prot=mmap.PROT_READ)
+        return memoryview(self.map)
+
+    def truncate(self, size: int) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        os.ftruncate(self.fd, size)
+        self.size = size
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+        os.close(self.fd)
+
+
+class _Head:
+    __slots__ = ("seg", "off", "count", "bytes", "sum_seg", "sum_off", "sum_bytes")
+
+    def __init__(self, seg: int = 0, off: int = 0, count: int = 0, nbytes: int = 0):
+        self.seg = seg
+        self.off = off
+        self.count = count
+        self.bytes = nbytes
+        # Latest summary record, if any (segment 0 means none).
+        self.sum_seg = 0
+        self.sum_off = 0
+        self.sum_bytes = 0
+
+    def copy(self) -> _Head:
+        head = _Head(self.seg, self.off, self.count, self.bytes)
+        head.sum_seg, head.sum_off, head.sum_bytes = self.sum_seg, self.sum_off, self.sum_bytes
+        return head
+
+
+class LogConversationStore(InMemoryConversationStore):
+    """Append-only segment log of conversation records, read back through ``mmap``.
+
+    Only conversation metadata and one ``_Head`` per conversation (the
+    position of its newest message record) stay in memory; the listing
+    indexes come from ``InMemoryConversationStore``. Each message record
+    points at the previous message of the same conversation, so a
+    conversation is read by walking that chain from its head. The head also
+    points at the conversation's latest summary record.
+
+    File I/O runs on one writer thread. Writes are buffered and handed to
+    it before any read that needs them; ``fsync`` runs every
+    ``fsync_interval`` seconds. Segments roll over at ``segment_bytes``. A
+    snapshot of the in-memory index plus the log position it covers is
+    written every ``snapshot_every`` records and on close; on start-up the
+    snapshot is loaded and only the log after it is replayed, truncating a
+    torn final record. Recovery runs on the writer thread as well, and
+    every operation waits for it. Compaction rewrites live conversations
+    into fresh segments once deleted records make up ``compact_ratio`` of
+    the log. The rewrite runs on its own thread without the lock; records
+    written meanwhile are copied after it when the new segments are
+    swapped in.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 << 20,
+        fsync_interval: float = 0.05,
+        snapshot_every: int = 50_000,
+        compact_ratio: float = 0.5,
+        compact_min_bytes: int = 16 << 20,
+    ):
+        super().__init__()
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._segments: Dict[int, _Segment] = {}
+        self._heads: Dict[str, _Head] = {}
+        self._active: _Segment | None = None
+        self._next_segment = 1
+        self._buffer = bytearray()
+        self._buffer_start = 0  # offset of the buffer within the active segment
+        self._total_bytes = 0
+        self._garbage_bytes = 0
+        self._since_snapshot = 0
+        self._lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-log")
+        self._fsync_handle: asyncio.TimerHandle | None = None
+        self._sync_task: asyncio.Task | None = None
+        self._compaction: asyncio.Task | None = None
+        # Stores are built from request handlers, so the log is scanned on the writer thread.
+        self._recovered = self._executor.submit(self._recover)
+
+    async def _ready(self) -> None:
+        if not self._recovered.done():
+            await asyncio.wrap_future(self._recovered)
+        self._recovered.result()  # re-raise a failed recovery
+
+    async def _io(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # -- files -------------------------------------------------------------
+
+    def _seg_path(self, seg_id: int, suffix: str = "") -> str:
+        return os.path.join(self.directory, f"seg-{seg_id:06d}.log{suffix}")
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.bin")
+
+    async def _roll(self) -> None:
+        await self._flush_buffer()
+        seg_id = self._next_segment
+        self._next_segment += 1
+        seg = await self._io(_Segment, seg_id, self._seg_path(seg_id))
+        self._segments[seg.id] = seg
+        self._active = seg
+        self._buffer_start = seg.size
+
+    async def _flush_buffer(self) -> None:
+        """Hand the buffer to the writer thread and wait until everything written so far is in the file."""
+        seg, data = self._active, bytes(self._buffer)
+        self._buffer.clear()
+        self._buffer_start += len(data)
+        await self._io(self._write_out, seg, data)
+
+    @staticmethod
+    def _write_out(seg: _Segment | None, data: bytes) -> None:
+        if data:
+            os.write(seg.fd, data)
+            seg.size += len(data)
+
+    def _put(self, rtype: int, payload: bytes) -> tuple[int, int, int]:
+        """Buffer one record in the active segment; returns (segment, offset, size) of where it will live."""
+        record = _HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(bytes((rtype,)))), rtype) + payload
+        offset = self._buffer_start + len(self._buffer)
+        self._buffer += record
+        self._total_bytes += len(record)
+        self._since_snapshot += 1
+        return self._active.id, offset, len(record)
+
+    async def _append(self, rtype: int, payload: bytes) -> tuple[int, int, int]:
+        if self._active is None or self._buffer_start + len(self._buffer) >= self.segment_bytes:
+            await self._roll()
+        where = self._put(rtype, payload)
+        if len(self._buffer) >= 1 << 16:
+            await self._flush_buffer()
+        self._schedule_fsync()
+        return where
+
+    def _schedule_fsync(self) -> None:
+        if self._fsync_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._fsync_handle = loop.call_later(self.fsync_interval, self._start_sync)
+
+    def _start_sync(self) -> None:
+        self._sync_task = asyncio.get_running_loop().create_task(self._sync())
+
+    async def _sync(self) -> None:
+        async with self._lock:
+            self._fsync_handle = None
+            if self._active is None:
+                return
+            await self._flush_buffer()
+            await self._io(os.fsync, self._active.fd)
+            if self._since_snapshot >= self.snapshot_every:
+                await self._write_snapshot()
+
+    def _unwritten(self, head: _Head) -> bool:
+        """Whether the newest message or the summary of ``head`` has not reached the file yet."""
+        active = self._active
+        if active is None:
+            return False
+        return (head.seg == active.id and head.off >= active.size) or (
+            head.sum_seg == active.id and head.sum_off >= active.size
+        )
+
+    def _view(self, seg_id: int, offset: int) -> memoryview:
+        return self._segments[seg_id].view(offset + _HEADER.size)
+
+    # -- record codecs -------------------------------------------------------
+
+    @staticmethod
+    def _conv_payload(conv: Conversation) -> bytes:
+        return (
+            _CONV_FIXED.pack(conv.created_us, conv.updated_us)
+            + _pack_str(conv.id)
+            + _pack_str(conv.user_id)
+            + _pack_str(conv.title)
+        )
+
+    @staticmethod
+    def _msg_payload(cid: str, head: _Head, msg: Message) -> bytes:
+        flags = (_HAS_USER if msg.user_id is not None else 0) | (_HAS_CONTENT if msg.content is not None else 0)
+        return (
+            _MSG_FIXED.pack(head.seg, head.off, int(msg.id), to_epoch_us(msg.timestamp), flags)
+            + _pack_str(cid)
+            + _pack_str(msg.role)
+            + _pack_str(msg.user_id or "")
+            + _pack_str(msg.content or "", _STR32)
+        )
+
+    @staticmethod
+    def _summary_payload(cid: str, summary: str, upto: int) -> bytes:
+        return _SUMMARY_FIXED.pack(upto) + _pack_str(cid) + _pack_str(summary, _STR32)
+
+    def _read_summary(self, head: _Head) -> tuple[str, int]:
+        view = self._view(head.sum_seg, head.sum_off)
+        try:
+            pos = head.sum_off + _HEADER.size
+            (upto,) = _SUMMARY_FIXED.unpack_from(view, pos)
+            _, pos = _read_str(view, pos + _SUMMARY_FIXED.size)
+            summary, _ = _read_str(view, pos, _STR32)
+        finally:
+            view.release()
+        return summary, upto
+
+    def _read_message(self, seg_id: int, offset: int) -> tuple[tuple, int, int]:
+        """Decode the message record at (seg, offset); returns ``(user_id, role, content, ts)`` and the previous pointer."""
+        view = self._view(seg_id, offset)
+        try:
+            pos = offset + _HEADER.size
+            prev_seg, prev_off, _, ts, flags = _MSG_FIXED.unpack_from(view, pos)
+            pos += _MSG_FIXED.size
+            _, pos = _read_str(view, pos)
+            role, pos = _read_str(view, pos)
+            user_id, pos = _read_str(view, pos)
+            content, pos = _read_str(view, pos, _STR32)
+        finally:
+            view.release()
+        row = (user_id if flags & _HAS_USER else None, role, content if flags & _HAS_CONTENT else None, ts)
+        return row, prev_seg, prev_off
+
+    def _read_rows(self, head: _Head, limit: int | None = None) -> list[tuple]:
+        """The conversation's messages (only the newest ``limit`` if given), oldest first."""
+        rows = []
+        seg, off = head.seg, head.off
+        while seg and (limit is None or len(rows) < limit):
+            row, seg, off = self._read_message(seg, off)
+            rows.append(row)
+        rows.reverse()
+        return rows
+
+    def _read_messages(self, head: _Head) -> MessageColumns:
+        messages = MessageColumns()
+        for row in self._read_rows(head):
+            messages.add(*row)
+        return messages
+
+    # -- ConversationStore -----------------------------------------------------
+
+    async def get(self, conversation_id: str) -> Conversation | None:
+        await self._ready()
+        while True:
+            meta = self._conversations.get(conversation_id)
+            if meta is None:
+                return None
+            head = self._heads[meta.id]
+            if not self._unwritten(head):
+                break
+            await self._flush_buffer()
+        # A fresh object: the stored one keeps metadata only.
+        conv = Conversation.from_epoch(meta.id, meta.user_id, meta.title, meta.created_us, meta.updated_us)
+        conv.messages = self._read_messages(head)
+        if head.sum_seg:
+            conv.summary, conv.summary_upto = self._read_summary(head)
+        return conv
+
+    async def create(self, conv: Conversation) -> None:
+        meta = Conversation.from_epoch(conv.id, conv.user_id, conv.title, conv.created_us, conv.updated_us)
+        await self._ready()
+        async with self._lock:
+            _, _, size = await self._append(_CONV, self._conv_payload(meta))
+            self._heads[meta.id] = _Head(nbytes=size)
+            await super().create(meta)
+
+    async def append_message(self, conv: Conversation, msg: Message) -> None:
+        await self._ready()
+        async with self._lock:
+            meta = self._conversations.get(conv.id)
+            if meta is None:
+                return  # deleted while the reply was being generated
+            head = self._heads[conv.id]
+            head.seg, head.off, size = await self._append(_MSG, self._msg_payload(conv.id, head, msg))
+            head.count += 1
+            head.bytes += size
+            meta.updated_us = conv.updated_us
+            await super().append_message(meta, msg)
+
+    async def rename(self, conversation_id: str, user_id: str, title: str) -> bool:
+        await self._ready()
+        async with self._lock:
+            meta = self._conversations.get(conversation_id)
+            if not meta or meta.user_id != user_id:
+                return False
+            _, _, size = await self._append(_RENAME, _pack_str(conversation_id) + _pack_str(title))
+            self._heads[conversation_id].bytes += size
+            return await super().rename(conversation_id, user_id, title)
+
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        await self._ready()
+        async with self._lock:
+            if conversation_id not in self._conversations:
+                return
+            head = self._heads[conversation_id]
+            seg, off, size = await self._append(_SUMMARY, self._summary_payload(conversation_id, summary, upto))
+            self._garbage_bytes += head.sum_bytes
+            head.bytes += size - head.sum_bytes
+            head.sum_seg, head.sum_off, head.sum_bytes = seg, off, size
+        self._maybe_compact()
+
+    async def delete(self, conversation_id: str, user_id: str) -> bool:
+        await self._ready()
+        async with self._lock:
+            if not await super().delete(conversation_id, user_id):
+                return False
+            _, _, size = await self._append(_DELETE, _pack_str(conversation_id))
+            self._garbage_bytes += self._heads.pop(conversation_id).bytes + size
+        self._maybe_compact()
+        return True
+
+    async def list_user(self, user_id: str) -> List[Conversation]:
+        await self._ready()
+        return await super().list_user(user_id)
+
+    async def list_user_page(self, user_id: str, limit: int, *args: Any, **kwargs: Any) -> List[Conversation]:
+        await self._ready()
+        return await super().list_user_page(user_id, limit, *args, **kwargs)
+
+    async def list_page(self, limit: int, *args: Any, **kwargs: Any) -> List[Conversation]:
+        await self._ready()
+        return await super().list_page(limit, *args, **kwargs)
+
+    async def list_all(self) -> List[Conversation]:
+        await self._ready()
+        return await super().list_all()
+
+    async def aclose(self) -> None:
+        await self._ready()
+        if self._compaction is not None:
+            await self._compaction
+        if self._fsync_handle is not None:
+            self._fsync_handle.cancel()
+            self._fsync_handle = None
+        if self._sync_task is not None:
+            await self._sync_task
+        async with self._lock:
+            if self._active is not None:
+                await self._flush_buffer()
+                await self._io(os.fsync, self._active.fd)
+            await self._write_snapshot()
+            segments = list(self._segments.values())
+            self._segments.clear()
+            self._active = None
+            await self._io(self._retire, [], segments, False)
+        self._executor.shutdown(wait=True)
+
+    # -- snapshot and recovery -----------------------------------------------
+
+    def _encode_snapshot(self) -> bytes:
+        active = self._active
+        parts = [
+            _SNAP_HEADER.pack(
+                _SNAPSHOT_MAGIC,
+                self._next_segment,
+                active.id if active else 0,
+                active.size if active else 0,
+                len(self._segments),
+                len(self._conversations),
+            ),
+            struct.pack(f"<{len(self._segments)}I", *sorted(self._segments)),
+        ]
+        for cid, meta in self._conversations.items():
+            head = self._heads[cid]
+            parts.append(
+                _SNAP_CONV.pack(
+                    meta.created_us,
+                    meta.updated_us,
+                    head.count,
+                    head.seg,
+                    head.off,
+                    head.bytes,
+                    head.sum_seg,
+                    head.sum_off,
+                    head.sum_bytes,
+                )
+            )
+            parts.append(_pack_str(cid) + _pack_str(meta.user_id) + _pack_str(meta.title))
+        return b"".join(parts)
+
+    async def _write_snapshot(self) -> None:
+        await self._flush_buffer()
+        data = self._encode_snapshot()
+        self._since_snapshot = 0
+        await self._io(self._write_file, self._snapshot_path(), data)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _recover(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        on_disk = {}
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and (name.endswith(".log") or name.endswith(".log.compact")):
+                on_disk.setdefault(int(name[4:10]), set()).add(name[10:])
+        position = (0, 0)
+        live: set[int] = set()
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), "rb") as f:
+                data = f.read()
+            position, live = self._load_snapshot(data, on_disk)
+        newest_snapshotted = max(live, default=0)
+        for seg_id, suffixes in sorted(on_disk.items()):
+            if ".log.compact" in suffixes and seg_id not in live:
+                os.remove(self._seg_path(seg_id, ".compact"))  # compaction that never committed
+            if ".log" not in suffixes and seg_id not in live:
+                continue
+            if seg_id in live or seg_id > newest_snapshotted:
+                self._segments[seg_id] = _Segment(seg_id, self._seg_path(seg_id))
+            else:
+                os.remove(self._seg_path(seg_id))  # superseded by a committed compaction
+        for seg_id in sorted(self._segments):
+            if seg_id >= position[0]:
+                self._replay(self._segments[seg_id], position[1] if seg_id == position[0] else 0)
+        if self._segments:
+            self._active = self._segments[max(self._segments)]
+            self._buffer_start = self._active.size
+            self._next_segment = max(self._next_segment, self._active.id + 1)
+        self._total_bytes = sum(seg.size for seg in self._segments.values())
+        self._garbage_bytes = self._total_bytes - sum(head.bytes for head in self._heads.values())
+
+    def _load_snapshot(self, data: bytes, on_disk: dict[int, set[str]]) -> tuple[tuple[int, int], set[int]]:
+        magic, next_segment, pos_seg, pos_off, nsegs, nconvs = _SNAP_HEADER.unpack_from(data, 0)
+        if magic not in (_SNAPSHOT_MAGIC, b"GCLS0001"):
+            raise ValueError(f"{self._snapshot_path()} is not a chat log snapshot")
+        conv_struct = _SNAP_CONV if magic == _SNAPSHOT_MAGIC else _SNAP_CONV_V1
+        pos = _SNAP_HEADER.size
+        live = set(struct.unpack_from(f"<{nsegs}I", data, pos))
+        pos += 4 * nsegs
+        for seg_id in live:
+            if ".log" not in on_disk.get(seg_id, ()):
+                # Compaction committed its snapshot but crashed before renaming its output.
+                os.replace(self._seg_path(seg_id, ".compact"), self._seg_path(seg_id))
+                on_disk.setdefault(seg_id, set()).add(".log")
+        for _ in range(nconvs):
+            created, updated, count, head_seg, head_off, nbytes, *summary = conv_struct.unpack_from(data, pos)
+            pos += conv_struct.size
+            cid, pos = _read_str(data, pos)
+            user_id, pos = _read_str(data, pos)
+            title, pos = _read_str(data, pos)
+            self._restore(Conversation.from_epoch(cid, user_id, title, created, updated))
+            head = self._heads[cid] = _Head(head_seg, head_off, count, nbytes)
+            if summary:
+                head.sum_seg, head.sum_off, head.sum_bytes = summary
+        self._next_segment = next_segment
+        return (pos_seg, pos_off), live
+
+    def _restore(self, meta: Conversation) -> None:
+        self._conversations[meta.id] = meta
+        self._index(meta)
+        self._index_title(meta)
+
+    def _replay(self, seg: _Segment, start: int) -> None:
+        if seg.size <= start:
+            return
+        view = seg.view(seg.size)
+        pos = start
+        try:
+            while pos + _HEADER.size <= seg.size:
+                length, crc, rtype = _HEADER.unpack_from(view, pos)
+                end = pos + _HEADER.size + length
+                if end > seg.size or zlib.crc32(view[pos + _HEADER.size : end], zlib.crc32(bytes((rtype,)))) != crc:
+                    break
+                self._apply(rtype, view, pos, pos + _HEADER.size, end - pos, seg.id)
+                pos = end
+        finally:
+            view.release()
+        if pos < seg.size:
+            logging.warning("Chat log %s: dropping %d bytes of torn or corrupt tail", seg.path, seg.size - pos)
+            seg.truncate(pos)
+
+    def _apply(self, rtype: int, buf, offset: int, pos: int, size: int, seg_id: int) -> None:
+        if rtype == _CONV:
+            created, updated = _CONV_FIXED.unpack_from(buf, pos)
+            pos += _CONV_FIXED.size
+            cid, pos = _read_str(buf, pos)
+            user_id, pos = _read_str(buf, pos)
+            title, pos = _read_str(buf, pos)
+            self._restore(Conversation.from_epoch(cid, user_id, title, created, updated))
+            self._heads[cid] = _Head(nbytes=size)
+            return
+        if rtype == _MSG:
+            ts = _MSG_FIXED.unpack_from(buf, pos)[3]
+            cid, _ = _read_str(buf, pos + _MSG_FIXED.size)
+        elif rtype == _SUMMARY:
+            cid, _ = _read_str(buf, pos + _SUMMARY_FIXED.size)
+        else:
+            cid, pos = _read_str(buf, pos)
+        meta = self._conversations.get(cid)
+        if meta is None:
+            return
+        head = self._heads[cid]
+        head.bytes += size
+        if rtype == _MSG:
+            head.seg, head.off = seg_id, offset
+            head.count += 1
+            meta.updated_us = ts
+            self._index(meta)
+        elif rtype == _SUMMARY:
+            head.bytes -= head.sum_bytes
+            head.sum_seg, head.sum_off, head.sum_bytes = seg_id, offset, size
+        elif rtype == _RENAME:
+            meta.title, _ = _read_str(buf, pos)
+            self._index_title(meta)
+        elif rtype == _DELETE:
+            del self._heads[cid]
+            del self._conversations[cid]
+            self._unindex(meta)
+
+    # -- compaction -------------------------------------------------------------
+
+    def _maybe_compact(self) -> None:
+        if self._compaction is not None and not self._compaction.done():
+            return
+        if self._garbage_bytes < self.compact_min_bytes or self._garbage_bytes < self.compact_ratio * self._total_bytes:
+            return
+        self._compaction = asyncio.get_running_loop().create_task(self.compact())
+
+    async def compact(self) -> None:
+        """Rewrite live conversations into new segments and drop everything else."""
+        await self._ready()
+        async with self._lock:
+            live = [
+                (Conversation.from_epoch(m.id, m.user_id, m.title, m.created_us, m.updated_us), self._heads[cid].copy())
+                for cid, m in self._conversations.items()
+            ]
+            # The rewrite is never larger than the live records, and any two neighbouring
+            # segments it writes hold more than ``segment_bytes``. Reserve ids for that many
+            # so writes made meanwhile go to segments after them.
+            first = self._next_segment
+            self._next_segment += 2 * (sum(head.bytes for _, head in live) // self.segment_bytes + 1)
+            limit = self._next_segment - 1
+            await self._roll()
+            for seg in self._segments.values():
+                if seg is not self._active and seg.size:
+                    # Map the segments being rewritten fully now so reads on the event loop
+                    # and the rewrite thread never remap concurrently.
+                    seg.view(seg.size).release()
+        new_heads, last = await asyncio.to_thread(self._rewrite, live, first, limit)
+        async with self._lock:
+            await self._flush_buffer()
+            changes = self._changes_since({meta.id: (meta, head) for meta, head in live})
+            compacted = await self._io(self._open_compacted, first, last)
+            await self._roll()
+            # Nothing below yields until the snapshot, so reads never see half-swapped heads.
+            retired = [seg for seg in self._segments.values() if seg is not self._active]
+            self._segments = {seg.id: seg for seg in compacted}
+            self._segments[self._active.id] = self._active
+            self._heads = {cid: new_heads[cid] for cid in self._conversations if cid in new_heads}
+            self._total_bytes = sum(seg.size for seg in compacted)
+            for meta, created, renamed, messages, summary in changes:
+                if created:
+                    _, _, size = self._put(_CONV, self._conv_payload(meta))
+                    self._heads[meta.id] = _Head(nbytes=size)
+                head = self._heads[meta.id]
+                if renamed:
+                    head.bytes += self._put(_RENAME, _pack_str(meta.id) + _pack_str(meta.title))[2]
+                for msg in messages:
+                    head.seg, head.off, size = self._put(_MSG, self._msg_payload(meta.id, head, msg))
+                    head.count += 1
+                    head.bytes += size
+                if summary is not None:
+                    seg, off, size = self._put(_SUMMARY, self._summary_payload(meta.id, *summary))
+                    head.bytes += size - head.sum_bytes
+                    head.sum_seg, head.sum_off, head.sum_bytes = seg, off, size
+            self._garbage_bytes = self._total_bytes - sum(head.bytes for head in self._heads.values())
+            await self._flush_buffer()
+            await self._io(os.fsync, self._active.fd)
+            await self._write_snapshot()  # commits the compaction
+        await self._io(self._retire, compacted, retired)
+
+    def _changes_since(self, live: Dict[str, tuple[Conversation, _Head]]) -> list[tuple]:
+        """What each conversation gained after ``live`` was taken: ``(meta, created, renamed, messages, summary)``."""
+        changes = []
+        for cid, meta in self._conversations.items():
+            head = self._heads[cid]
+            before, old = live.get(cid, (None, _Head()))
+            messages = []
+            if head.count > old.count:
+                rows = self._read_rows(head, head.count - old.count)
+                messages = [
+                    Message(str(old.count + i), user_id, role, content, from_epoch_us(ts))
+                    for i, (user_id, role, content, ts) in enumerate(rows, 1)
+                ]
+            summary = None
+            if head.sum_seg and (head.sum_seg, head.sum_off) != (old.sum_seg, old.sum_off):
+                summary = self._read_summary(head)
+            renamed = before is not None and before.title != meta.title
+            if before is None or renamed or messages or summary is not None:
+                changes.append((meta, before is None, renamed, messages, summary))
+        return changes
+
+    def _open_compacted(self, first: int, last: int) -> list[_Segment]:
+        return [_Segment(seg_id, self._seg_path(seg_id, ".compact")) for seg_id in range(first, last + 1)]
+
+    def _retire(self, compacted: list[_Segment], dropped: list[_Segment], remove: bool = True) -> None:
+        """Give committed compaction output its final names, then close (and delete) ``dropped``."""
+        for seg in compacted:
+            os.replace(seg.path, self._seg_path(seg.id))
+            seg.path = self._seg_path(seg.id)
+        for seg in dropped:
+            seg.close()
+            if remove:
+                os.remove(seg.path)
+
+    def _rewrite(self, live: list[tuple[Conversation, _Head]], first: int, limit: int) -> tuple[Dict[str, _Head], int]:
+        seg_id, fd, size = first, None, 0
+        out = bytearray()
+        new_heads: Dict[str, _Head] = {}
+
+        def put(rtype: int, payload: bytes) -> tuple[int, int, int]:
+            nonlocal seg_id, fd, size
+            record = _HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(bytes((rtype,)))), rtype) + payload
+            if fd is None or size + len(out) + len(record) > self.segment_bytes and size + len(out) > 0:
+                if fd is not None:
+                    os.write(fd, out)
+                    out.clear()
+                    os.fsync(fd)
+                    os.close(fd)
+                    seg_id += 1
+                    if seg_id > limit:
+                        raise RuntimeError(f"compaction needs more than {limit - first + 1} segments")
+                fd = os.open(self._seg_path(seg_id, ".compact"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                size = 0
+            offset = size + len(out)
+            out.extend(record)
+            if len(out) >= 1 << 20:
+                os.write(fd, out)
+                size += len(out)
+                out.clear()
+            return seg_id, offset, len(record)
+
+        for meta, old_head in live:
+            _, _, nbytes = put(_CONV, self._conv_payload(meta))
+            head = _Head(nbytes=nbytes)
+            for msg in self._read_messages(old_head):
+                head.seg, head.off, nbytes = put(_MSG, self._msg_payload(meta.id, head, msg))
+                head.count += 1
+                head.bytes += nbytes
+            if old_head.sum_seg:
+                summary, upto = self._read_summary(old_head)
+                head.sum_seg, head.sum_off, head.sum_bytes = put(_SUMMARY, self._summary_payload(meta.id, summary, upto))
+                head.bytes += head.sum_bytes
+            new_heads[meta.id] = head
+        if fd is None:
+            fd = os.open(self._seg_path(seg_id, ".compact"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.write(fd, out)
+        os.fsync(fd)
+        os.close(fd)
+        return new_heads, seg_id
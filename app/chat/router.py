@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+import json
 import logging
 from .schemas import ChatRequest, ChatResponse
 from ..deps import get_settings, get_current_user, get_ai_client
 from ..config import Settings
 from ..auth.service import User
-from ..ai.base import AIClient
+from ..ai.base import AIClient, ProviderOverloadedError
 from .service import ChatService
 from ..ai.plugins import plugins
+from ..ai.tokenizer import get_tokenizer
+from .admission import AdmissionSlot, admit_chat
+from .context import get_context_builder
+from .summary import get_summarizer
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -20,11 +26,17 @@ def get_chat_service(settings: Settings = Depends(get_settings)) -> ChatService:
     return _chat_service
 
 
+async def close_chat_service() -> None:
+    global _chat_service
+    if _chat_service is not None:
+        await _chat_service.aclose()
+        _chat_service = None
+
+
 MAX_INPUT_LEN = 4000
-HISTORY_WINDOW = 16  # number of recent messages to send to provider for context
 
 
-@router.post("/ephemeral", response_model=ChatResponse)
+@router.post("/ephemeral", response_model=ChatResponse, dependencies=[Depends(admit_chat)])
 async def chat_ephemeral(
     payload: ChatRequest,
     settings: Settings = Depends(get_settings),
@@ -38,66 +50,124 @@ async def chat_ephemeral(
     temperature = payload.temperature or settings.temperature
 
     ctx = {"user_id": user.id, "conversation_id": None, "ephemeral": True}
-    history = plugins.run_before(history, ctx)
+    history = await plugins.run_before(history, ctx)
     try:
         result = await ai.chat(history, max_tokens, temperature)
+    except ProviderOverloadedError:
+        raise HTTPException(status_code=503, detail="AI provider busy", headers={"Retry-After": "1"})
     except Exception as e:  # noqa: BLE001
         logging.exception("AI provider error (ephemeral): %s", e)
         raise HTTPException(status_code=502, detail="AI provider error")
-    reply = plugins.run_after(result["reply"], ctx)
+    reply = await plugins.run_after(result["reply"], ctx)
     return ChatResponse(conversationId=None, reply=reply, usage=result.get("usage", {}), provider=settings.ai_provider, ephemeral=True)
 
 
-@router.post("", response_model=ChatResponse)
-async def chat(
-    payload: ChatRequest,
-    settings: Settings = Depends(get_settings),
-    user: User = Depends(get_current_user),
-    ai: AIClient = Depends(get_ai_client),
-    chat_service: ChatService = Depends(get_chat_service),
-):
+async def _start_turn(payload: ChatRequest, settings: Settings, user: User, chat_service: ChatService, max_tokens: int):
+    """Validate the request, record the user message and build the provider context."""
     if len(payload.message) > MAX_INPUT_LEN:
         raise HTTPException(status_code=400, detail="Message too long")
 
-    max_tokens = payload.maxTokens or settings.max_tokens
-    temperature = payload.temperature or settings.temperature
-
     if payload.conversationId:
-        conv = chat_service.get_conversation(payload.conversationId)
+        conv = await chat_service.get_conversation(payload.conversationId)
         if not conv or conv.user_id != user.id:
             raise HTTPException(status_code=404, detail="Conversation not found")
     else:
-        conv = chat_service.create_conversation(user.id, payload.message)
+        conv = await chat_service.create_conversation(user.id, payload.message)
 
     if settings.privacy_store_messages:
-        chat_service.add_message(conv, user.id, "user", payload.message)
+        await chat_service.add_message(conv, user.id, "user", payload.message)
     else:
-        chat_service.add_message(conv, user.id, "user", None)
+        await chat_service.add_message(conv, user.id, "user", None)
 
     if settings.privacy_store_messages:
-        full_history = [
-            {"role": m.role, "content": m.content}
-            for m in conv.messages
-            if m.content
-        ]
+        history_messages = get_context_builder(settings).build(conv, max_tokens)
     else:
-        full_history = [{"role": "user", "content": payload.message}]
-
-    # Trim to last window for provider context
-    history_messages = full_history[-HISTORY_WINDOW:]
+        history_messages = [{"role": "user", "content": payload.message}]
 
     ctx = {"user_id": user.id, "conversation_id": conv.id, "ephemeral": False}
-    history_messages = plugins.run_before(history_messages, ctx)
+    history_messages = await plugins.run_before(history_messages, ctx)
+    return conv, history_messages, ctx
+
+
+@router.post("", response_model=ChatResponse, dependencies=[Depends(admit_chat)])
+async def chat(
+    payload: ChatRequest,
+    settings: Settings = Depends(get_settings),
+    user: User = Depends(get_current_user),
+    ai: AIClient = Depends(get_ai_client),
+    chat_service: ChatService = Depends(get_chat_service),
+):
+    max_tokens = payload.maxTokens or settings.max_tokens
+    temperature = payload.temperature or settings.temperature
+
+    conv, history_messages, ctx = await _start_turn(payload, settings, user, chat_service, max_tokens)
     try:
         result = await ai.chat(history_messages, max_tokens, temperature)
+    except ProviderOverloadedError:
+        raise HTTPException(status_code=503, detail="AI provider busy", headers={"Retry-After": "1"})
     except Exception as e:  # noqa: BLE001
         logging.exception("AI provider error (persistent): %s", e)
         raise HTTPException(status_code=502, detail="AI provider error")
-    reply = plugins.run_after(result["reply"], ctx)
+    reply = await plugins.run_after(result["reply"], ctx)
 
     if settings.privacy_store_messages:
-        chat_service.add_message(conv, None, "assistant", reply)
+        await chat_service.add_message(conv, None, "assistant", reply)
+        get_summarizer(settings, chat_service).maybe_schedule(conv)
     else:
-        chat_service.add_message(conv, None, "assistant", None)
+        await chat_service.add_message(conv, None, "assistant", None)
 
     return ChatResponse(conversationId=conv.id, reply=reply, usage=result.get("usage", {}), provider=settings.ai_provider, ephemeral=False)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    payload: ChatRequest,
+    admission: AdmissionSlot = Depends(admit_chat),
+    settings: Settings = Depends(get_settings),
+    user: User = Depends(get_current_user),
+    ai: AIClient = Depends(get_ai_client),
+    chat_service: ChatService = Depends(get_chat_service),
+):
+    """Stream the reply as Server-Sent Events: ``meta``, then ``delta`` chunks, then ``done`` or ``error``."""
+    max_tokens = payload.maxTokens or settings.max_tokens
+    temperature = payload.temperature or settings.temperature
+
+    conv, history_messages, ctx = await _start_turn(payload, settings, user, chat_service, max_tokens)
+
+    async def events():
+        yield _sse("meta", {"conversationId": conv.id, "provider": settings.ai_provider})
+        parts: list[str] = []
+        try:
+            async for chunk in plugins.run_stream(ai.stream(history_messages, max_tokens, temperature), ctx):
+                parts.append(chunk)
+                yield _sse("delta", {"text": chunk})
+        except ProviderOverloadedError:
+            admission.fail()
+            yield _sse("error", {"detail": "AI provider busy"})
+            return
+        except Exception as e:  # noqa: BLE001
+            admission.fail()
+            logging.exception("AI provider error (stream): %s", e)
+            yield _sse("error", {"detail": "AI provider error"})
+            return
+        # Deltas went out as produced; what is stored passes the after hooks like /api/chat.
+        reply = await plugins.run_after("".join(parts), ctx)
+
+        if settings.privacy_store_messages:
+            await chat_service.add_message(conv, None, "assistant", reply)
+            get_summarizer(settings, chat_service).maybe_schedule(conv)
+        else:
+            await chat_service.add_message(conv, None, "assistant", None)
+
+        usage = get_tokenizer(settings).usage(history_messages, reply)
+        yield _sse("done", {"conversationId": conv.id, "usage": usage, "provider": settings.ai_provider})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,53 +1,76 @@
 from __future__ import annotations
 from datetime import datetime, timezone
-from typing import Dict
+from typing import List
 from ..models.conversation import Conversation, Message
+from ..ai.tokenizer import get_tokenizer
 from ..config import Settings
+from .store import ConversationStore, make_store
 
 
 class ChatService:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, store: ConversationStore | None = None):
         self.settings = settings
-        self._conversations: Dict[str, Conversation] = {}
+        self.store = store or make_store(settings)
 
-    def get_conversation(self, cid: str) -> Conversation | None:
-        return self._conversations.get(cid)
+    async def get_conversation(self, cid: str) -> Conversation | None:
+        return await self.store.get(cid)
 
-    def get_or_raise(self, cid: str, user_id: str) -> Conversation:
-        conv = self._conversations.get(cid)
+    async def get_or_raise(self, cid: str, user_id: str) -> Conversation:
+        conv = await self.store.get(cid)
         if not conv or conv.user_id != user_id:
             raise ValueError("Conversation not found")
         return conv
 
-    def create_conversation(self, user_id: str, first_message: str) -> Conversation:
+    async def create_conversation(self, user_id: str, first_message: str) -> Conversation:
         title = "New conversation"
         if self.settings.privacy_store_messages:
             title = " ".join(first_message.split()[:7])
         conv = Conversation.new(user_id=user_id, title=title)
-        self._conversations[conv.id] = conv
+        await self.store.create(conv)
         return conv
 
-    def add_message(self, conv: Conversation, user_id: str | None, role: str, content: str | None):
-        msg = Message(id=str(len(conv.messages) + 1), user_id=user_id, role=role, content=content, timestamp=datetime.now(timezone.utc))
+    async def add_message(self, conv: Conversation, user_id: str | None, role: str, content: str | None):
+        tokens = get_tokenizer(self.settings).count(content) if content else 0
+        msg = Message(
+            id=str(len(conv.messages) + 1),
+            user_id=user_id,
+            role=role,
+            content=content,
+            timestamp=datetime.now(timezone.utc),
+            tokens=tokens,
+        )
         conv.messages.append(msg)
         conv.updated_at = msg.timestamp
+        await self.store.append_message(conv, msg)
 
-    def list_user_conversations(self, user_id: str):
-        return [c for c in self._conversations.values() if c.user_id == user_id]
+    async def list_user_conversations(self, user_id: str) -> List[Conversation]:
+        return await self.store.list_user(user_id)
 
-    def list_all_conversations(self):
-        return list(self._conversations.values())
+    async def list_user_page(
+        self, user_id: str, limit: int, before: tuple[int, str] | None = None, offset: int = 0
+    ) -> List[Conversation]:
+        return await self.store.list_user_page(user_id, limit, before, offset)
 
-    def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
-        conv = self._conversations.get(conversation_id)
-        if conv and conv.user_id == user_id:
-            del self._conversations[conversation_id]
-            return True
-        return False
+    async def list_page(self, limit: int, before: tuple[int, str] | None = None, **filters) -> List[Conversation]:
+        """Admin view across users; ``filters`` are passed to ``ConversationStore.list_page``."""
+        return await self.store.list_page(limit, before, **filters)
 
-    def rename_conversation(self, conversation_id: str, user_id: str, title: str) -> bool:
-        conv = self._conversations.get(conversation_id)
-        if not conv or conv.user_id != user_id:
-            return False
-        conv.title = title.strip() or conv.title
-        return True
+    async def list_all_conversations(self) -> List[Conversation]:
+        return await self.store.list_all()
+
+    async def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
+        return await self.store.delete(conversation_id, user_id)
+
+    async def rename_conversation(self, conversation_id: str, user_id: str, title: str) -> bool:
+        title = title.strip()
+        if not title:
+            # Keep the current title, but still report whether the conversation exists.
+            conv = await self.store.get(conversation_id)
+            return bool(conv and conv.user_id == user_id)
+        return await self.store.rename(conversation_id, user_id, title)
+
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        await self.store.set_summary(conversation_id, summary, upto)
+
+    async def aclose(self) -> None:
+        await self.store.aclose()
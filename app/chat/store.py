@@ -0,0 +1,470 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import asyncio
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sqlite3
+from typing import Any, Callable, Dict, List, TypeVar
+
+from ..config import Settings
+from ..models.conversation import Conversation, Message, to_epoch_us
+
+T = TypeVar("T")
+
+
+class ConversationStore(ABC):
+    """Persistence for conversations and their messages; every call is awaitable."""
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> Conversation | None:
+        """Conversation with its messages, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create(self, conv: Conversation) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def append_message(self, conv: Conversation, msg: Message) -> None:
+        """Persist ``msg`` (already appended to ``conv.messages``) and ``conv.updated_at``."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_user(self, user_id: str) -> List[Conversation]:
+        """The user's conversations; messages need not be loaded."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_user_page(
+        self, user_id: str, limit: int, before: tuple[int, str] | None = None, offset: int = 0
+    ) -> List[Conversation]:
+        """Up to ``limit`` of the user's conversations, most recently updated first.
+
+        ``before`` is the ``(updated_at in epoch microseconds, id)`` key of the
+        last conversation of the previous page; only older ones are returned.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_page(
+        self,
+        limit: int,
+        before: tuple[int, str] | None = None,
+        user_id: str | None = None,
+        updated_from: int | None = None,
+        updated_to: int | None = None,
+        title_prefix: str | None = None,
+    ) -> List[Conversation]:
+        """All users' conversations, most recently updated first, optionally filtered.
+
+        ``updated_from``/``updated_to`` are inclusive epoch-microsecond bounds;
+        ``title_prefix`` matches case-insensitively.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_all(self) -> List[Conversation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, conversation_id: str, user_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def rename(self, conversation_id: str, user_id: str, title: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        """Replace the rolling summary, which now covers the first ``upto`` messages."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local dict of conversations; the default, and what tests use.
+
+    Each user, and the store as a whole, has a list of ``(updated_at_us, id)``
+    keys kept sorted, so a page is a bisect plus a slice. Updates re-key one
+    conversation; since the new key is the newest it lands at the end of the
+    list. A sorted ``(lowercased title, id)`` list serves title-prefix lookups.
+    """
+
+    def __init__(self) -> None:
+        self._conversations: Dict[str, Conversation] = {}
+        self._by_user: Dict[str, List[tuple[int, str]]] = {}
+        self._all: List[tuple[int, str]] = []
+        self._by_title: List[tuple[str, str]] = []
+        self._keys: Dict[str, tuple[int, str]] = {}
+        self._title_keys: Dict[str, tuple[str, str]] = {}
+
+    def _index(self, conv: Conversation) -> None:
+        keys = self._by_user.setdefault(conv.user_id, [])
+        old = self._keys.get(conv.id)
+        if old is not None:
+            del keys[bisect_left(keys, old)]
+            del self._all[bisect_left(self._all, old)]
+        key = self._keys[conv.id] = (conv.updated_us, conv.id)
+        insort(keys, key)
+        insort(self._all, key)
+
+    def _index_title(self, conv: Conversation) -> None:
+        old = self._title_keys.get(conv.id)
+        if old is not None:
+            del self._by_title[bisect_left(self._by_title, old)]
+        key = self._title_keys[conv.id] = (conv.title.lower(), conv.id)
+        insort(self._by_title, key)
+
+    def _unindex(self, conv: Conversation) -> None:
+        key = self._keys.pop(conv.id)
+        keys = self._by_user[conv.user_id]
+        del keys[bisect_left(keys, key)]
+        if not keys:
+            del self._by_user[conv.user_id]
+        del self._all[bisect_left(self._all, key)]
+        del self._by_title[bisect_left(self._by_title, self._title_keys.pop(conv.id))]
+
+    async def get(self, conversation_id: str) -> Conversation | None:
+        return self._conversations.get(conversation_id)
+
+    async def create(self, conv: Conversation) -> None:
+        self._conversations[conv.id] = conv
+        self._index(conv)
+        self._index_title(conv)
+
+    async def append_message(self, conv: Conversation, msg: Message) -> None:
+        # ``conv`` is the stored object and already holds ``msg``; only the index moves.
+        self._index(conv)
+
+    async def list_user(self, user_id: str) -> List[Conversation]:
+        return [self._conversations[cid] for _, cid in self._by_user.get(user_id, ())]
+
+    async def list_user_page(
+        self, user_id: str, limit: int, before: tuple[int, str] | None = None, offset: int = 0
+    ) -> List[Conversation]:
+        keys = self._by_user.get(user_id, [])
+        end = (bisect_left(keys, before) if before is not None else len(keys)) - offset
+        start = max(end - limit, 0)
+        return [self._conversations[cid] for _, cid in reversed(keys[start:max(end, 0)])]
+
+    async def list_page(
+        self,
+        limit: int,
+        before: tuple[int, str] | None = None,
+        user_id: str | None = None,
+        updated_from: int | None = None,
+        updated_to: int | None = None,
+        title_prefix: str | None = None,
+    ) -> List[Conversation]:
+        if title_prefix:
+            # Title matches come from the title index, then are ordered like the other pages.
+            prefix = title_prefix.lower()
+            keys = []
+            for title, cid in self._by_title[bisect_left(self._by_title, (prefix, "")) :]:
+                if not title.startswith(prefix):
+                    break
+                if user_id is None or self._conversations[cid].user_id == user_id:
+                    keys.append(self._keys[cid])
+            keys.sort()
+        else:
+            keys = self._by_user.get(user_id, []) if user_id is not None else self._all
+        hi = len(keys)
+        if before is not None:
+            hi = bisect_left(keys, before, 0, hi)
+        if updated_to is not None:
+            hi = bisect_left(keys, (updated_to + 1, ""), 0, hi)
+        lo = bisect_left(keys, (updated_from, ""), 0, hi) if updated_from is not None else 0
+        return [self._conversations[cid] for _, cid in reversed(keys[max(lo, hi - limit) : hi])]
+
+    async def list_all(self) -> List[Conversation]:
+        return list(self._conversations.values())
+
+    async def delete(self, conversation_id: str, user_id: str) -> bool:
+        conv = self._conversations.get(conversation_id)
+        if conv and conv.user_id == user_id:
+            del self._conversations[conversation_id]
+            self._unindex(conv)
+            return True
+        return False
+
+    async def rename(self, conversation_id: str, user_id: str, title: str) -> bool:
+        # Renaming does not touch updated_at, only the title index moves.
+        conv = self._conversations.get(conversation_id)
+        if not conv or conv.user_id != user_id:
+            return False
+        conv.title = title
+        self._index_title(conv)
+        return True
+
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        conv = self._conversations.get(conversation_id)
+        if conv is not None:
+            conv.summary = summary
+            conv.summary_upto = upto
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+-- id breaks updated_at ties so keyset pages are stable.
+CREATE INDEX IF NOT EXISTS conversations_user_recent ON conversations (user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS conversations_recent ON conversations (updated_at, id);
+-- NOCASE lets SQLite serve "title LIKE 'prefix%'" from the index.
+CREATE INDEX IF NOT EXISTS conversations_title ON conversations (title COLLATE NOCASE);
+-- The primary key is the (conversation_id, seq) index.
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    user_id TEXT,
+    role TEXT NOT NULL,
+    content TEXT,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+-- Kept apart so listings never read summary text.
+CREATE TABLE IF NOT EXISTS summaries (
+    conversation_id TEXT PRIMARY KEY,
+    upto INTEGER NOT NULL,
+    summary TEXT NOT NULL
+);
+"""
+
+_INSERT_CONVERSATION = "INSERT INTO conversations (id, user_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)"
+# seq is allocated on the writer thread: two turns appended through separately loaded
+# copies of one conversation must not collide on (conversation_id, seq).
+_INSERT_MESSAGE = (
+    "INSERT INTO messages (conversation_id, seq, user_id, role, content, timestamp) "
+    "SELECT ?1, COALESCE(MAX(seq), 0) + 1, ?2, ?3, ?4, ?5 FROM messages WHERE conversation_id = ?1 "
+    "RETURNING seq"
+)
+_TOUCH_CONVERSATION = "UPDATE conversations SET updated_at = ? WHERE id = ?"
+_SELECT_CONVERSATION = "SELECT id, user_id, title, created_at, updated_at FROM conversations WHERE id = ?"
+_SELECT_MESSAGES = "SELECT user_id, role, content, timestamp FROM messages WHERE conversation_id = ? ORDER BY seq"
+_SELECT_USER = "SELECT id, user_id, title, created_at, updated_at FROM conversations WHERE user_id = ? ORDER BY updated_at DESC"
+_SELECT_USER_PAGE = (
+    "SELECT id, user_id, title, created_at, updated_at FROM conversations WHERE user_id = ? "
+    "ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?"
+)
+_SELECT_USER_PAGE_BEFORE = (
+    "SELECT id, user_id, title, created_at, updated_at FROM conversations "
+    "WHERE user_id = ? AND (updated_at, id) < (?, ?) ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?"
+)
+_SELECT_ALL = "SELECT id, user_id, title, created_at, updated_at FROM conversations"
+_DELETE_MESSAGES = "DELETE FROM messages WHERE conversation_id = ?"
+_SELECT_SUMMARY = "SELECT summary, upto FROM summaries WHERE conversation_id = ?"
+_UPSERT_SUMMARY = (
+    "INSERT INTO summaries (conversation_id, upto, summary) "
+    "SELECT id, ?, ? FROM conversations WHERE id = ? "
+    "ON CONFLICT (conversation_id) DO UPDATE SET upto = excluded.upto, summary = excluded.summary"
+)
+_DELETE_SUMMARY = "DELETE FROM summaries WHERE conversation_id = ?"
+_DELETE_CONVERSATION = "DELETE FROM conversations WHERE id = ? AND user_id = ?"
+_RENAME = "UPDATE conversations SET title = ? WHERE id = ? AND user_id = ?"
+
+
+def _conversation(row: tuple) -> Conversation:
+    return Conversation.from_epoch(*row)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite in WAL mode, driven from a single worker thread.
+
+    All statements run on one dedicated thread, so the event loop never
+    blocks on disk and the connection is never shared between threads. SQL
+    text is constant, so ``sqlite3``'s statement cache reuses the prepared
+    statements. Writes are committed in batches: after ``commit_batch``
+    writes or ``commit_interval`` seconds, whichever comes first. Reads go
+    through the same connection and see uncommitted writes; other processes
+    see them after the next commit.
+    """
+
+    def __init__(self, path: str, commit_interval: float = 0.05, commit_batch: int = 64):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-sqlite")
+        self._conn: sqlite3.Connection | None = None
+        self._pending = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task | None = None
+        # Stores are built from request handlers, so the connection is opened on the
+        # writer thread without waiting; the thread runs jobs in order, so it is open
+        # before any statement.
+        self._opened = self._executor.submit(self._open)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        self._conn = conn
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if not self._opened.done():
+            await asyncio.wrap_future(self._opened)
+        self._opened.result()  # re-raise a failed open
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._conn.execute(sql, params)
+
+    async def _write(self, fn: Callable[..., T], *args: Any) -> T:
+        result = await self._run(fn, *args)
+        self._pending += 1
+        if self._pending >= self.commit_batch:
+            await self._flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.commit_interval, self._schedule_flush)
+        return result
+
+    def _schedule_flush(self) -> None:
+        self._flush_handle = None
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            self._pending = 0
+            await self._run(lambda: self._conn.commit())
+
+    async def get(self, conversation_id: str) -> Conversation | None:
+        return await self._run(self._get, conversation_id)
+
+    def _get(self, conversation_id: str) -> Conversation | None:
+        row = self._conn.execute(_SELECT_CONVERSATION, (conversation_id,)).fetchone()
+        if row is None:
+            return None
+        conv = _conversation(row)
+        messages = conv.messages
+        for user_id, role, content, ts in self._conn.execute(_SELECT_MESSAGES, (conversation_id,)):
+            messages.add(user_id, role, content, ts)
+        summary = self._conn.execute(_SELECT_SUMMARY, (conversation_id,)).fetchone()
+        if summary is not None:
+            conv.summary, conv.summary_upto = summary
+        return conv
+
+    async def create(self, conv: Conversation) -> None:
+        row = (conv.id, conv.user_id, conv.title, conv.created_us, conv.updated_us)
+        await self._write(self._execute, _INSERT_CONVERSATION, row)
+
+    async def append_message(self, conv: Conversation, msg: Message) -> None:
+        msg.id = str(await self._write(self._append, conv.id, msg, conv.updated_us))
+
+    def _append(self, conversation_id: str, msg: Message, updated_at: int) -> int:
+        row = (conversation_id, msg.user_id, msg.role, msg.content, to_epoch_us(msg.timestamp))
+        (seq,) = self._conn.execute(_INSERT_MESSAGE, row).fetchone()
+        self._conn.execute(_TOUCH_CONVERSATION, (updated_at, conversation_id))
+        return seq
+
+    async def list_user(self, user_id: str) -> List[Conversation]:
+        rows = await self._run(lambda: self._conn.execute(_SELECT_USER, (user_id,)).fetchall())
+        return [_conversation(r) for r in rows]
+
+    async def list_user_page(
+        self, user_id: str, limit: int, before: tuple[int, str] | None = None, offset: int = 0
+    ) -> List[Conversation]:
+        if before is None:
+            sql, params = _SELECT_USER_PAGE, (user_id, limit, offset)
+        else:
+            sql, params = _SELECT_USER_PAGE_BEFORE, (user_id, before[0], before[1], limit, offset)
+        rows = await self._run(lambda: self._conn.execute(sql, params).fetchall())
+        return [_conversation(r) for r in rows]
+
+    async def list_page(
+        self,
+        limit: int,
+        before: tuple[int, str] | None = None,
+        user_id: str | None = None,
+        updated_from: int | None = None,
+        updated_to: int | None = None,
+        title_prefix: str | None = None,
+    ) -> List[Conversation]:
+        where: list[str] = []
+        params: list[Any] = []
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if before is not None:
+            where.append("(updated_at, id) < (?, ?)")
+            params.extend(before)
+        if updated_from is not None:
+            where.append("updated_at >= ?")
+            params.append(updated_from)
+        if updated_to is not None:
+            where.append("updated_at <= ?")
+            params.append(updated_to)
+        if title_prefix:
+            escaped = title_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("title LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+        sql = _SELECT_ALL
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        rows = await self._run(lambda: self._conn.execute(sql, params).fetchall())
+        return [_conversation(r) for r in rows]
+
+    async def list_all(self) -> List[Conversation]:
+        rows = await self._run(lambda: self._conn.execute(_SELECT_ALL).fetchall())
+        return [_conversation(r) for r in rows]
+
+    async def delete(self, conversation_id: str, user_id: str) -> bool:
+        return await self._write(self._delete, conversation_id, user_id)
+
+    def _delete(self, conversation_id: str, user_id: str) -> bool:
+        if self._conn.execute(_DELETE_CONVERSATION, (conversation_id, user_id)).rowcount == 0:
+            return False
+        self._conn.execute(_DELETE_MESSAGES, (conversation_id,))
+        self._conn.execute(_DELETE_SUMMARY, (conversation_id,))
+        return True
+
+    async def rename(self, conversation_id: str, user_id: str, title: str) -> bool:
+        cursor = await self._write(self._execute, _RENAME, (title, conversation_id, user_id))
+        return cursor.rowcount > 0
+
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        await self._write(self._execute, _UPSERT_SUMMARY, (upto, summary, conversation_id))
+
+    async def aclose(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush()
+        await self._run(lambda: self._conn.close())
+        self._executor.shutdown(wait=True)
+
+
+def make_store(settings: Settings) -> ConversationStore:
+    store = settings.chat_store.lower()
+    if store == "memory":
+        return InMemoryConversationStore()
+    if store == "sqlite":
+        return SQLiteConversationStore(
+            settings.chat_db_path,
+            commit_interval=settings.chat_db_commit_interval_ms / 1000,
+            commit_batch=settings.chat_db_commit_batch,
+        )
+    if store == "log":
+        from .logstore import LogConversationStore
+
+        return LogConversationStore(
+            settings.chat_log_dir,
+            segment_bytes=settings.chat_log_segment_mb << 20,
+            fsync_interval=settings.chat_db_commit_interval_ms / 1000,
+        )
+    raise ValueError(f"Unknown CHAT_STORE: {settings.chat_store}")
@@ -0,0 +1,216 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Callable, List
+
+from ..ai.base import AIClient
+from ..ai.mock_client import MockAIClient
+from ..ai.plugins import plugins
+from ..ai.registry import provider_registry
+from ..ai.tokenizer import MESSAGE_OVERHEAD, Tokenizer, get_tokenizer
+from ..config import Settings
+from ..metrics import metrics
+from ..models.conversation import Conversation
+from .service import ChatService
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a tutoring conversation. Merge the new turns into the "
+    "current summary. Keep the student's goals, what has been explained, open questions and anything "
+    "the assistant promised to do. Reply with the updated summary only."
+)
+
+
+def _from_real_provider(client: AIClient, result: dict) -> bool:
+    """Whether ``result`` was answered by the configured provider itself.
+
+    Fallback, breaker-skipped and cross-provider hedged replies carry more
+    than one ``provider_chain`` entry or a ``Name:state`` label; a chain
+    that is only the mock (no key configured) reports no chain at all.
+    """
+    chain = result.get("usage", {}).get("provider_chain")
+    if chain:
+        return len(chain) == 1 and ":" not in chain[0] and chain[0] != MockAIClient.__name__
+    while hasattr(client, "inner"):  # cache and coalescing layers
+        client = client.inner
+    return not isinstance(client, MockAIClient)
+
+
+class ConversationSummarizer:
+    """Folds the older turns of long conversations into ``Conversation.summary``.
+
+    ``maybe_schedule`` runs after each reply. It is O(unsummarized messages)
+    using the cached token counts, and it only enqueues the conversation
+    id. Workers then do the provider call off the request path. A run folds
+    the turns after ``summary_upto``, up to the newest
+    ``keep_recent_tokens`` (kept verbatim), into the existing summary. Only
+    new turns are sent, never the whole history. At most
+    ``max_input_tokens`` of turns go into one run; anything left is queued
+    again. The queue is bounded: when it is full the conversation is skipped
+    (``summary.dropped``) and is offered again after its next reply.
+
+    The prompt passes through the before plugins like a chat turn. The
+    client should be the bare provider chain: summaries are per
+    conversation and must never be answered from, or stored in, the shared
+    response caches. Nothing is scheduled while that chain is only the
+    mock. A reply that did not come from the real provider (mock, fallback
+    or a cross-provider hedge) is discarded and counted in
+    ``summary.failed``; folding the turns into it would drop them from
+    every later context.
+    """
+
+    def __init__(
+        self,
+        service: ChatService,
+        client: Callable[[], AIClient],
+        tokenizer: Tokenizer,
+        threshold_tokens: int = 2000,
+        keep_recent_tokens: int = 600,
+        max_input_tokens: int = 3000,
+        max_tokens: int = 300,
+        queue_size: int = 100,
+        workers: int = 1,
+    ):
+        self.service = service
+        self.client = client
+        self.tokenizer = tokenizer
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent_tokens = keep_recent_tokens
+        self.max_input_tokens = max_input_tokens
+        self.max_tokens = max_tokens
+        self.workers = workers
+        self._queue: asyncio.Queue[str] = asyncio.Queue(queue_size)
+        self._queued: set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._dropped = metrics.counter("summary.dropped")
+        self._failed = metrics.counter("summary.failed")
+        self._latency = metrics.histogram("summary.latency_seconds")
+
+    def pending_tokens(self, conv: Conversation) -> int:
+        messages, count = conv.messages, self.tokenizer.count
+        return sum(messages.tokens(i, count) for i in range(conv.summary_upto, len(messages)))
+
+    def maybe_schedule(self, conv: Conversation) -> bool:
+        if self.threshold_tokens <= 0 or conv.id in self._queued:
+            return False
+        if isinstance(self.client(), MockAIClient):
+            return False  # no provider configured; every run would be rejected
+        if self.pending_tokens(conv) < self.threshold_tokens:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait(conv.id)
+        except asyncio.QueueFull:
+            self._dropped.inc()
+            return False
+        self._queued.add(conv.id)
+        return True
+
+    def _start(self) -> None:
+        self._tasks = [t for t in self._tasks if not t.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._work()))
+
+    async def _work(self) -> None:
+        while True:
+            cid = await self._queue.get()
+            conv = None
+            try:
+                conv = await self.summarize(cid)
+            except Exception:  # noqa: BLE001
+                self._failed.inc()
+                logging.exception("Summarizing conversation %s failed", cid)
+            finally:
+                self._queued.discard(cid)
+                self._queue.task_done()
+            if conv is not None:
+                self.maybe_schedule(conv)  # more than one run's worth was pending
+
+    def _fold_range(self, conv: Conversation) -> tuple[int, int]:
+        messages, count = conv.messages, self.tokenizer.count
+        start = end = conv.summary_upto
+        kept = 0
+        newest = len(messages)
+        while newest > start and kept + messages.tokens(newest - 1, count) <= self.keep_recent_tokens:
+            newest -= 1
+            kept += messages.tokens(newest, count)
+        folded = 0
+        while end < newest:
+            cost = messages.tokens(end, count) + MESSAGE_OVERHEAD
+            if end > start and folded + cost > self.max_input_tokens:
+                break
+            folded += cost
+            end += 1
+        return start, end
+
+    async def summarize(self, conversation_id: str) -> Conversation | None:
+        """Fold one batch of turns; returns the updated conversation, or None if there was nothing to do."""
+        conv = await self.service.get_conversation(conversation_id)
+        if conv is None:
+            return None
+        start, end = self._fold_range(conv)
+        transcript = "\n".join(
+            f"{role}: {content}" for role, content in (conv.messages.turn(i) for i in range(start, end)) if content
+        )
+        if not transcript:
+            return None
+        prompt = [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Current summary:\n{conv.summary or '(none yet)'}\n\nNew turns:\n{transcript}"},
+        ]
+        ctx = {"user_id": conv.user_id, "conversation_id": conv.id, "ephemeral": False, "summary": True}
+        prompt = await plugins.run_before(prompt, ctx)
+        client = self.client()
+        started = time.perf_counter()
+        result = await client.chat(prompt, self.max_tokens, 0.2)
+        self._latency.observe(time.perf_counter() - started)
+        if not _from_real_provider(client, result):
+            self._failed.inc()
+            logging.warning(
+                "Summary for conversation %s not from the configured provider (%s); kept unsummarized",
+                conv.id, result.get("usage", {}).get("provider_chain") or type(client).__name__,
+            )
+            return None
+        summary = result["reply"].strip()
+        if not summary:
+            return None
+        await self.service.set_summary(conv.id, summary, end)
+        conv.summary, conv.summary_upto = summary, end
+        return conv
+
+    async def join(self) -> None:
+        """Wait until every queued conversation has been processed."""
+        await self._queue.join()
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+_summarizer: ConversationSummarizer | None = None
+
+
+def get_summarizer(settings: Settings, service: ChatService) -> ConversationSummarizer:
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ConversationSummarizer(
+            service,
+            lambda: provider_registry.get_bare(settings),
+            get_tokenizer(settings),
+            threshold_tokens=settings.summary_threshold_tokens,
+            keep_recent_tokens=settings.summary_keep_recent_tokens,
+            max_input_tokens=max(settings.context_tokens - settings.summary_max_tokens - 256, 256),
+            max_tokens=settings.summary_max_tokens,
+            queue_size=settings.summary_queue_size,
+        )
+    return _summarizer
+
+
+async def close_summarizer() -> None:
+    global _summarizer
+    if _summarizer is not None:
+        await _summarizer.aclose()
+        _summarizer = None
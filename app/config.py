@@ -2,6 +2,7 @@ from functools import lru_cache
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -15,15 +16,79 @@ class Settings(BaseSettings):
     app_port: int = Field(8000, alias="APP_PORT")
     jwt_secret: str = Field("change_me", alias="JWT_SECRET")
     jwt_expires_min: int = Field(60, alias="JWT_EXPIRES_MIN")
+    auth_token_cache_size: int = Field(10000, alias="AUTH_TOKEN_CACHE_SIZE")
+    bcrypt_rounds: int = Field(12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(0, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_limit: int = Field(64, alias="PASSWORD_HASH_QUEUE_LIMIT")
+    user_import_workers: int = Field(0, alias="USER_IMPORT_WORKERS")
+    user_import_batch: int = Field(32, alias="USER_IMPORT_BATCH")
     ai_provider: str = Field("openai", alias="AI_PROVIDER")
     openai_api_key: str | None = Field(None, alias="OPENAI_API_KEY")
     openai_model: str = Field("gpt-4o-mini", alias="OPENAI_MODEL")
     gpt4all_model_path: str = Field("./models/q4_0-orca-mini-3b.gguf", alias="GPT4ALL_MODEL_PATH")
+    gpt4all_replicas: int = Field(0, alias="GPT4ALL_REPLICAS")
+    gpt4all_queue_limit: int = Field(8, alias="GPT4ALL_QUEUE_LIMIT")
+    gpt4all_batch_max_size: int = Field(8, alias="GPT4ALL_BATCH_MAX_SIZE")
+    gpt4all_batch_wait_ms: float = Field(5.0, alias="GPT4ALL_BATCH_WAIT_MS")
     gemini_api_key: str | None = Field(None, alias="GEMINI_API_KEY")
     gemini_model: str = Field("gemini-1.5-flash", alias="GEMINI_MODEL")
     max_tokens: int = Field(512, alias="MAX_TOKENS")
     temperature: float = Field(0.4, alias="TEMPERATURE")
+    context_tokens: int = Field(4096, alias="CONTEXT_TOKENS")
+    context_cache_size: int = Field(10000, alias="CONTEXT_CACHE_SIZE")
+    tokenizer: str = Field("auto", alias="TOKENIZER")
+    summary_threshold_tokens: int = Field(2000, alias="SUMMARY_THRESHOLD_TOKENS")
+    summary_keep_recent_tokens: int = Field(600, alias="SUMMARY_KEEP_RECENT_TOKENS")
+    summary_max_tokens: int = Field(300, alias="SUMMARY_MAX_TOKENS")
+    summary_queue_size: int = Field(100, alias="SUMMARY_QUEUE_SIZE")
+    tokenizer_encoding: str = Field("o200k_base", alias="TOKENIZER_ENCODING")
     privacy_store_messages: bool = Field(False, alias="PRIVACY_STORE_MESSAGES")
+    response_cache_size: int = Field(1024, alias="RESPONSE_CACHE_SIZE")
+    response_cache_ttl: float = Field(600.0, alias="RESPONSE_CACHE_TTL")
+    response_cache_max_temperature: float = Field(0.5, alias="RESPONSE_CACHE_MAX_TEMPERATURE")
+    similarity_cache_size: int = Field(0, alias="SIMILARITY_CACHE_SIZE")
+    similarity_cache_ttl: float = Field(600.0, alias="SIMILARITY_CACHE_TTL")
+    similarity_cache_threshold: float = Field(0.8, alias="SIMILARITY_CACHE_THRESHOLD")
+    coalesce_requests: bool = Field(True, alias="COALESCE_REQUESTS")
+    breaker_window_seconds: float = Field(30.0, alias="BREAKER_WINDOW_SECONDS")
+    breaker_min_calls: int = Field(5, alias="BREAKER_MIN_CALLS")
+    breaker_error_rate: float = Field(0.5, alias="BREAKER_ERROR_RATE")
+    breaker_slow_call_seconds: float = Field(20.0, alias="BREAKER_SLOW_CALL_SECONDS")
+    breaker_open_seconds: float = Field(15.0, alias="BREAKER_OPEN_SECONDS")
+    hedge_requests: bool = Field(False, alias="HEDGE_REQUESTS")
+    hedge_percentile: float = Field(0.95, alias="HEDGE_PERCENTILE")
+    hedge_min_delay_ms: int = Field(200, alias="HEDGE_MIN_DELAY_MS")
+    hedge_max_delay_ms: int = Field(4000, alias="HEDGE_MAX_DELAY_MS")
+    chat_store: str = Field("memory", alias="CHAT_STORE")
+    chat_db_path: str = Field("./data/chat.db", alias="CHAT_DB_PATH")
+    chat_db_commit_interval_ms: int = Field(50, alias="CHAT_DB_COMMIT_INTERVAL_MS")
+    chat_db_commit_batch: int = Field(64, alias="CHAT_DB_COMMIT_BATCH")
+    chat_log_dir: str = Field("./data/chatlog", alias="CHAT_LOG_DIR")
+    chat_log_segment_mb: int = Field(64, alias="CHAT_LOG_SEGMENT_MB")
+    chat_concurrency_initial: int = Field(20, alias="CHAT_CONCURRENCY_INITIAL")
+    chat_concurrency_min: int = Field(2, alias="CHAT_CONCURRENCY_MIN")
+    chat_concurrency_max: int = Field(200, alias="CHAT_CONCURRENCY_MAX")
+    chat_queue_size: int = Field(50, alias="CHAT_QUEUE_SIZE")
+    chat_queue_timeout: float = Field(5.0, alias="CHAT_QUEUE_TIMEOUT_SECONDS")
+    rate_limit_default: int = Field(60, alias="RATE_LIMIT_DEFAULT")
+    rate_limit_chat: int = Field(30, alias="RATE_LIMIT_CHAT")
+    rate_limit_history: int = Field(120, alias="RATE_LIMIT_HISTORY")
+    rate_limit_login: int = Field(20, alias="RATE_LIMIT_LOGIN")
+    rate_limit_backend: str = Field("memory", alias="RATE_LIMIT_BACKEND")
+    rate_limit_shared_path: str = Field(
+        os.path.join(tempfile.gettempdir(), "genai-chat-ratelimit.bin"), alias="RATE_LIMIT_SHARED_PATH"
+    )
+    rate_limit_shared_slots: int = Field(65536, alias="RATE_LIMIT_SHARED_SLOTS")
+    rate_limit_max_keys: int = Field(100_000, alias="RATE_LIMIT_MAX_KEYS")
+    rate_limit_sweep_seconds: float = Field(60.0, alias="RATE_LIMIT_SWEEP_SECONDS")
+    http_max_connections: int = Field(100, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive: int = Field(20, alias="HTTP_MAX_KEEPALIVE")
+    http_keepalive_expiry: float = Field(30.0, alias="HTTP_KEEPALIVE_EXPIRY")
+    http2: bool = Field(False, alias="HTTP2")
+    http_connect_timeout: float = Field(5.0, alias="HTTP_CONNECT_TIMEOUT")
+    http_read_timeout: float = Field(60.0, alias="HTTP_READ_TIMEOUT")
+    http_write_timeout: float = Field(10.0, alias="HTTP_WRITE_TIMEOUT")
+    http_pool_timeout: float = Field(5.0, alias="HTTP_POOL_TIMEOUT")
 
 
 @lru_cache
@@ -2,22 +2,21 @@ from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
-from passlib.context import CryptContext
-
 from .config import get_settings, Settings
+from .auth.hashing import PasswordHasher, make_password_context
 from .auth.service import UserService, User
+from .auth.tokens import get_token_cache
 from .ai.base import AIClient
-from .ai.openai_client import OpenAIClient
-from .ai.gpt4all_client import GPT4AllClient
-from .ai.fallback_client import FallbackAIClient
-from .ai.mock_client import MockAIClient
-from .ai.gemini_client import GeminiClient
-import os
+from .ai.registry import provider_registry
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_settings = get_settings()
+pwd_context = make_password_context(_settings)
 http_bearer = HTTPBearer(auto_error=False)
 
-_user_service = UserService(pwd_context=pwd_context)
+_user_service = UserService(
+    pwd_context=pwd_context,
+    hasher=PasswordHasher(pwd_context, _settings.password_hash_workers, _settings.password_hash_queue_limit),
+)
 
 
 def get_user_service() -> UserService:
@@ -25,39 +24,10 @@ def get_user_service() -> UserService:
 
 
 def get_ai_client(settings: Settings = Depends(get_settings)) -> AIClient:
-    provider = settings.ai_provider.lower()
-    if provider == "mock":
-        return MockAIClient()
-    if provider == "openai":
-        # If no API key or a placeholder key (contains '...'), use mock directly.
-        key = settings.openai_api_key or os.getenv("OPENAI_API_KEY") or ""
-        if (not key) or ("..." in key):
-            return MockAIClient()
-        primary = OpenAIClient(settings)
-        # Build a fallback chain: OpenAI -> (optional GPT4All) -> Mock
-        client: AIClient = primary
-        # Try GPT4All
-        try:
-            gpt4all_client = GPT4AllClient(settings)
-            client = FallbackAIClient(client, gpt4all_client)
-        except Exception:
-            pass
-        # Always add Mock as final safety net so chatting works offline / on API errors
-        client = FallbackAIClient(client, MockAIClient())
-        return client
-    if provider == "gpt4all":
-        return GPT4AllClient(settings)
-    if provider == "gemini":
-        key = settings.gemini_api_key or os.getenv("GEMINI_API_KEY") or ""
-        if (not key) or ("..." in key):
-            return MockAIClient()
-        try:
-            primary: AIClient = GeminiClient(settings)
-        except Exception:
-            return MockAIClient()
-        # Add Mock fallback always for resilience
-        return FallbackAIClient(primary, MockAIClient())
-    raise HTTPException(status_code=500, detail="Unknown AI_PROVIDER")
+    try:
+        return provider_registry.get(settings)
+    except ValueError:
+        raise HTTPException(status_code=500, detail="Unknown AI_PROVIDER")
 
 
 def create_access_token(sub: str, role: str, settings: Settings) -> str:
@@ -75,7 +45,7 @@ def get_current_user(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     token = creds.credentials
     try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
+        payload = get_token_cache(settings).decode(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except Exception:
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from ..deps import get_settings, get_current_user, require_role
 from ..config import Settings
 from ..auth.service import User
+from ..chat.context import get_context_builder
 from ..chat.router import get_chat_service
-from .service import HistoryService
-from .schemas import ConversationMeta, ConversationDetail, DeleteResponse, RenameRequest, RenameResponse
+from ..models.conversation import to_epoch_us
+from .service import HistoryService, decode_cursor
+from .schemas import AdminConversationMeta, ConversationMeta, ConversationDetail, DeleteResponse, RenameRequest, RenameResponse
 
 router = APIRouter(prefix="/history", tags=["history"])
 
@@ -15,9 +19,22 @@ def get_history_service(settings: Settings = Depends(get_settings)) -> HistorySe
 
 
 @router.get("", response_model=list[ConversationMeta])
-async def list_history(page: int = 1, pageSize: int = 20, settings: Settings = Depends(get_settings), user: User = Depends(require_role("student"))):
+async def list_history(
+    response: Response,
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    settings: Settings = Depends(get_settings),
+    user: User = Depends(require_role("student")),
+):
+    """Newest first. The next page's cursor, if any, is in the ``X-Next-Cursor`` header."""
     hs = get_history_service(settings)
-    items = hs.list_user_conversations(user.id, page, pageSize)
+    try:
+        items, next_cursor = await hs.list_user_conversations(user.id, page, pageSize, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     result = [
         ConversationMeta(id=c.id, title=c.title, createdAt=c.created_at, updatedAt=c.updated_at) for c in items
     ]
@@ -27,7 +44,7 @@ async def list_history(page: int = 1, pageSize: int = 20, settings: Settings = D
 @router.get("/{conversationId}", response_model=ConversationDetail)
 async def get_history_item(conversationId: str, settings: Settings = Depends(get_settings), user: User = Depends(require_role("student"))):
     hs = get_history_service(settings)
-    c = hs.get_conversation(conversationId)
+    c = await hs.get_conversation(conversationId)
     if not c or c.user_id != user.id:
         raise HTTPException(status_code=404, detail="Not found")
     if settings.privacy_store_messages:
@@ -42,23 +59,66 @@ async def get_history_item(conversationId: str, settings: Settings = Depends(get
 @router.delete("/{conversationId}", response_model=DeleteResponse)
 async def delete_history_item(conversationId: str, settings: Settings = Depends(get_settings), user: User = Depends(require_role("student"))):
     hs = get_history_service(settings)
-    deleted = hs.delete_conversation(conversationId, user.id)
+    deleted = await hs.delete_conversation(conversationId, user.id)
+    if deleted:
+        get_context_builder(settings).discard(conversationId)
     return DeleteResponse(deleted=deleted)
 
 @router.patch("/{conversationId}", response_model=RenameResponse)
 async def rename_history_item(conversationId: str, payload: RenameRequest, settings: Settings = Depends(get_settings), user: User = Depends(require_role("student"))):
     hs = get_history_service(settings)
-    ok = hs.rename_conversation(conversationId, user.id, payload.title)
+    ok = await hs.rename_conversation(conversationId, user.id, payload.title)
     return RenameResponse(renamed=ok)
 
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-@admin_router.get("/conversations", response_model=list[ConversationMeta])
-async def admin_list_conversations(settings: Settings = Depends(get_settings), user: User = Depends(require_role("admin"))):
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _admin_meta(c) -> AdminConversationMeta:
+    return AdminConversationMeta(id=c.id, title=c.title, createdAt=c.created_at, updatedAt=c.updated_at, userId=c.user_id)
+
+
+@admin_router.get("/conversations", response_model=list[AdminConversationMeta])
+async def admin_list_conversations(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    userId: str | None = None,
+    updatedFrom: datetime | None = None,
+    updatedTo: datetime | None = None,
+    titlePrefix: str | None = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    settings: Settings = Depends(get_settings),
+    user: User = Depends(require_role("admin")),
+):
+    """Newest first, filtered by owner, ``updatedAt`` range (inclusive) and title prefix.
+
+    ``format=json`` returns one page and puts the next cursor in ``X-Next-Cursor``;
+    ``format=ndjson`` streams every match from ``cursor`` on, one object per line.
+    """
     hs = get_history_service(settings)
-    items = hs.list_all_conversations()
-    return [
-        ConversationMeta(id=c.id, title=c.title, createdAt=c.created_at, updatedAt=c.updated_at) for c in items
-    ]
+    filters = {
+        "user_id": userId,
+        "updated_from": to_epoch_us(_utc(updatedFrom)) if updatedFrom else None,
+        "updated_to": to_epoch_us(_utc(updatedTo)) if updatedTo else None,
+        "title_prefix": titlePrefix,
+    }
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if format == "ndjson":
+        async def lines():
+            async for c in hs.iter_conversations(cursor, **filters):
+                yield _admin_meta(c).model_dump_json() + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    items, next_cursor = await hs.list_conversations_page(limit, cursor, **filters)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_admin_meta(c) for c in items]
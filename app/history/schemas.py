@@ -10,6 +10,10 @@ class ConversationMeta(BaseModel):
     updatedAt: datetime
 
 
+class AdminConversationMeta(ConversationMeta):
+    userId: str
+
+
 class ConversationDetail(BaseModel):
     id: str
     title: str
@@ -1,26 +1,76 @@
 from __future__ import annotations
-from typing import List
+import base64
+from typing import AsyncIterator, List
 from ..chat.service import ChatService
 from ..models.conversation import Conversation
 
 
+def encode_cursor(conv: Conversation) -> str:
+    """Opaque keyset cursor pointing just past ``conv`` in newest-first order."""
+    return base64.urlsafe_b64encode(f"{conv.updated_us}:{conv.id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_us, cid = raw.split(":", 1)
+        return int(updated_us), cid
+    except Exception as e:  # noqa: BLE001
+        raise ValueError("Invalid cursor") from e
+
+
 class HistoryService:
     def __init__(self, chat_service: ChatService):
         self.chat_service = chat_service
 
-    def list_user_conversations(self, user_id: str, page: int, page_size: int) -> List[Conversation]:
-        items = sorted(self.chat_service.list_user_conversations(user_id), key=lambda c: c.updated_at, reverse=True)
-        start = (page - 1) * page_size
-        return items[start : start + page_size]
+    async def list_user_conversations(
+        self, user_id: str, page: int, page_size: int, cursor: str | None = None
+    ) -> tuple[List[Conversation], str | None]:
+        """One page, newest first, plus the cursor of the next page (None on the last page).
+
+        With a ``cursor`` the page costs O(page_size); ``page`` is kept for old
+        clients and skips ``(page - 1) * page_size`` entries.
+        """
+        before = decode_cursor(cursor) if cursor else None
+        offset = 0 if cursor else (page - 1) * page_size
+        # Fetch one extra row to learn whether another page exists.
+        items = await self.chat_service.list_user_page(user_id, page_size + 1, before, offset)
+        if len(items) > page_size:
+            items = items[:page_size]
+            return items, encode_cursor(items[-1])
+        return items, None
+
+    async def get_conversation(self, conversation_id: str) -> Conversation | None:
+        return await self.chat_service.get_conversation(conversation_id)
+
+    async def list_all_conversations(self) -> List[Conversation]:
+        return await self.chat_service.list_all_conversations()
 
-    def get_conversation(self, conversation_id: str) -> Conversation | None:
-        return self.chat_service.get_conversation(conversation_id)
+    async def list_conversations_page(
+        self, limit: int, cursor: str | None = None, **filters
+    ) -> tuple[List[Conversation], str | None]:
+        """One page of every user's conversations, newest first, plus the next cursor."""
+        before = decode_cursor(cursor) if cursor else None
+        items = await self.chat_service.list_page(limit + 1, before, **filters)
+        if len(items) > limit:
+            items = items[:limit]
+            return items, encode_cursor(items[-1])
+        return items, None
 
-    def list_all_conversations(self) -> List[Conversation]:
-        return self.chat_service.list_all_conversations()
+    async def iter_conversations(
+        self, cursor: str | None = None, batch_size: int = 500, **filters
+    ) -> AsyncIterator[Conversation]:
+        """Every matching conversation, fetched ``batch_size`` at a time by keyset."""
+        while True:
+            items, cursor = await self.list_conversations_page(batch_size, cursor, **filters)
+            for conv in items:
+                yield conv
+            if cursor is None:
+                return
 
-    def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
-        return self.chat_service.delete_conversation(conversation_id, user_id)
+    async def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
+        return await self.chat_service.delete_conversation(conversation_id, user_id)
 
-    def rename_conversation(self, conversation_id: str, user_id: str, title: str) -> bool:
-        return self.chat_service.rename_conversation(conversation_id, user_id, title)
+    async def rename_conversation(self, conversation_id: str, user_id: str, title: str) -> bool:
+        return await self.chat_service.rename_conversation(conversation_id, user_id, title)
@@ -1,17 +1,46 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI, Depends, Request, HTTPException
-from starlette.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
-from time import time
 
 from .config import get_settings, Settings
 from dotenv import load_dotenv
-from .auth.router import router as auth_router
-from .chat.router import router as chat_router
+from .auth.router import router as auth_router, admin_router as admin_auth_router
+from .chat.router import router as chat_router, close_chat_service
 from .history.router import router as history_router, admin_router as admin_history_router
 from .feedback.router import router as feedback_router
+from .ai.registry import provider_registry
+from .ai.transport import get_http_transport, close_http_transport
+from .ai.circuit import breakers
+from .deps import get_user_service, require_role
+from .auth.service import User
+from .metrics import metrics
+from .ratelimit.limiter import get_rate_limiter
+from .chat.admission import get_admission_limiter
+from .chat.summary import close_summarizer
+from .ai.tokenizer import load_tokenizer
 
 load_dotenv()
-app = FastAPI(title="GenAI Chat Backend")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await load_tokenizer(get_settings())
+    # Build and warm the provider chain once so requests only look it up.
+    try:
+        await provider_registry.warmup(get_settings())
+    except Exception:  # noqa: BLE001
+        logging.exception("AI provider warm-up failed; chains will be built on first use")
+    get_rate_limiter(get_settings()).start()
+    yield
+    await get_rate_limiter(get_settings()).aclose()
+    await close_summarizer()
+    await close_chat_service()
+    await provider_registry.aclose()
+    await close_http_transport()
+
+
+app = FastAPI(title="GenAI Chat Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,29 +50,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-WINDOW = 60
-LIMIT = 60
-_buckets: dict[str, list[float]] = {}
-
-
 @app.middleware("http")
 async def rate_limit(request: Request, call_next):
-    ip = request.client.host if request.client else "unknown"
-    now = time()
-    bucket = _buckets.setdefault(ip, [])
-    bucket[:] = [t for t in bucket if now - t < WINDOW]
-    if len(bucket) >= LIMIT:
-        return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
-    bucket.append(now)
-    return await call_next(request)
+    return await get_rate_limiter(get_settings()).dispatch(request, call_next)
 
 
 @app.get("/api/health")
 async def health(settings: Settings = Depends(get_settings)):
-    return {"status": "ok", "provider": settings.ai_provider}
+    return {
+        "status": "ok",
+        "provider": settings.ai_provider,
+        "http": get_http_transport(settings).stats(),
+        "breakers": breakers.snapshot(),
+        "admission": get_admission_limiter(settings).snapshot(),
+        "passwordHashing": get_user_service().hasher.snapshot(),
+    }
+
+
+@app.get("/api/metrics")
+async def metrics_view(user: User = Depends(require_role("admin"))):
+    return metrics.snapshot()
 
 
 app.include_router(auth_router, prefix="/api")
+app.include_router(admin_auth_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
 app.include_router(history_router, prefix="/api")
 app.include_router(admin_history_router, prefix="/api")
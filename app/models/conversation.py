@@ -1,29 +1,218 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from datetime import datetime, timezone
-from typing import List
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import sys
+from typing import Callable, Iterable, Iterator, List, overload
 import uuid
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
 
-@dataclass
+
+def to_epoch_us(dt: datetime) -> int:
+    return (dt - _EPOCH) // _US
+
+
+def from_epoch_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+@dataclass(slots=True)
 class Message:
+    """API view of one message; conversations store messages as columns and build these on access."""
+
     id: str
     user_id: str | None
     role: str
     content: str | None
     timestamp: datetime
+    tokens: int | None = None  # content length in tokens, once counted
+
+
+class _Symbols:
+    """Process-wide string table: each distinct value is stored once and referred to by index."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, *initial: str | None):
+        self.values: List[str | None] = []
+        self.codes: dict[str | None, int] = {}
+        for value in initial:
+            self.code(value)
+
+    def code(self, value: str | None) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value) if value is not None else None)
+        return code
+
+
+_roles = _Symbols("user", "assistant", "system")
+_users = _Symbols(None)
+
+
+class MessageColumns:
+    """A conversation's messages as parallel columns rather than one object each.
+
+    Timestamps are epoch microseconds in an ``array('q')``, roles and user ids
+    are indexes into process-wide symbol tables, and only content keeps a
+    Python reference per message. Token counts are cached in their own
+    column (-1 until counted). Message ids are the 1-based position.
+    Indexing and iteration build ``Message`` objects on demand, so callers
+    keep the list-like API (``append``, ``len``, ``[-1]``, ``for m in ...``).
+    """
+
+    __slots__ = ("_ts", "_roles", "_users", "_contents", "_tokens")
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        self._ts = array("q")
+        self._roles = array("B")
+        self._users = array("I")
+        self._contents: List[str | None] = []
+        self._tokens = array("i")
+        for msg in messages:
+            self.append(msg)
+
+    def add(self, user_id: str | None, role: str, content: str | None, ts_us: int, tokens: int | None = None) -> None:
+        """Append without building a ``Message``; the id is the new length."""
+        self._ts.append(ts_us)
+        self._roles.append(_roles.code(role))
+        self._users.append(_users.code(user_id))
+        self._contents.append(content)
+        self._tokens.append(-1 if tokens is None else tokens)
+
+    def append(self, msg: Message) -> None:
+        self.add(msg.user_id, msg.role, msg.content, to_epoch_us(msg.timestamp), msg.tokens)
+
+    def tokens(self, i: int, count: Callable[[str], int]) -> int:
+        """Token count of message ``i``'s content, counted with ``count`` on first use."""
+        tokens = self._tokens[i]
+        if tokens < 0:
+            content = self._contents[i]
+            tokens = self._tokens[i] = count(content) if content else 0
+        return tokens
+
+    def turn(self, i: int) -> tuple[str, str | None]:
+        return _roles.values[self._roles[i]], self._contents[i]
+
+    def turns(self, start: int = 0) -> Iterator[tuple[str, str | None]]:
+        """``(role, content)`` pairs from ``start`` on, without materializing messages."""
+        roles = _roles.values
+        return zip((roles[r] for r in self._roles[start:]), self._contents[start:])
+
+    def _message(self, i: int) -> Message:
+        return Message(
+            id=str(i + 1),
+            user_id=_users.values[self._users[i]],
+            role=_roles.values[self._roles[i]],
+            content=self._contents[i],
+            timestamp=from_epoch_us(self._ts[i]),
+            tokens=self._tokens[i] if self._tokens[i] >= 0 else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    @overload
+    def __getitem__(self, index: int) -> Message: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Message]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("message index out of range")
+        return self._message(index)
+
+    def __iter__(self) -> Iterator[Message]:
+        return (self._message(i) for i in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f"MessageColumns({len(self)} messages)"
 
 
-@dataclass
 class Conversation:
-    id: str
-    user_id: str
-    title: str
-    created_at: datetime
-    updated_at: datetime
-    messages: List[Message] = field(default_factory=list)
+    """Conversation metadata plus its messages.
+
+    Timestamps are held as epoch microseconds (``created_us``/``updated_us``)
+    with ``datetime`` properties for the API. ``messages`` is created on first
+    access, so metadata-only objects (listings, store indexes) carry no columns.
+    ``summary`` condenses the first ``summary_upto`` messages once the
+    conversation grows long (see ``chat.summary``).
+    """
+
+    __slots__ = ("id", "user_id", "title", "created_us", "updated_us", "summary", "summary_upto", "_messages")
+
+    def __init__(
+        self,
+        id: str,
+        user_id: str,
+        title: str,
+        created_at: datetime,
+        updated_at: datetime,
+        messages: Iterable[Message] | None = None,
+    ):
+        self.id = id
+        self.user_id = sys.intern(user_id)
+        self.title = title
+        self.created_us = to_epoch_us(created_at)
+        self.updated_us = to_epoch_us(updated_at)
+        self.summary: str | None = None
+        self.summary_upto = 0
+        self._messages: MessageColumns | None = None
+        if messages is not None:
+            self.messages = messages
+
+    @classmethod
+    def from_epoch(cls, id: str, user_id: str, title: str, created_us: int, updated_us: int) -> Conversation:
+        conv = cls.__new__(cls)
+        conv.id = id
+        conv.user_id = sys.intern(user_id)
+        conv.title = title
+        conv.created_us = created_us
+        conv.updated_us = updated_us
+        conv.summary = None
+        conv.summary_upto = 0
+        conv._messages = None
+        return conv
 
     @staticmethod
     def new(user_id: str, title: str) -> Conversation:
         now = datetime.now(timezone.utc)
         return Conversation(id=str(uuid.uuid4()), user_id=user_id, title=title, created_at=now, updated_at=now)
+
+    @property
+    def created_at(self) -> datetime:
+        return from_epoch_us(self.created_us)
+
+    @created_at.setter
+    def created_at(self, value: datetime) -> None:
+        self.created_us = to_epoch_us(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        return from_epoch_us(self.updated_us)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime) -> None:
+        self.updated_us = to_epoch_us(value)
+
+    @property
+    def messages(self) -> MessageColumns:
+        if self._messages is None:
+            self._messages = MessageColumns()
+        return self._messages
+
+    @messages.setter
+    def messages(self, value: Iterable[Message]) -> None:
+        self._messages = value if isinstance(value, MessageColumns) else MessageColumns(value)
+
+    def __repr__(self) -> str:
+        return f"Conversation(id={self.id!r}, user_id={self.user_id!r}, title={self.title!r}, messages={len(self._messages or ())})"
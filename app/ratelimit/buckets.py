@@ -0,0 +1,98 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import math
+import time
+from typing import Callable
+
+
+class Decision:
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets; ``hit`` takes one token from ``key``'s bucket."""
+
+    @abstractmethod
+    def hit(self, key: str, capacity: int, rate: float) -> Decision:
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict_idle(self) -> int:
+        """Drop buckets that have fully refilled; returns how many were dropped."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "full_at")
+
+    def __init__(self, tokens: float, updated: float, full_at: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.full_at = full_at
+
+
+class TokenBucketLimiter(RateLimitBackend):
+    """In-process token buckets keyed by string, three floats per key.
+
+    A bucket holds up to ``capacity`` tokens and refills at ``rate`` tokens
+    per second; each request takes one. Once a bucket has refilled completely
+    it is indistinguishable from a new one, so ``evict_idle`` drops it without
+    changing any future decision. ``max_keys`` bounds memory between sweeps:
+    at the cap the oldest key is dropped, which can only make that client's
+    next decision more lenient.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: dict[str, _Bucket] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def hit(self, key: str, capacity: int, rate: float) -> Decision:
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(capacity)
+            if len(self._buckets) >= self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+            bucket = self._buckets[key] = _Bucket(tokens, now, now)
+        else:
+            tokens = min(float(capacity), bucket.tokens + (now - bucket.updated) * rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        bucket.tokens = tokens
+        bucket.updated = now
+        reset_after = (capacity - tokens) / rate
+        bucket.full_at = now + reset_after
+        retry_after = 0.0 if allowed else (1.0 - tokens) / rate
+        return Decision(allowed, capacity, int(tokens), reset_after, retry_after)
+
+    def evict_idle(self) -> int:
+        now = self.clock()
+        idle = [key for key, bucket in self._buckets.items() if bucket.full_at <= now]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
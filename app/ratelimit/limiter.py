@@ -0,0 +1,123 @@
+from __future__ import annotations
+import asyncio
+import logging
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from ..auth.tokens import get_token_cache
+from ..config import Settings
+from ..metrics import metrics
+from .buckets import Decision, RateLimitBackend, TokenBucketLimiter
+from .shared import SharedTokenBucketLimiter
+
+
+class RateLimitRule:
+    """``limit`` requests per ``window`` seconds for paths under ``prefix``.
+
+    ``per`` is ``"user"`` (JWT subject, falling back to the client IP for
+    anonymous requests) or ``"ip"``.
+    """
+
+    __slots__ = ("name", "prefix", "limit", "window", "per", "rate")
+
+    def __init__(self, name: str, prefix: str, limit: int, window: float = 60.0, per: str = "user"):
+        self.name = name
+        self.prefix = prefix
+        self.limit = limit
+        self.window = window
+        self.per = per
+        self.rate = limit / window
+
+
+def rules_from_settings(settings: Settings) -> list[RateLimitRule]:
+    """Most specific prefix first; the empty prefix catches everything else."""
+    return [
+        RateLimitRule("login", "/api/auth/login", settings.rate_limit_login, per="ip"),
+        RateLimitRule("chat", "/api/chat", settings.rate_limit_chat),
+        RateLimitRule("history", "/api/history", settings.rate_limit_history),
+        RateLimitRule("history", "/api/admin", settings.rate_limit_history),
+        RateLimitRule("default", "", settings.rate_limit_default),
+    ]
+
+
+def make_backend(settings: Settings) -> RateLimitBackend:
+    """``memory`` limits each worker process separately; ``shared`` enforces one
+    limit across all workers on the host through a memory-mapped file."""
+    backend = settings.rate_limit_backend.lower()
+    if backend == "memory":
+        return TokenBucketLimiter(max_keys=settings.rate_limit_max_keys)
+    if backend == "shared":
+        return SharedTokenBucketLimiter(settings.rate_limit_shared_path, slots=settings.rate_limit_shared_slots)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.rate_limit_backend}")
+
+
+class RateLimiter:
+    def __init__(self, settings: Settings, buckets: RateLimitBackend | None = None):
+        self.rules = rules_from_settings(settings)
+        self.tokens = get_token_cache(settings)
+        self.sweep_interval = settings.rate_limit_sweep_seconds
+        self.buckets = buckets or make_backend(settings)
+        self._limited = metrics.counter("ratelimit.limited")
+        self._sweeper: asyncio.Task | None = None
+
+    def rule_for(self, path: str) -> RateLimitRule:
+        for rule in self.rules:
+            if path.startswith(rule.prefix):
+                return rule
+        return self.rules[-1]
+
+    def client_key(self, request: Request, rule: RateLimitRule) -> str:
+        if rule.per == "user":
+            auth = request.headers.get("authorization", "")
+            if auth[:7].lower() == "bearer ":
+                try:
+                    sub = self.tokens.decode(auth[7:]).get("sub")
+                except Exception:  # noqa: BLE001
+                    sub = None
+                if sub:
+                    return f"user:{sub}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def check(self, request: Request) -> Decision:
+        rule = self.rule_for(request.url.path)
+        key = f"{rule.name}|{self.client_key(request, rule)}"
+        return self.buckets.hit(key, rule.limit, rule.rate)
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        decision = self.check(request)
+        if not decision.allowed:
+            self._limited.inc()
+            return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers=decision.headers())
+        response = await call_next(request)
+        response.headers.update(decision.headers())
+        return response
+
+    def start(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.buckets.evict_idle()
+            except Exception:  # noqa: BLE001
+                logging.exception("Rate limiter sweep failed")
+
+    async def aclose(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        self.buckets.close()
+
+
+_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter(settings: Settings) -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(settings)
+    return _limiter
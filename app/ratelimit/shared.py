@@ -0,0 +1,137 @@
+from __future__ import annotations
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Callable
+
+from .buckets import Decision, RateLimitBackend
+
+_MAGIC = b"GCRL0001"
+_HEADER = struct.Struct("<8sII")
+_HEADER_SIZE = 64
+_INIT_LOCK = 32  # header bytes [0, 32) serialize layout checks
+_LIVE_LOCK = 32  # byte 32 is share-locked by every open limiter
+_SLOT = struct.Struct("<Qddd")  # key digest, tokens, updated, full_at
+_PROBE = 8
+
+
+def _digest(key: str) -> int:
+    # ``hash(str)`` is salted per process; every worker must agree on slots.
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+class SharedTokenBucketLimiter(RateLimitBackend):
+    """Token buckets in a memory-mapped file, shared by every process on the host.
+
+    The file is a fixed open-addressing table of ``slots`` 32-byte records
+    split into ``stripes``; a request locks only its stripe with an
+    ``fcntl`` record lock, so workers contend only when they hit the same
+    stripe. A key probes up to 8 slots of its stripe. A bucket that has fully
+    refilled is free to reuse, which makes idle eviction implicit; when every
+    probed slot is busy the bucket closest to full is replaced.
+
+    Record locks are per process, so one instance must not be shared between
+    threads; the middleware calls it from the event loop only. Uses wall-clock
+    time because monotonic clocks are not comparable across reboots and the
+    file outlives the processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = 65536,
+        stripes: int = 256,
+        clock: Callable[[], float] = time.time,
+    ):
+        if slots % stripes or slots // stripes < _PROBE:
+            raise ValueError("slots must be a multiple of stripes with at least 8 slots per stripe")
+        self.path = path
+        self.slots = slots
+        self.stripes = stripes
+        self.per_stripe = slots // stripes
+        self.clock = clock
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._size = _HEADER_SIZE + slots * _SLOT.size
+        try:
+            self._init_file()
+            self._map = mmap.mmap(self._fd, self._size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _init_file(self) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _INIT_LOCK, 0)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            expected = _HEADER.pack(_MAGIC, self.slots, self.stripes)
+            if header != expected or os.fstat(self._fd).st_size != self._size:
+                # New file, or a layout change. Resizing a file that another
+                # process has mapped would SIGBUS it, so only reset the file
+                # when no other limiter holds the liveness lock.
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, _LIVE_LOCK)
+                except OSError:
+                    raise RuntimeError(
+                        f"{self.path} is in use by another process with a different layout; "
+                        "stop it or set RATE_LIMIT_SHARED_PATH to another file"
+                    ) from None
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, expected, 0)
+            fcntl.lockf(self._fd, fcntl.LOCK_SH, 1, _LIVE_LOCK)  # held until close()
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _INIT_LOCK, 0)
+
+    def __len__(self) -> int:
+        now = self.clock()
+        return sum(
+            1
+            for i in range(self.slots)
+            if _SLOT.unpack_from(self._map, _HEADER_SIZE + i * _SLOT.size)[3] > now
+        )
+
+    def hit(self, key: str, capacity: int, rate: float) -> Decision:
+        digest = _digest(key)
+        stripe = digest % self.stripes
+        base = _HEADER_SIZE + stripe * self.per_stripe * _SLOT.size
+        start = (digest >> 32) % self.per_stripe
+        stripe_bytes = self.per_stripe * _SLOT.size
+        buf = self._map
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, stripe_bytes, base)
+        try:
+            now = self.clock()
+            offset = -1
+            victim, victim_full_at = -1, float("inf")
+            for i in range(_PROBE):
+                at = base + (start + i) % self.per_stripe * _SLOT.size
+                slot_key, tokens, updated, full_at = _SLOT.unpack_from(buf, at)
+                if slot_key == digest:
+                    offset = at
+                    tokens = min(float(capacity), tokens + max(now - updated, 0.0) * rate)
+                    break
+                if full_at < victim_full_at:
+                    victim, victim_full_at = at, full_at
+            if offset < 0:
+                # Free slots have full_at in the past, so they are picked first.
+                offset = victim
+                tokens = float(capacity)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            reset_after = (capacity - tokens) / rate
+            _SLOT.pack_into(buf, offset, digest, tokens, now, now + reset_after)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, stripe_bytes, base)
+        retry_after = 0.0 if allowed else (1.0 - tokens) / rate
+        return Decision(allowed, capacity, int(tokens), reset_after, retry_after)
+
+    def evict_idle(self) -> int:
+        # Fully refilled slots are reused in place; nothing to reclaim.
+        return 0
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
@@ -0,0 +1,82 @@
+"""Bulk-create users from a CSV or NDJSON file through the admin import API.
+
+    python -m app.scripts.import_users users.csv --email admin@example.com --password ...
+
+Without ``--email`` the token in /tmp/chat_token.txt (which must belong to
+an admin) is used. Per-row failures are printed as they stream back, then
+the totals.
+"""
+import argparse
+import getpass
+import json
+import os
+import sys
+from pathlib import Path
+import urllib.request
+from urllib.error import HTTPError, URLError
+
+API_URL = os.environ.get("CHAT_API_URL", "http://127.0.0.1:8000/api")
+TOKEN_FILE = Path("/tmp/chat_token.txt")
+
+
+def login(email: str, password: str) -> str:
+    req = urllib.request.Request(
+        f"{API_URL}/auth/login",
+        data=json.dumps({"email": email, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read().decode())["access_token"]
+
+
+def import_users(token: str, path: Path, verbose: bool = False) -> dict:
+    fmt = "csv" if path.suffix.lower() == ".csv" else "ndjson"
+    req = urllib.request.Request(
+        f"{API_URL}/admin/users/import?format={fmt}",
+        data=path.read_bytes(),
+        headers={
+            "Content-Type": "text/csv" if fmt == "csv" else "application/x-ndjson",
+            "Authorization": f"Bearer {token}",
+        },
+        method="POST",
+    )
+    totals: dict = {}
+    with urllib.request.urlopen(req, timeout=3600) as resp:
+        for line in resp:
+            result = json.loads(line)
+            if result.get("done"):
+                totals = result
+            elif verbose or result["status"] not in {"created", "exists"}:
+                detail = f": {result['error']}" if "error" in result else ""
+                print(f"row {result['row']} {result.get('email') or ''} {result['status']}{detail}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", type=Path, help=".csv (email,password[,role] header) or .ndjson")
+    parser.add_argument("--email", help="admin email to log in with instead of the saved token")
+    parser.add_argument("--password", help="admin password (prompted if omitted)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every row, not only problems")
+    args = parser.parse_args()
+    try:
+        if args.email:
+            token = login(args.email, args.password or getpass.getpass("Admin password: "))
+        elif TOKEN_FILE.exists():
+            token = TOKEN_FILE.read_text().strip()
+        else:
+            print("Token file not found. Pass --email or run 'make login' first.")
+            sys.exit(1)
+        totals = import_users(token, args.file, args.verbose)
+    except HTTPError as e:
+        print(f"HTTP {e.code}: {e.read().decode(errors='replace')}")
+        sys.exit(1)
+    except URLError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(", ".join(f"{totals.get(k, 0)} {k}" for k in ("created", "exists", "duplicate", "invalid")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Per-request auth overhead with many users: token verification plus user lookup.
+
+Compares full ``jwt.decode`` and a linear email scan (the former code path)
+with the claims cache and the hash indexes. Password hashing is replaced by
+passlib's ``plaintext`` scheme and users are inserted already hashed, so
+building them is quick.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_auth [users] [requests]
+"""
+import sys
+import time
+
+import jwt
+from passlib.context import CryptContext
+
+from app.auth.service import User, UserService
+from app.auth.tokens import TokenClaimsCache
+
+SECRET = "bench-secret-with-at-least-32-bytes!"
+
+
+def per_call(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    service = UserService(CryptContext(schemes=["plaintext"]))
+    created = [User(id=f"id-{i}", email=f"user{i}@example.com", password_hash="pw", role="student") for i in range(users)]
+    service.add_users(created)
+    # Active sessions: a few thousand users making repeated requests.
+    active = created[:: max(1, users // 2000)]
+    tokens = [jwt.encode({"sub": u.id, "role": u.role, "exp": int(time.time()) + 3600}, SECRET, algorithm="HS256") for u in active]
+    stream = [tokens[(i * 7) % len(tokens)] for i in range(requests)]
+    emails = [active[(i * 13) % len(active)].email for i in range(min(requests, 2000))]
+
+    def authenticate_uncached(token: str):
+        return service.get_user_by_id(jwt.decode(token, SECRET, algorithms=["HS256"])["sub"])
+
+    cache = TokenClaimsCache(SECRET, max_entries=10_000)
+
+    def authenticate_cached(token: str):
+        return service.get_user_by_id(cache.decode(token)["sub"])
+
+    def scan_email(email: str):
+        return next((u for u in service._users.values() if u.email == email), None)
+
+    print(f"{users} users, {len(tokens)} active tokens")
+    print(f"request auth, jwt.decode:      {per_call(authenticate_uncached, stream):8.2f} µs")
+    print(f"request auth, cache miss:      {per_call(authenticate_cached, tokens):8.2f} µs")
+    print(f"request auth, cache hit:       {per_call(authenticate_cached, stream):8.2f} µs")
+    print(f"login lookup, linear scan:     {per_call(scan_email, emails[:200]):8.2f} µs")
+    print(f"login lookup, email index:     {per_call(service.get_user_by_email, emails):8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Append throughput, read cost and retained memory of the conversation stores.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_store [conversations] [messages_per_conversation]
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.config import Settings
+from app.chat.logstore import LogConversationStore
+from app.chat.service import ChatService
+from app.chat.store import InMemoryConversationStore, SQLiteConversationStore
+
+
+async def run(name: str, store, conversations: int, per_conversation: int) -> None:
+    service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True), store)
+    tracemalloc.start()
+    start = time.perf_counter()
+    ids = []
+    for c in range(conversations):
+        conv = await service.create_conversation(f"user-{c % 100}", "benchmark conversation")
+        ids.append(conv.id)
+        for m in range(per_conversation):
+            role = "user" if m % 2 == 0 else "assistant"
+            await service.add_message(conv, conv.user_id if role == "user" else None, role, f"message {m} " + "lorem ipsum " * 8)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = conversations * per_conversation
+    start = time.perf_counter()
+    for cid in ids[:: max(1, len(ids) // 200)]:
+        await service.get_conversation(cid)
+    reads = len(ids[:: max(1, len(ids) // 200)])
+    read_ms = (time.perf_counter() - start) / reads * 1e3
+    await service.aclose()
+    print(
+        f"{name:7s} {total / elapsed:10.0f} msgs/s  {retained / total:7.0f} B retained/msg  "
+        f"{read_ms:6.2f} ms per conversation read"
+    )
+
+
+def main() -> None:
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    tmp = tempfile.mkdtemp()
+    try:
+        asyncio.run(run("memory", InMemoryConversationStore(), conversations, per_conversation))
+        asyncio.run(run("sqlite", SQLiteConversationStore(os.path.join(tmp, "chat.db")), conversations, per_conversation))
+        asyncio.run(run("log", LogConversationStore(os.path.join(tmp, "log")), conversations, per_conversation))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
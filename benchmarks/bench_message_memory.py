@@ -0,0 +1,90 @@
+"""Bytes per message held in memory: the former dataclass-per-message layout vs columns.
+
+Message contents are created before measuring and shared by both layouts, so
+the numbers are the per-message overhead on top of the text itself.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_message_memory [conversations] [messages_per_conversation]
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from app.models.conversation import Conversation, Message
+
+
+@dataclass
+class LegacyMessage:
+    id: str
+    user_id: str | None
+    role: str
+    content: str | None
+    timestamp: datetime
+
+
+@dataclass
+class LegacyConversation:
+    id: str
+    user_id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    messages: List[LegacyMessage] = field(default_factory=list)
+
+
+def measure(label: str, build, total: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>8}: {retained / total:7.1f} B/msg  build {elapsed / total * 1e6:5.2f} µs/msg")
+    del kept
+
+
+def main() -> None:
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_conversation = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    total = conversations * per_conversation
+    base = datetime.now(timezone.utc)
+    # Strings the request path would allocate anyway: user ids decoded from
+    # JWTs and message text. Roles are literals in both layouts.
+    users = [f"user-{c % 500}" for c in range(conversations)]
+    contents = [f"message {m} " + "lorem ipsum " * 8 for m in range(per_conversation)]
+
+    def legacy():
+        convs = []
+        for c in range(conversations):
+            conv = LegacyConversation(f"conv-{c}", users[c], "benchmark", base, base)
+            for m in range(per_conversation):
+                user = "".join(users[c]) if m % 2 == 0 else None  # a fresh string per request, as from a JWT
+                role = "user" if m % 2 == 0 else "assistant"
+                ts = base + timedelta(microseconds=m)
+                conv.messages.append(LegacyMessage(str(m + 1), user, role, contents[m], ts))
+            convs.append(conv)
+        return convs
+
+    def compact():
+        convs = []
+        for c in range(conversations):
+            conv = Conversation(f"conv-{c}", users[c], "benchmark", base, base)
+            for m in range(per_conversation):
+                user = "".join(users[c]) if m % 2 == 0 else None
+                role = "user" if m % 2 == 0 else "assistant"
+                ts = base + timedelta(microseconds=m)
+                conv.messages.append(Message(str(m + 1), user, role, contents[m], ts))
+            convs.append(conv)
+        return convs
+
+    print(f"{conversations} conversations x {per_conversation} messages")
+    measure("before", legacy, total)
+    measure("after", compact, total)
+
+
+if __name__ == "__main__":
+    main()
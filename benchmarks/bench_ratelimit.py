@@ -0,0 +1,61 @@
+"""Per-request cost of the rate-limit backends, alone and under cross-process contention.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ratelimit [processes] [hits_per_process]
+"""
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from app.ratelimit.buckets import TokenBucketLimiter
+from app.ratelimit.shared import SharedTokenBucketLimiter
+
+KEYS = [f"chat|user:{i}" for i in range(5000)]
+
+
+def run_hits(limiter, hits: int, offset: int = 0) -> float:
+    n = len(KEYS)
+    start = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(KEYS[(i * 7 + offset) % n], 60, 1.0)
+    return (time.perf_counter() - start) / hits
+
+
+def _worker(path: str, hits: int, offset: int, barrier, out) -> None:
+    limiter = SharedTokenBucketLimiter(path)
+    barrier.wait()
+    out.put(run_hits(limiter, hits, offset))
+    limiter.close()
+
+
+def main() -> None:
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    hits = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit.bin")
+
+    print(f"memory backend:          {run_hits(TokenBucketLimiter(), hits) * 1e6:.2f} us/hit")
+    shared = SharedTokenBucketLimiter(path)
+    print(f"shared backend, 1 proc:  {run_hits(shared, hits) * 1e6:.2f} us/hit")
+    shared.close()
+
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(processes)
+    out = ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(path, hits, i, barrier, out)) for i in range(processes)]
+    for w in workers:
+        w.start()
+    per_hit = [out.get() for _ in workers]
+    for w in workers:
+        w.join()
+    print(
+        f"shared backend, {processes} procs: mean {sum(per_hit) / len(per_hit) * 1e6:.2f} us/hit, "
+        f"worst process {max(per_hit) * 1e6:.2f} us/hit"
+    )
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
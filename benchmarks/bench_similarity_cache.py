@@ -0,0 +1,80 @@
+"""Lookup cost of the MinHash/LSH similarity cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_similarity_cache [entries] [threshold]
+"""
+import random
+import sys
+import time
+
+from app.ai.similarity_cache import SimilarityIndex
+
+COMMON = "explain what is the how to write an essay on about of in and for with why does a".split()
+TOPICS = (
+    "recursion climate change python loops list comprehension world war history photosynthesis "
+    "derivative integral matrix vector probability statistics poem story river mountain economy "
+    "inflation market algorithm sorting binary search tree graph network cell energy physics "
+    "gravity atom molecule chemistry reaction language grammar verb noun"
+).split()
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    # Topic words plus pseudo-words so the corpus is not dominated by a tiny vocabulary.
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return TOPICS + ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+WORDS: list[str] = []
+
+
+def make_prompt(rng: random.Random) -> str:
+    return " ".join(rng.choice(COMMON) if rng.random() < 0.4 else rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+
+
+def perturb(prompt: str, rng: random.Random) -> str:
+    words = prompt.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words).capitalize() + "?"
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> None:
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(7)
+    WORDS.extend(make_vocabulary(rng))
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    index = SimilarityIndex(max_entries=entries, ttl_seconds=3600, threshold=threshold)
+    scope = ("bench", "model", (), 256)
+    prompts = [make_prompt(rng) for _ in range(entries)]
+
+    start = time.perf_counter()
+    for i, prompt in enumerate(prompts):
+        index.add(scope, prompt, {"reply": f"reply {i}", "usage": {}})
+    build = time.perf_counter() - start
+    print(f"indexed {len(index)} prompts in {build:.2f}s ({build / entries * 1e6:.1f} us/insert)")
+
+    for label, queries in (
+        ("exact repeat", [rng.choice(prompts) for _ in range(2000)]),
+        ("near duplicate", [perturb(rng.choice(prompts), rng) for _ in range(2000)]),
+        ("unrelated", [make_prompt(rng) for _ in range(2000)]),
+    ):
+        timings = []
+        hits = 0
+        for query in queries:
+            t0 = time.perf_counter()
+            found = index.lookup(scope, query)
+            timings.append(time.perf_counter() - t0)
+            hits += found is not None
+        print(
+            f"{label:15s} hit rate {hits / len(queries):6.1%}  "
+            f"mean {sum(timings) / len(timings) * 1e6:7.1f} us  p99 {percentile(timings, 0.99) * 1e6:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Bulk user import throughput against the number of hashing processes.
+
+The baseline is ``UserService.create_user`` awaited in a loop (one bcrypt
+hash at a time on the hasher's thread pool). Each import run hashes on a fresh process
+pool, so pool start-up is included in its time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_user_import [users] [bcrypt rounds] [max workers]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from app.auth.bulk import UserImporter, parse_rows
+from app.auth.hashing import password_context
+from app.auth.service import UserService
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    context = password_context(rounds)
+    rows = "email,password\n" + "".join(f"user{i}@example.com,password{i}\n" for i in range(users))
+
+    service = UserService(context)
+
+    async def create_all():
+        for i in range(users):
+            await service.create_user(f"user{i}@example.com", f"password{i}")
+
+    start = time.perf_counter()
+    asyncio.run(create_all())
+    baseline = users / (time.perf_counter() - start)
+    print(f"{users} users, bcrypt rounds {rounds}, {os.cpu_count()} CPUs")
+    print(f"create_user loop:       {baseline:8.1f} users/s")
+
+    workers = 1
+    while workers <= max_workers:
+        service = UserService(context)
+        importer = UserImporter(service, rounds, workers=workers, batch_size=16)
+
+        async def run():
+            async for _ in importer.run(parse_rows(rows, "csv")):
+                pass
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        rate = users / (time.perf_counter() - start)
+        print(f"import, {workers:2d} worker(s):   {rate:8.1f} users/s  ({rate / baseline:.2f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from app.chat.admission import AdaptiveLimiter, AdmissionRejected
+
+
+def test_excess_requests_queue_then_shed():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, queue_size=1, queue_timeout=0.05)
+
+    async def run():
+        first = await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire()  # queue full
+        limiter.release(first)
+        await queued
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire()  # waits past the deadline
+        return limiter.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert snapshot["inFlight"] == 1 and snapshot["queued"] == 0
+
+
+def test_limit_shrinks_when_latency_rises():
+    limiter = AdaptiveLimiter(initial_limit=20, min_limit=2, clock=lambda: 10.0)
+
+    def sample(rtt):
+        limiter.in_flight = int(limiter.limit)  # saturated, so samples count
+        limiter.release(10.0 - rtt)
+
+    for _ in range(20):
+        sample(0.1)
+    baseline = limiter.limit
+    for _ in range(10):
+        sample(2.0)
+    assert limiter.limit < baseline
@@ -15,3 +15,131 @@ def test_login_success():
 def test_login_fail():
     r = client.post("/api/auth/login", json={"email": "student@example.com", "password": "wrong"})
     assert r.status_code == 401
+
+
+def test_token_cache_honours_exp_and_secret():
+    import jwt
+    from app.auth.tokens import TokenClaimsCache
+
+    now = [1000.0]
+    cache = TokenClaimsCache("secret", max_entries=2, clock=lambda: now[0])
+    token = jwt.encode({"sub": "u1", "exp": 2_000_000_000}, "secret", algorithm="HS256")
+    assert cache.decode(token)["sub"] == "u1"
+    assert cache.decode(token)["sub"] == "u1" and len(cache) == 1
+    now[0] = 2_000_000_000.0
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.decode(token)
+    assert len(cache) == 0
+    with pytest.raises(jwt.InvalidSignatureError):
+        TokenClaimsCache("other").decode(token)
+
+
+def test_token_cache_is_safe_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    import jwt
+    from app.auth.tokens import TokenClaimsCache
+
+    secret = "secret-with-at-least-32-bytes-for-hs256"
+    cache = TokenClaimsCache(secret, max_entries=4)
+    tokens = [jwt.encode({"sub": f"u{i}", "exp": 2_000_000_000}, secret, algorithm="HS256") for i in range(16)]
+
+    def hammer(offset):
+        return [cache.decode(tokens[(offset + i) % len(tokens)])["sub"] for i in range(2000)]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(hammer, range(8)))
+    assert all(len(r) == 2000 for r in results) and len(cache) <= 4
+
+
+def test_user_service_indexes_by_email_and_id():
+    import asyncio
+    from app.deps import get_user_service
+
+    users = get_user_service()
+
+    async def run():
+        user = await users.create_user("indexed@example.com", "pw")
+        assert users.get_user_by_email("indexed@example.com") is user
+        assert users.get_user_by_id(user.id) is user
+        assert await users.create_user("indexed@example.com", "other") is user
+        # Concurrent calls for one email hash twice but keep a single user.
+        first, second = await asyncio.gather(*(users.create_user("race@example.com", "pw") for _ in range(2)))
+        assert first is second is users.get_user_by_email("race@example.com")
+
+    asyncio.run(run())
+
+
+def test_login_rehashes_outdated_cost_and_sheds_when_saturated():
+    import asyncio
+    from app.auth.hashing import PasswordHasher, PasswordHasherBusy, make_password_context
+    from app.auth.service import UserService
+    from app.config import Settings
+
+    old = make_password_context(Settings(BCRYPT_ROUNDS=4))
+    new = make_password_context(Settings(BCRYPT_ROUNDS=5))
+    users = UserService(old, PasswordHasher(old, workers=1, queue_limit=0))
+    user = asyncio.run(users.create_user("cost@example.com", "pw"))
+    users.hasher = PasswordHasher(new, workers=1, queue_limit=1)
+
+    async def run():
+        assert await users.authenticate("cost@example.com", "wrong") is None
+        assert await users.authenticate("cost@example.com", "pw") is user
+        rehashed = user.password_hash
+        # Two admitted (one running, one queued); the third is turned away.
+        results = await asyncio.gather(
+            *(users.authenticate("cost@example.com", "pw") for _ in range(3)), return_exceptions=True
+        )
+        return rehashed, results
+
+    rehashed, results = asyncio.run(run())
+    assert rehashed.startswith("$2b$05$")
+    assert results[:2] == [user, user] and isinstance(results[2], PasswordHasherBusy)
+
+
+def test_bulk_import_hashes_in_processes_and_reports_each_row():
+    import asyncio
+    from app.auth.bulk import UserImporter, parse_rows
+    from app.auth.hashing import password_context
+    from app.auth.service import UserService
+
+    context = password_context(4)
+    users = UserService(context)
+    csv_rows = (
+        "Email,Password,Role\n"
+        "a@example.com,pw-a,admin\n"
+        "student@example.com,pw,student\n"
+        "not-an-email,pw,student\n"
+        "b@example.com,pw-b\n"
+        "a@example.com,again,student\n"
+        "c@example.com,pw-c,student\n"
+        "d@example.com,pw-d,student\n"
+    )
+
+    async def run(rows):
+        importer = UserImporter(users, 4, workers=1, batch_size=2)
+        return [r async for r in importer.run(rows)]
+
+    results = asyncio.run(run(parse_rows(csv_rows, "csv")))
+    by_row = {r["row"]: r for r in results if "row" in r}
+    assert [by_row[i]["status"] for i in range(1, 8)] == [
+        "created", "exists", "invalid", "created", "duplicate", "created", "created",
+    ]
+    assert results[-1] == {"done": True, "created": 4, "exists": 1, "duplicate": 1, "invalid": 1}
+    assert users.get_user_by_email("b@example.com").role == "student"
+    created = users.get_user_by_email("a@example.com")
+    assert created.id == by_row[1]["id"] and created.role == "admin"
+    assert context.verify("pw-a", created.password_hash)
+
+    ndjson = '{"email": "e@example.com", "password": "pw-e"}\n\n[1]\n{"email": "c@example.com", "password": "x"}\n'
+    statuses = [r.get("status") for r in asyncio.run(run(parse_rows(ndjson, "ndjson")))]
+    assert statuses == ["invalid", "exists", "created", None]
+
+
+def test_bulk_import_requires_admin():
+    token = client.post("/api/auth/login", json={"email": "student@example.com", "password": "password"}).json()["access_token"]
+    r = client.post(
+        "/api/admin/users/import",
+        content="email,password\nx@example.com,pw\n",
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "text/csv"},
+    )
+    assert r.status_code == 403
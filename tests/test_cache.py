@@ -0,0 +1,119 @@
+import asyncio
+from app.ai.cache import CachedAIClient, ResponseCache
+from app.ai.similarity_cache import SimilarityCachedAIClient, SimilarityIndex
+from app.ai.coalesce import CoalescingAIClient
+
+
+class CountingAI:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, max_tokens, temperature):
+        self.calls += 1
+        return {"reply": f"reply {self.calls}", "usage": {"totalTokens": 4}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_client_hits_misses_and_bypass():
+    inner = CountingAI()
+    client = CachedAIClient(inner, ResponseCache(8, 60), provider="mock", model="mock", max_temperature=0.5)
+    messages = [{"role": "user", "content": "Explain  recursion"}]
+
+    async def run():
+        first = await client.chat(messages, 64, 0.2)
+        second = await client.chat([{"role": "user", "content": "Explain recursion "}], 64, 0.2)
+        hot = await client.chat(messages, 64, 0.9)
+        return first, second, hot
+
+    first, second, hot = asyncio.run(run())
+    assert first["usage"]["X-Cache"] == "MISS"
+    assert second["usage"]["X-Cache"] == "HIT"
+    assert second["reply"] == first["reply"]
+    assert hot["usage"]["X-Cache"] == "BYPASS"
+    assert inner.calls == 2
+    assert (client.cache.hits, client.cache.misses) == (1, 1)
+
+
+def test_response_cache_lru_and_ttl_eviction():
+    clock = FakeClock()
+    cache = ResponseCache(2, ttl_seconds=10, clock=clock)
+    cache.set("a", {"reply": "A"})
+    cache.set("b", {"reply": "B"})
+    assert cache.get("a") == {"reply": "A"}
+    cache.set("c", {"reply": "C"})  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_similarity_cache_serves_near_duplicate_single_turn_prompts():
+    inner = CountingAI()
+    index = SimilarityIndex(max_entries=2, ttl_seconds=60, threshold=0.8)
+    client = SimilarityCachedAIClient(inner, index, provider="mock", model="mock", max_temperature=0.5)
+
+    async def ask(text, history=()):
+        return await client.chat([*history, {"role": "user", "content": text}], 64, 0.2)
+
+    async def run():
+        first = await ask("Write an essay on climate change")
+        near = await ask("write an essay on climate change!!")
+        other = await ask("How do binary search trees stay balanced?")
+        follow_up = await ask("Write an essay on climate change", history=[{"role": "assistant", "content": "Hi"}])
+        return first, near, other, follow_up
+
+    first, near, other, follow_up = asyncio.run(run())
+    assert near["reply"] == first["reply"]
+    assert near["usage"]["X-Cache"] == "SIMILAR"
+    assert other["reply"] != first["reply"]
+    assert "X-Cache" not in follow_up["usage"]
+    assert inner.calls == 3
+    assert len(index) == 2
+
+
+class SlowAI:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def chat(self, messages, max_tokens, temperature):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return {"reply": "shared", "usage": {}}
+
+
+def test_coalescing_shares_one_call_and_survives_cancellation():
+    inner = SlowAI()
+    client = CoalescingAIClient(inner, provider="mock", model="mock")
+    messages = [{"role": "user", "content": "explain recursion"}]
+
+    async def run():
+        waiters = [asyncio.ensure_future(client.chat(messages, 64, 0.2)) for _ in range(5)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters[1:])
+
+    results = asyncio.run(run())
+    assert [r["reply"] for r in results] == ["shared"] * 4
+    assert inner.calls == 1
+    assert client.saved == 4
+
+
+def test_coalescing_propagates_failures_to_every_waiter():
+    client = CoalescingAIClient(SlowAI(fail=True), provider="mock", model="mock")
+    messages = [{"role": "user", "content": "explain recursion"}]
+
+    async def run():
+        return await asyncio.gather(*(client.chat(messages, 64, 0.2) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
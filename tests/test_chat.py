@@ -1,3 +1,4 @@
+import json
 from fastapi.testclient import TestClient
 from app.main import app
 from app.deps import get_ai_client
@@ -6,6 +7,10 @@ class MockAI:
     async def chat(self, messages, max_tokens, temperature):
         return {"reply": "Hello from mock", "usage": {"promptTokens": 3, "completionTokens": 3, "totalTokens": 6}}
 
+    async def stream(self, messages, max_tokens, temperature):
+        for chunk in ("Hello ", "from ", "mock"):
+            yield chunk
+
 
 def override_ai():
     return MockAI()
@@ -42,3 +47,135 @@ def test_privacy_redaction_and_history():
     r3 = client.get(f"/api/history/{cid}", headers={"Authorization": f"Bearer {token}"})
     assert r3.status_code == 200
     assert "id" in r3.json()
+
+
+def test_chat_stream_emits_chunks_and_persists_reply():
+    # Other test modules install their own (non-streaming) override on the shared app.
+    app.dependency_overrides[get_ai_client] = override_ai
+    token = login_get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    r = client.post("/api/chat/stream", headers=headers, json={"message": "Stream please"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in r.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["meta", "delta", "delta", "delta", "done"]
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    cid = done["conversationId"]
+
+    r2 = client.get("/api/history", headers=headers)
+    assert any(item["id"] == cid for item in r2.json())
+
+
+def test_chat_stream_runs_after_hooks_on_the_stored_reply(monkeypatch):
+    from app.ai.plugins import PluginManager
+    from app.chat import router as chat_router
+
+    seen = []
+    pipeline = PluginManager()
+    pipeline.register_after(lambda reply, ctx: seen.append(reply), pure=True, name="record")
+    monkeypatch.setattr(chat_router, "plugins", pipeline)
+    app.dependency_overrides[get_ai_client] = override_ai
+    headers = {"Authorization": f"Bearer {login_get_token()}"}
+    r = client.post("/api/chat/stream", headers=headers, json={"message": "Stream please"})
+    assert r.status_code == 200
+    assert seen == ["Hello from mock"]
+
+
+class BrokenStreamAI(MockAI):
+    async def stream(self, messages, max_tokens, temperature):
+        yield "partial "
+        raise RuntimeError("provider dropped the stream")
+
+
+def test_chat_stream_provider_error_counts_against_admission():
+    from app.chat.admission import get_admission_limiter
+    from app.config import get_settings
+
+    limiter = get_admission_limiter(get_settings())
+    headers = {"Authorization": f"Bearer {login_get_token()}"}
+    app.dependency_overrides[get_ai_client] = lambda: BrokenStreamAI()
+    try:
+        before = limiter.limit
+        r = client.post("/api/chat/stream", headers=headers, json={"message": "Stream please"})
+    finally:
+        app.dependency_overrides[get_ai_client] = override_ai
+    assert "event: error" in r.text
+    assert limiter.limit == max(limiter.min_limit, before * limiter.backoff)
+    assert limiter.in_flight == 0
+
+
+def test_plugin_pipeline_async_pure_inplace_and_timeouts(monkeypatch):
+    import asyncio
+    import sys
+    import time
+    from app.ai import plugins as plugins_module
+    from app.ai.plugins import PluginManager
+    from app.metrics import metrics
+
+    # Importing the redactor registers it; point that at a throwaway manager so the
+    # app-wide pipeline is left as it was.
+    monkeypatch.setattr(plugins_module, "plugins", PluginManager())
+    monkeypatch.delitem(sys.modules, "app.ai.plugin_redact_email", raising=False)
+    from app.ai.plugin_redact_email import redact_before
+
+    pm = PluginManager()
+    seen = []
+
+    async def audit_a(messages, ctx):
+        await asyncio.sleep(0.2)
+        seen.append(("a", messages[0]["content"]))
+
+    async def audit_b(messages, ctx):
+        await asyncio.sleep(0.2)
+        seen.append(("b", messages[0]["content"]))
+
+    async def stuck(messages, ctx):
+        await asyncio.sleep(10)
+        return []
+
+    pm.register_before(redact_before, inplace=True)
+    pm.register_before(audit_a, pure=True)
+    pm.register_before(audit_b, pure=True)
+    pm.register_before(stuck, timeout=0.05, name="stuck_test")
+    pm.register_before(lambda messages, ctx: messages + [{"role": "system", "content": "tail"}], name="tail")
+    pm.register_after(lambda reply, ctx: reply.upper(), name="upper")
+    pm.register_after(lambda reply, ctx: asyncio.sleep(0, reply + "!"), name="coroutine_lambda")
+
+    messages = [{"role": "user", "content": "mail me at a@b.org"}]
+
+    async def run():
+        started = time.perf_counter()
+        out = await pm.run_before(messages, {})
+        return out, time.perf_counter() - started, await pm.run_after("done", {})
+
+    out, elapsed, reply = asyncio.run(run())
+    assert messages[0]["content"] == "mail me at [redacted-email]"
+    assert out[0] is messages[0] and out[-1]["content"] == "tail"
+    assert sorted(seen) == [("a", "mail me at [redacted-email]"), ("b", "mail me at [redacted-email]")]
+    assert elapsed < 0.4  # the two 0.2s audits overlap
+    assert reply == "DONE!"
+    snapshot = metrics.snapshot()
+    assert snapshot["plugin.before.stuck_test.timeouts"] == 1
+    assert snapshot["plugin.before.redact_before.latency_seconds"]["count"] >= 1
+
+
+def test_plugin_inplace_hook_that_times_out_leaves_messages_untouched():
+    import asyncio
+    from app.ai.plugins import PluginManager
+
+    async def slow_redact(messages, ctx):
+        messages[0]["content"] = "[redacted]"
+        await asyncio.sleep(10)
+        messages[1]["content"] = "[redacted]"
+
+    def quick_redact(messages, ctx):
+        for m in messages:
+            m["content"] = m["content"].replace("secret", "[redacted]")
+
+    pm = PluginManager()
+    pm.register_before(slow_redact, inplace=True, timeout=0.05)
+    pm.register_before(quick_redact, inplace=True, timeout=1.0)
+    messages = [{"role": "user", "content": "a secret"}, {"role": "user", "content": "b"}]
+    assert asyncio.run(pm.run_before(messages, {})) is messages
+    assert [m["content"] for m in messages] == ["a [redacted]", "b"]
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from app.ai.tokenizer import MESSAGE_OVERHEAD, HeuristicTokenizer, Tokenizer, make_tokenizer
+from app.chat.context import ContextBuilder
+from app.chat.service import ChatService
+from app.chat.store import SQLiteConversationStore
+from app.chat.summary import ConversationSummarizer
+from app.config import Settings
+from app.models.conversation import Conversation, Message
+
+
+class WordTokenizer(Tokenizer):
+    name = "words"
+
+    def _count(self, text):
+        return len(text.split())
+
+
+def add(conv, role, content):
+    n = len(conv.messages)
+    stamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=n)
+    conv.messages.append(Message(id=str(n + 1), user_id=None, role=role, content=content, timestamp=stamp))
+
+
+def test_context_follows_token_budget_incrementally():
+    conv = Conversation.new("u1", "budget")
+    builder = ContextBuilder(context_tokens=100, tokenizer=WordTokenizer())
+    per_message = 6 + MESSAGE_OVERHEAD
+    for i in range(30):
+        add(conv, "user" if i % 2 == 0 else "assistant", f"turn {i} one two three four")
+        if i % 7 == 0:
+            builder.build(conv, max_tokens=20)
+    add(conv, "assistant", None)  # content not stored
+    context = builder.build(conv, max_tokens=20)
+    assert len(context) == 80 // per_message
+    assert context[-1]["content"].startswith("turn 29 ")
+    window = builder.window(conv)
+    assert window.count == len(conv.messages)
+    assert window.tokens - per_message < 100  # old turns were dropped as new ones arrived
+
+    # A rebuilt window (eviction, restart, another store object) selects the same turns.
+    assert ContextBuilder(context_tokens=100, tokenizer=WordTokenizer()).build(conv, max_tokens=20) == context
+    # The newest message is sent even when it alone exceeds the budget.
+    add(conv, "user", "word " * 500)
+    assert [m["content"] for m in builder.build(conv, max_tokens=20)] == ["word " * 500]
+
+
+def test_load_tokenizer_builds_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from app.ai import tokenizer as tokenizer_module
+
+    built_on = []
+
+    def fake_make(settings):
+        built_on.append(threading.get_ident())
+        return HeuristicTokenizer()
+
+    monkeypatch.setattr(tokenizer_module, "_tokenizer", None)
+    monkeypatch.setattr(tokenizer_module, "make_tokenizer", fake_make)
+
+    async def run():
+        return threading.get_ident(), await tokenizer_module.load_tokenizer(Settings())
+
+    loop_thread, loaded = asyncio.run(run())
+    assert built_on and built_on[0] != loop_thread
+    assert tokenizer_module.get_tokenizer() is loaded
+
+
+def test_heuristic_tokenizer_and_cached_message_counts(tmp_path):
+    tokens = HeuristicTokenizer()
+    assert tokens.count("recursion") == 2
+    assert tokens.count("Hello, world!") == 4
+    assert tokens.count("12345") == 2
+    assert tokens.usage([{"role": "user", "content": "Hello, world!"}], "hi") == {
+        "promptTokens": 4 + MESSAGE_OVERHEAD,
+        "completionTokens": 1,
+        "totalTokens": 5 + MESSAGE_OVERHEAD,
+    }
+    assert make_tokenizer(Settings(TOKENIZER="heuristic")).name == "heuristic"
+
+    path = str(tmp_path / "chat.db")
+
+    async def run():
+        service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True), SQLiteConversationStore(path))
+        conv = await service.create_conversation("u1", "count me")
+        await service.add_message(conv, "u1", "user", "count these words please")
+        cached = conv.messages[-1].tokens
+        loaded = await service.get_conversation(conv.id)
+        await service.aclose()
+        return cached, loaded
+
+    cached, loaded = asyncio.run(run())
+    assert cached is not None and cached > 0
+    assert loaded.messages[0].tokens is None  # counts are not persisted
+    assert loaded.messages.tokens(0, WordTokenizer().count) == 4
+    assert loaded.messages[0].tokens == 4
+
+
+class SummaryAI:
+    def __init__(self):
+        self.prompts = []
+
+    async def chat(self, messages, max_tokens, temperature):
+        self.prompts.append(messages[-1]["content"])
+        return {"reply": f"summary {len(self.prompts)}", "usage": {}}
+
+
+def test_summarizer_folds_only_new_turns_in_background():
+    ai = SummaryAI()
+    words = WordTokenizer()
+
+    async def run():
+        service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True))
+        summarizer = ConversationSummarizer(service, lambda: ai, words, threshold_tokens=50, keep_recent_tokens=20)
+        conv = await service.create_conversation("u1", "long chat")
+        scheduled = []
+        for i in range(24):
+            await service.add_message(conv, None, "user" if i % 2 == 0 else "assistant", f"turn {i} a b c d e f g h")
+            scheduled.append(summarizer.maybe_schedule(conv))
+            await summarizer.join()
+        await summarizer.aclose()
+        return conv, scheduled
+
+    conv, scheduled = asyncio.run(run())
+    # 10 tokens per message: the first run at 50 keeps the newest 2, then every 3 messages.
+    assert [i for i, s in enumerate(scheduled) if s] == [4, 7, 10, 13, 16, 19, 22]
+    assert (conv.summary, conv.summary_upto) == ("summary 7", 21)
+    assert "Current summary:\n(none yet)" in ai.prompts[0] and "turn 2 " in ai.prompts[0] and "turn 3 " not in ai.prompts[0]
+    # Later runs start from the previous summary and see only the turns after it.
+    assert "summary 1" in ai.prompts[1] and "turn 2 " not in ai.prompts[1] and "turn 5 " in ai.prompts[1]
+
+    context = ContextBuilder(context_tokens=1000, tokenizer=words).build(conv, max_tokens=100)
+    assert context[0] == {"role": "system", "content": "Summary of the earlier conversation: summary 7"}
+    assert context[1]["content"].startswith(f"turn {conv.summary_upto} ")
+    assert len(context) == len(conv.messages) - conv.summary_upto + 1
+
+
+class FallbackSummaryAI(SummaryAI):
+    async def chat(self, messages, max_tokens, temperature):
+        result = await super().chat(messages, max_tokens, temperature)
+        result["usage"]["provider_chain"] = ["OpenAIClient", "MockAIClient"]
+        return result
+
+
+def test_summarizer_rejects_non_provider_replies_and_applies_plugins(monkeypatch):
+    from app.ai.mock_client import MockAIClient
+    from app.ai.plugins import PluginManager
+    from app.chat import summary as summary_module
+    from app.metrics import metrics
+
+    def redact(messages, ctx):
+        for m in messages:
+            m["content"] = m["content"].replace("me@example.com", "[redacted-email]")
+
+    pipeline = PluginManager()
+    pipeline.register_before(redact, inplace=True)
+    monkeypatch.setattr(summary_module, "plugins", pipeline)
+    failed = metrics.counter("summary.failed")
+
+    async def run(client):
+        service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True))
+        summarizer = ConversationSummarizer(service, lambda: client, WordTokenizer(), threshold_tokens=10, keep_recent_tokens=0)
+        conv = await service.create_conversation("u1", "chat")
+        for i in range(4):
+            await service.add_message(conv, None, "user", f"turn {i} write to me@example.com")
+        await summarizer.summarize(conv.id)
+        return conv
+
+    async def schedule_on_mock():
+        service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True))
+        summarizer = ConversationSummarizer(service, MockAIClient, WordTokenizer(), threshold_tokens=10)
+        conv = await service.create_conversation("u1", "chat")
+        for i in range(4):
+            await service.add_message(conv, None, "user", f"turn {i} a b c d e f g h")
+        return summarizer.maybe_schedule(conv)
+
+    assert asyncio.run(schedule_on_mock()) is False
+
+    before = failed.value
+    for client in (MockAIClient(), FallbackSummaryAI()):
+        conv = asyncio.run(run(client))
+        assert (conv.summary, conv.summary_upto) == (None, 0)
+    assert failed.value == before + 2
+
+    ai = SummaryAI()
+    conv = asyncio.run(run(ai))
+    assert conv.summary == "summary 1" and conv.summary_upto == 4
+    assert "me@example.com" not in ai.prompts[0] and "[redacted-email]" in ai.prompts[0]
@@ -30,3 +30,16 @@ def test_admin_list_requires_role():
     admin_token = login_get_token("admin@example.com")
     r2 = client.get("/api/admin/conversations", headers={"Authorization": f"Bearer {admin_token}"})
     assert r2.status_code == 200
+
+    r3 = client.get("/api/admin/conversations?format=ndjson", headers={"Authorization": f"Bearer {admin_token}"})
+    assert r3.status_code == 200
+    assert r3.headers["content-type"].startswith("application/x-ndjson")
+    assert len([line for line in r3.text.splitlines() if line]) == len(r2.json())
+
+
+def test_metrics_requires_admin():
+    r = client.get("/api/metrics", headers={"Authorization": f"Bearer {login_get_token()}"})
+    assert r.status_code == 403
+    r2 = client.get("/api/metrics", headers={"Authorization": f"Bearer {login_get_token('admin@example.com')}"})
+    assert r2.status_code == 200
+    assert isinstance(r2.json(), dict)
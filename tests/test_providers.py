@@ -0,0 +1,291 @@
+import asyncio
+import httpx
+import pytest
+from app.config import Settings
+from app.ai.openai_client import OpenAIClient
+from app.ai.transport import HTTPTransport
+from app.ai.fallback_client import FallbackAIClient
+from app.ai.mock_client import MockAIClient
+from app.ai.base import ProviderOverloadedError
+from app.ai.gpt4all_pool import GPT4AllReplicaPool
+from app.ai.batching import MicroBatcher
+from app.ai.circuit import CircuitBreaker, CircuitOpenError
+from app.ai.hedge import HedgedAIClient
+
+
+def _openai_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "pooled hello"}}],
+        "usage": {"prompt_tokens": 2, "completion_tokens": 2, "total_tokens": 4},
+    })
+
+
+def test_openai_client_reuses_shared_transport():
+    settings = Settings(OPENAI_API_KEY="sk-test")
+    transport = HTTPTransport(settings)
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(_openai_handler))
+    client = OpenAIClient(settings, transport=transport)
+
+    async def run():
+        for _ in range(3):
+            result = await client.chat([{"role": "user", "content": "hi"}], 16, 0.2)
+            assert result["reply"] == "pooled hello"
+        client_before_close = transport.client
+        await transport.aclose()
+        return client_before_close
+
+    underlying = asyncio.run(run())
+    assert underlying.is_closed
+    stats = transport.stats()
+    assert stats["requests"] == 3
+    assert stats["inFlight"] == 0
+
+
+class _FailingAI(MockAIClient):
+    async def stream(self, messages, max_tokens, temperature):
+        raise RuntimeError("provider down")
+        yield ""
+
+
+def test_fallback_stream_switches_provider_before_first_chunk():
+    client = FallbackAIClient(_FailingAI(), MockAIClient())
+
+    async def run():
+        return [c async for c in client.stream([{"role": "user", "content": "hello"}], 256, 0.2)]
+
+    chunks = asyncio.run(run())
+    assert len(chunks) > 1
+    assert "".join(chunks).strip()
+
+
+class _DownAI(MockAIClient):
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, max_tokens, temperature):
+        self.calls += 1
+        raise RuntimeError("provider down")
+
+
+def test_open_breaker_skips_failing_primary_until_it_recovers():
+    now = [0.0]
+    primary = _DownAI()
+    breaker = CircuitBreaker("down", window_seconds=30, min_calls=3, error_rate=0.5, open_seconds=10, clock=lambda: now[0])
+    client = FallbackAIClient(primary, MockAIClient(), breaker=breaker)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def run():
+        results = [await client.chat(messages, 64, 0.2) for _ in range(5)]
+        with pytest.raises(CircuitOpenError):
+            await FallbackAIClient(primary, breaker=breaker).chat(messages, 64, 0.2)
+        now[0] = 11.0  # half-open: one trial call reaches the provider again
+        results.append(await client.chat(messages, 64, 0.2))
+        return results
+
+    results = asyncio.run(run())
+    assert primary.calls == 4
+    assert results[0]["usage"]["provider_chain"] == ["_DownAI", "MockAIClient"]
+    assert results[3]["usage"]["provider_chain"] == ["_DownAI:open", "MockAIClient"]
+    assert breaker.state == "open" and breaker.trips == 2
+
+
+class _SlowAI(MockAIClient):
+    def __init__(self, delay):
+        self.delay = delay
+        self.cancelled = False
+
+    async def chat(self, messages, max_tokens, temperature):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"reply": f"slept {self.delay}", "usage": {}}
+
+
+def test_hedge_fires_after_delay_and_cancels_the_loser():
+    slow, fast = _SlowAI(5.0), _SlowAI(0.0)
+    client = HedgedAIClient(slow, fast, MockAIClient(), min_delay=0.01, max_delay=0.05)
+
+    async def run():
+        return await client.chat([{"role": "user", "content": "hello"}], 64, 0.2)
+
+    observed = client.recent.count
+    result = asyncio.run(run())
+    assert result["reply"] == "slept 0.0"
+    assert result["usage"]["hedge"]["fired"] is True
+    assert result["usage"]["hedge"]["reason"] == "delay"
+    assert client.recent.count == observed + 1  # the slow primary's latency is recorded as a lower bound
+    assert result["usage"]["provider_chain"] == ["_SlowAI:hedged", "_SlowAI"]
+    assert slow.cancelled
+
+
+def test_hedge_reports_being_sent_when_primary_fails_early():
+    client = HedgedAIClient(_DownAI(), _SlowAI(0.0), min_delay=1.0, max_delay=1.0)
+    result = asyncio.run(client.chat([{"role": "user", "content": "hello"}], 64, 0.2))
+    assert result["usage"]["hedge"]["fired"] is True
+    assert result["usage"]["hedge"]["reason"] == "primary_failed"
+
+
+def test_hedge_delay_follows_observed_latency():
+    client = HedgedAIClient(_SlowAI(0.0), MockAIClient(), min_delay=0.0, max_delay=10.0, min_samples=10, window=50)
+    assert client.delay() == 10.0
+    for _ in range(100):
+        client._observe(0.3)
+    assert client.delay() == 0.3
+    # A slow spell ages out of the window instead of pinning the delay high forever.
+    for _ in range(50):
+        client._observe(0.05)
+    assert client.delay() == 0.05
+
+
+class EchoModel:
+    def generate(self, prompt, max_tokens, temp, callback=None):
+        words = prompt.split()
+        for i, word in enumerate(words):
+            if callback and not callback(i, word + " "):
+                break
+        return prompt.upper()
+
+
+def echo_model_factory():
+    return EchoModel()
+
+
+def test_registry_bare_chain_has_no_request_level_layers():
+    from app.ai.registry import ProviderRegistry
+
+    registry = ProviderRegistry()
+    settings = Settings(AI_PROVIDER="mock", RESPONSE_CACHE_SIZE=16, SIMILARITY_CACHE_SIZE=16, COALESCE_REQUESTS=True)
+    wrapped, bare = registry.get(settings), registry.get_bare(settings)
+    inner = wrapped
+    while hasattr(inner, "inner"):
+        inner = inner.inner
+    assert inner is bare and wrapped is not bare and isinstance(bare, MockAIClient)
+
+
+def test_gemini_payload_sends_system_messages_as_system_instruction():
+    from app.ai.gemini_client import GeminiClient
+
+    settings = Settings(GEMINI_API_KEY="test")
+    client = GeminiClient(settings, transport=HTTPTransport(settings))
+    payload = client._payload(
+        [
+            {"role": "system", "content": "Be brief."},
+            {"role": "system", "content": "Summary of the earlier conversation: loops"},
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "hello"},
+        ],
+        16,
+        0.2,
+    )
+    assert payload["systemInstruction"] == {
+        "parts": [{"text": "Be brief."}, {"text": "Summary of the earlier conversation: loops"}]
+    }
+    assert [c["role"] for c in payload["contents"]] == ["user", "model"]
+
+
+def test_gpt4all_client_requires_the_model_file(monkeypatch, tmp_path):
+    from app.ai import gpt4all_client
+    from app.ai.registry import build_chain
+    from app.config import Settings
+
+    monkeypatch.setattr(gpt4all_client, "GPT4All", object)  # package "installed"
+    missing = Settings(GPT4ALL_MODEL_PATH=str(tmp_path / "missing.gguf"), AI_PROVIDER="openai", OPENAI_API_KEY="sk-test")
+    with pytest.raises(RuntimeError, match="not found"):
+        gpt4all_client.GPT4AllClient(missing)
+    chain = build_chain(missing)
+    assert isinstance(chain.fallback, MockAIClient)  # OpenAI -> Mock, no unstartable local replicas
+
+
+def test_gpt4all_pool_runs_generation_in_worker_processes():
+    pool = GPT4AllReplicaPool(echo_model_factory, replicas=2, queue_limit=0)
+
+    async def run():
+        await pool.wait_ready()
+        replies = await asyncio.gather(pool.generate("one", 8, 0.1), pool.generate("two", 8, 0.1))
+        chunks = [c async for c in pool.stream("a b c", 8, 0.1)]
+        # Both replicas are busy and no queueing is allowed: the third request is shed.
+        first = asyncio.ensure_future(pool.generate("x", 8, 0.1))
+        second = asyncio.ensure_future(pool.generate("y", 8, 0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloadedError):
+            await pool.generate("z", 8, 0.1)
+        await asyncio.gather(first, second)
+        await pool.aclose()
+        return replies, chunks
+
+    replies, chunks = asyncio.run(run())
+    assert replies == ["ONE", "TWO"]
+    assert chunks == ["a ", "b ", "c "]
+    assert pool.rejected == 1
+
+
+def test_micro_batcher_fuses_or_pipelines_concurrent_requests():
+    calls = {"one": 0, "batch": []}
+
+    async def run_one(item):
+        calls["one"] += 1
+        return item * 2
+
+    async def run_batch(items):
+        calls["batch"].append(len(items))
+        return [item * 10 for item in items]
+
+    async def run(supported):
+        batcher = MicroBatcher("test", run_one, run_batch, supports_batch=lambda: supported, max_batch=4, max_wait_ms=2)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+
+    assert asyncio.run(run(True)) == [0, 10, 20, 30, 40, 50]
+    assert calls["batch"] == [4, 2]
+    assert asyncio.run(run(False)) == [0, 2, 4, 6, 8, 10]
+    assert calls["one"] == 6
+
+
+def test_micro_batcher_passes_caller_cancellation_to_the_backend():
+    cancelled = []
+
+    async def slow(label):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(label)
+            raise
+
+    async def run_one(item):
+        await slow(item)
+        return item
+
+    async def run_batch(items):
+        await slow("batch")
+        return items
+
+    async def run(supported):
+        batcher = MicroBatcher("test", run_one, run_batch, supports_batch=lambda: supported, max_batch=2, max_wait_ms=1)
+        callers = [asyncio.ensure_future(batcher.submit(i)) for i in range(2)]
+        await asyncio.sleep(0.05)  # flushed and running
+        callers[0].cancel()
+        await asyncio.sleep(0.05)
+        first = list(cancelled)
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        return first, list(cancelled)
+
+    assert asyncio.run(run(False)) == ([0], [0, 1])
+    cancelled.clear()
+    assert asyncio.run(run(True)) == ([], ["batch"])  # the fused batch stops only once every caller is gone
+
+
+def test_micro_batcher_fails_every_caller_on_short_batch_result():
+    async def run_one(item):
+        return item
+
+    async def run_batch(items):
+        return items[:-1]
+
+    async def run():
+        batcher = MicroBatcher("test", run_one, run_batch, supports_batch=lambda: True, max_batch=3, max_wait_ms=2)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), 1)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
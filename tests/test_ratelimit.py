@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.ratelimit.buckets import TokenBucketLimiter
+from app.ratelimit.shared import SharedTokenBucketLimiter
+
+client = TestClient(app)
+
+
+def test_token_bucket_refills_and_evicts_idle_keys():
+    now = [0.0]
+    limiter = TokenBucketLimiter(clock=lambda: now[0])
+    decisions = [limiter.hit("a", capacity=3, rate=1.0) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[-1].headers()["Retry-After"] == "1"
+    now[0] = 1.0
+    assert limiter.hit("a", capacity=3, rate=1.0).allowed
+    limiter.hit("b", capacity=3, rate=1.0)
+    now[0] = 4.0
+    assert limiter.evict_idle() == 2
+    assert len(limiter) == 0
+
+
+def test_shared_backend_enforces_one_limit_across_instances(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "ratelimit.bin")
+    workers = [SharedTokenBucketLimiter(path, slots=1024, stripes=16, clock=lambda: now[0]) for _ in range(2)]
+    allowed = [workers[i % 2].hit("chat|user:1", capacity=4, rate=1.0).allowed for i in range(6)]
+    assert allowed == [True, True, True, True, False, False]
+    now[0] += 2.0
+    assert workers[0].hit("chat|user:1", capacity=4, rate=1.0).remaining == 1
+    for limiter in workers:
+        limiter.close()
+
+
+def test_shared_backend_refuses_to_resize_a_file_in_use(tmp_path):
+    import subprocess
+    import sys
+
+    path = str(tmp_path / "ratelimit.bin")
+    holder = subprocess.Popen(
+        [sys.executable, "-c", (
+            "import sys; from app.ratelimit.shared import SharedTokenBucketLimiter as L; "
+            f"l = L({path!r}, slots=1024, stripes=16); print('ready', flush=True); sys.stdin.read()"
+        )],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "ready"
+        with pytest.raises(RuntimeError, match="different layout"):
+            SharedTokenBucketLimiter(path, slots=2048, stripes=16)
+    finally:
+        holder.communicate("")
+    limiter = SharedTokenBucketLimiter(path, slots=2048, stripes=16)
+    assert limiter.hit("k", capacity=1, rate=1.0).allowed
+    limiter.close()
+
+
+def test_responses_carry_rate_limit_headers():
+    r = client.get("/api/health")
+    assert r.status_code == 200
+    assert r.headers["X-RateLimit-Limit"] == "60"
+    assert int(r.headers["X-RateLimit-Remaining"]) < 60
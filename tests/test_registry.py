@@ -0,0 +1,21 @@
+import asyncio
+from app.config import Settings
+from app.ai.registry import ProviderRegistry
+from app.ai.fallback_client import FallbackAIClient
+from app.ai.mock_client import MockAIClient
+
+
+def test_registry_reuses_chain_until_settings_change():
+    registry = ProviderRegistry()
+    settings = Settings(AI_PROVIDER="openai", OPENAI_API_KEY="sk-...", RESPONSE_CACHE_SIZE=0, COALESCE_REQUESTS=False)
+    first = registry.get(settings)
+    assert isinstance(first, MockAIClient)
+    assert registry.get(settings) is first
+
+    changed = settings.model_copy(update={"openai_api_key": "sk-test"})
+    second = registry.get(changed)
+    assert second is not first
+    assert isinstance(second, FallbackAIClient)
+    assert registry.get(changed) is second
+
+    asyncio.run(registry.aclose())
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+import pytest
+from app.config import Settings
+from app.chat.service import ChatService
+from app.chat.store import InMemoryConversationStore, SQLiteConversationStore, to_epoch_us
+from app.history.service import HistoryService
+from app.models.conversation import Conversation, Message
+
+
+def test_sqlite_store_persists_conversations(tmp_path):
+    settings = Settings(PRIVACY_STORE_MESSAGES=True)
+    path = str(tmp_path / "chat.db")
+
+    async def write():
+        service = ChatService(settings, SQLiteConversationStore(path, commit_batch=2))
+        conv = await service.create_conversation("u1", "how do loops work")
+        await service.add_message(conv, "u1", "user", "how do loops work")
+        await service.add_message(conv, None, "assistant", "they repeat")
+        await service.rename_conversation(conv.id, "u1", "Loops")
+        await service.set_summary(conv.id, "loops repeat", 2)
+        await service.aclose()
+        return conv.id
+
+    async def read(cid):
+        service = ChatService(settings, SQLiteConversationStore(path))
+        conv = await service.get_conversation(cid)
+        listed = await service.list_user_conversations("u1")
+        deleted = await service.delete_conversation(cid, "u1")
+        missing = await service.get_conversation(cid)
+        await service.aclose()
+        return conv, listed, deleted, missing
+
+    cid = asyncio.run(write())
+    conv, listed, deleted, missing = asyncio.run(read(cid))
+    assert conv.title == "Loops"
+    assert (conv.summary, conv.summary_upto) == ("loops repeat", 2)
+    assert [(m.id, m.role, m.content) for m in conv.messages] == [
+        ("1", "user", "how do loops work"),
+        ("2", "assistant", "they repeat"),
+    ]
+    assert conv.updated_at == conv.messages[-1].timestamp
+    assert [c.id for c in listed] == [cid]
+    assert deleted and missing is None
+
+
+def test_sqlite_store_allocates_seq_for_concurrent_turns(tmp_path):
+    settings = Settings(PRIVACY_STORE_MESSAGES=True)
+
+    async def run():
+        service = ChatService(settings, SQLiteConversationStore(str(tmp_path / "chat.db")))
+        conv = await service.create_conversation("u1", "hello")
+        await service.add_message(conv, "u1", "user", "hello")
+        # Two requests on the same conversation, each with its own loaded copy.
+        first, second = await asyncio.gather(*(service.get_conversation(conv.id) for _ in range(2)))
+        await asyncio.gather(
+            service.add_message(first, "u1", "user", "one"),
+            service.add_message(second, "u1", "user", "two"),
+        )
+        stored = await service.get_conversation(conv.id)
+        await service.aclose()
+        return stored
+
+    stored = asyncio.run(run())
+    assert [(m.id, m.content) for m in stored.messages] == [("1", "hello"), ("2", "one"), ("3", "two")]
+
+
+def test_sqlite_store_reports_a_failed_open_on_first_use(tmp_path):
+    (tmp_path / "taken").write_text("")
+    store = SQLiteConversationStore(str(tmp_path / "taken" / "chat.db"))  # does not wait for the open
+
+    async def run():
+        with pytest.raises(OSError):
+            await store.get("c1")
+
+    asyncio.run(run())
+
+
+def test_message_columns_materialize_messages():
+    conv = Conversation.new("u1", "columns")
+    stamp = conv.created_at
+    conv.messages.append(Message(id="1", user_id="u1", role="user", content="hi", timestamp=stamp))
+    conv.messages.add(None, "assistant", None, to_epoch_us(stamp) + 1)
+    assert len(conv.messages) == 2
+    assert conv.messages[0] == Message(id="1", user_id="u1", role="user", content="hi", timestamp=stamp)
+    last = conv.messages[-1]
+    assert (last.id, last.user_id, last.role, last.content) == ("2", None, "assistant", None)
+    assert (last.timestamp - stamp).microseconds == 1
+    assert [m.id for m in conv.messages[::-1]] == ["2", "1"]
+    assert list(conv.messages.turns()) == [("user", "hi"), ("assistant", None)]
+    with pytest.raises(IndexError):
+        conv.messages[2]
+    copy = Conversation(conv.id, conv.user_id, conv.title, conv.created_at, conv.updated_at, list(conv.messages))
+    assert list(copy.messages) == list(conv.messages)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_history_cursor_pages_follow_updates(tmp_path, backend):
+    async def run():
+        store = InMemoryConversationStore() if backend == "memory" else SQLiteConversationStore(str(tmp_path / "c.db"))
+        service = ChatService(Settings(), store)
+        convs = []
+        for i in range(5):
+            convs.append(await service.create_conversation("u1", f"q{i}"))
+            await asyncio.sleep(0.001)
+        await service.create_conversation("u2", "other user")
+        await service.add_message(convs[1], "u1", "user", None)  # conversation 1 becomes the newest
+        ids = [c.id for c in convs]
+        history = HistoryService(service)
+        pages, cursor = [], None
+        while True:
+            items, cursor = await history.list_user_conversations("u1", 1, 2, cursor)
+            pages.append([ids.index(c.id) for c in items])
+            if cursor is None:
+                break
+        await service.aclose()
+        return pages
+
+    pages = asyncio.run(run())
+    flat = [i for page in pages for i in page]
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert flat[0] == 1 and sorted(flat) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_admin_listing_filters_by_user_date_and_title(tmp_path, backend):
+    async def run():
+        store = InMemoryConversationStore() if backend == "memory" else SQLiteConversationStore(str(tmp_path / "c.db"))
+        service = ChatService(Settings(PRIVACY_STORE_MESSAGES=True), store)
+        for i in range(6):
+            await service.create_conversation(f"u{i % 2}", f"{'Loops' if i < 4 else 'Maths'} question {i}")
+            await asyncio.sleep(0.001)  # distinct updated_at, so the expected order is unambiguous
+        history = HistoryService(service)
+        streamed = [c.title async for c in history.iter_conversations(batch_size=2)]
+        by_title = [c.title async for c in history.iter_conversations(title_prefix="loo", user_id="u0")]
+        newest = (await store.list_page(1))[0]
+        cutoff = to_epoch_us(newest.updated_at)
+        recent = await store.list_page(10, updated_from=cutoff)
+        await service.aclose()
+        return streamed, by_title, recent
+
+    streamed, by_title, recent = asyncio.run(run())
+    assert streamed == [f"{'Loops' if i < 4 else 'Maths'} question {i}" for i in reversed(range(6))]
+    assert by_title == ["Loops question 2", "Loops question 0"]
+    assert [c.title for c in recent] == ["Maths question 5"]
+
+
+def test_log_store_recovers_from_snapshot_and_tail_and_compacts(tmp_path):
+    from app.chat.logstore import LogConversationStore
+
+    directory = str(tmp_path / "log")
+    settings = Settings(PRIVACY_STORE_MESSAGES=True)
+
+    def open_store(**kw):
+        return ChatService(settings, LogConversationStore(directory, segment_bytes=4096, **kw))
+
+    async def write():
+        service = open_store()
+        kept = await service.create_conversation("u1", "keep me")
+        for i in range(40):
+            await service.add_message(kept, "u1", "user", f"question {i} " + "x" * 50)
+        await service.set_summary(kept.id, "first summary", 10)
+        await service.aclose()  # writes a snapshot
+        service = open_store()
+        dropped = await service.create_conversation("u1", "drop me")
+        for i in range(40):
+            await service.add_message(dropped, None, "assistant", "y" * 80)
+        await service.rename_conversation(kept.id, "u1", "Kept")
+        await service.set_summary(kept.id, "second summary", 20)
+        # Simulate a crash: no snapshot for these records, plus a torn write at the end.
+        store = service.store
+        await store._flush_buffer()
+        os.write(store._active.fd, b"\x10\x00\x00\x00torn")
+        return kept.id, dropped.id
+
+    async def reopen(kept_id, dropped_id):
+        service = open_store(compact_min_bytes=0)
+        kept = await service.get_conversation(kept_id)
+        before = sorted(os.listdir(directory))
+        assert await service.delete_conversation(dropped_id, "u1")
+        await service.store._compaction
+        await service.aclose()
+        service = open_store()
+        after = await service.get_conversation(kept_id)
+        missing = await service.get_conversation(dropped_id)
+        await service.aclose()
+        return kept, after, missing, before, sorted(os.listdir(directory))
+
+    kept_id, dropped_id = asyncio.run(write())
+    kept, after, missing, before, files = asyncio.run(reopen(kept_id, dropped_id))
+    assert kept.title == "Kept" and len(kept.messages) == 40
+    assert kept.messages[-1].content.startswith("question 39")
+    assert [m.content for m in after.messages] == [m.content for m in kept.messages]
+    assert (kept.summary, kept.summary_upto) == (after.summary, after.summary_upto) == ("second summary", 20)
+    assert missing is None
+    assert len(files) < len(before)
+
+
+def test_log_store_keeps_writes_made_during_compaction(tmp_path):
+    from app.chat.logstore import LogConversationStore
+
+    directory = str(tmp_path / "log")
+    settings = Settings(PRIVACY_STORE_MESSAGES=True)
+
+    async def run():
+        store = LogConversationStore(directory, segment_bytes=4096)
+        service = ChatService(settings, store)
+        kept = await service.create_conversation("u1", "keep me")
+        dropped = await service.create_conversation("u1", "drop me")
+        for i in range(20):
+            await service.add_message(kept, "u1", "user", f"question {i}")
+            await service.add_message(dropped, None, "assistant", "y" * 80)
+        await service.delete_conversation(dropped.id, "u1")
+
+        started, release = threading.Event(), threading.Event()
+        rewrite = store._rewrite
+
+        def held_rewrite(*args):
+            started.set()
+            release.wait(5)
+            return rewrite(*args)
+
+        store._rewrite = held_rewrite
+        compaction = asyncio.ensure_future(store.compact())
+        await asyncio.to_thread(started.wait, 5)
+        # The rewrite is running and holds neither the lock nor the writer thread.
+        await service.add_message(kept, "u1", "user", "asked during compaction")
+        await service.rename_conversation(kept.id, "u1", "Kept")
+        await service.set_summary(kept.id, "summary", 10)
+        late = await service.create_conversation("u1", "late")
+        await service.add_message(late, "u1", "user", "hi")
+        during = await service.get_conversation(kept.id)
+        release.set()
+        await compaction
+        after = await service.get_conversation(kept.id)
+        await service.aclose()
+        service = ChatService(settings, LogConversationStore(directory, segment_bytes=4096))
+        reopened = [await service.get_conversation(cid) for cid in (kept.id, late.id, dropped.id)]
+        await service.aclose()
+        return during, after, reopened
+
+    during, after, (kept, late, dropped) = asyncio.run(run())
+    assert len(during.messages) == len(after.messages) == len(kept.messages) == 21
+    assert kept.messages[-1].content == "asked during compaction"
+    assert (kept.title, kept.summary, kept.summary_upto) == ("Kept", "summary", 10)
+    assert [m.content for m in late.messages] == ["hi"]
+    assert dropped is None